@@ -0,0 +1,280 @@
+'''
+Vectorized analytics of a simulated schedule
+
+The schedule is taken as five int64 columns, one entry per treasure: id, crewmate id, arrival time, size and
+completion time, as returned by schedule_columns of StrawHatTreasury and ColumnarTreasury.
+Every metric is computed with NumPy on whole columns (sorts, prefix scans, reductions), so 10^7 treasures take
+seconds. NumPy is only needed by this module, the treasuries do not depend on it.
+'''
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+HISTOGRAM_VALUES = ("flow", "wait", "size")
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("analytics.py requires NumPy (pip install numpy)")
+
+
+class Schedule:
+    def __init__(self, ids, crew_ids, arrival_times, sizes, completion_times, m=None):
+        '''
+        Arguments:
+            ids : Sequence[int] : The ids of the treasures
+            crew_ids : Sequence[int] : The id of the crewmate of each treasure
+            arrival_times : Sequence[int] : Their arrival times
+            sizes : Sequence[int] : Their sizes
+            completion_times : Sequence[int] : Their completion times
+            m : int : Number of Crew Mates, so that the idle ones appear in the breakdown (the largest crewmate id + 1 if None)
+        Returns:
+            None
+        Description:
+            Copies the columns into int64 NumPy arrays (array('q') columns are copied through the buffer protocol,
+            so the treasury can keep growing them) and groups the treasures by crewmate
+            Raises ImportError if NumPy is not installed
+        Time Complexity:
+            O(n log(n)) where n is the number of Treasures
+        '''
+
+        _require_numpy()
+
+        self.id = np.array(ids, dtype=np.int64)
+        self.crew = np.array(crew_ids, dtype=np.int64)
+        self.arrival_time = np.array(arrival_times, dtype=np.int64)
+        self.size = np.array(sizes, dtype=np.int64)
+        self.completion_time = np.array(completion_times, dtype=np.int64)
+        n = len(self.id)
+        if not all(len(column) == n for column in (self.crew, self.arrival_time, self.size, self.completion_time)):
+            raise ValueError("the columns of a schedule must have the same length")
+
+        self.m = int(self.crew.max()) + 1 if m is None and n > 0 else (m or 0)
+
+        # Treasures grouped by crewmate, each crewmate in completion order: one argsort of the completion times offset
+        # by crewmate id times their span, or a lexsort if the offsets do not fit in an int64
+        self._span = None
+        if n > 0:
+            low = int(self.arrival_time.min())
+            span = int(self.completion_time.max()) - low + 1
+            if int(self.crew.max()) < (1 << 62) // span and int(self.crew.min()) >= 0:
+                self._span = span
+                self._offset = self.crew * span - low
+                self._order = np.argsort(self.completion_time + self._offset)
+            else:
+                self._order = np.lexsort((self.completion_time, self.crew))
+        else:
+            self._order = np.zeros(0, dtype=np.int64)
+        sorted_crew = self.crew[self._order]
+        self._first = np.r_[True, sorted_crew[1:] != sorted_crew[:-1]] if n > 0 else np.zeros(0, dtype=bool)
+        self._starts = np.flatnonzero(self._first)
+        self._crew_ids = sorted_crew[self._starts]
+        self._preempting = None
+
+    @classmethod
+    def from_treasury(cls, treasury):
+        '''
+        Arguments:
+            treasury : StrawHatTreasury : A treasury (any subclass with schedule_columns)
+        Returns:
+            Schedule : The schedule of its treasures, after simulating the crewmates which received treasures
+        '''
+
+        return cls(*treasury.schedule_columns(), m=treasury.number_crew)
+
+    def __len__(self):
+        return len(self.id)
+
+    def flow_times(self):
+        '''
+        Returns:
+            np.ndarray : completion_time - arrival_time of every treasure
+        '''
+
+        return self.completion_time - self.arrival_time
+
+    def wait_times(self):
+        '''
+        Returns:
+            np.ndarray : The time every treasure spent in its crewmate's queue without being processed (flow time - size)
+        '''
+
+        return self.completion_time - self.arrival_time - self.size
+
+    def makespan(self):
+        '''
+        Returns:
+            int : The time from the first arrival to the last completion (0 without treasures)
+        '''
+
+        if len(self) == 0:
+            return 0
+        return int(self.completion_time.max() - self.arrival_time.min())
+
+    def flow_percentiles(self, percentiles=DEFAULT_PERCENTILES):
+        '''
+        Arguments:
+            percentiles : Sequence[float] : The percentiles required, between 0 and 100
+        Returns:
+            Dict[float, float] : The flow time at each percentile (linear interpolation between treasures)
+        Time Complexity:
+            O(n) where n is the number of Treasures
+        '''
+
+        if len(self) == 0:
+            return {p: 0.0 for p in percentiles}
+        values = np.percentile(self.flow_times(), percentiles)
+        return {p: float(value) for p, value in zip(percentiles, values)}
+
+    def preempting(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            np.ndarray : For every treasure, whether its arrival interrupted the treasure its crewmate was processing
+        Description:
+            Derived from the columns alone, with the nested structure of the schedule: a crewmate only returns to a
+            treasure after finishing everything that interrupted it, and every treasure processed while one waits
+            completes before it starts. So, on one crewmate,
+                - treasure i starts at its arrival unless some other treasure j with arrival_j <= arrival_i completes
+                  in (arrival_i, completion_i): j was ahead of i in the queue
+                - the treasure processed just before arrival_i goes on after it if some j with
+                  arrival_j < arrival_i completes after arrival_i, and none completes at arrival_i
+            and i preempts when both hold. A treasure arriving at the same time as others and put ahead of them
+            interrupts nothing, as they have not been processed yet.
+            The first condition is found with the nearest earlier treasure in completion order whose arrival is not
+            later (pointer jumping, O(log n) rounds of whole-array gathers), the second with a searchsorted and a
+            suffix minimum of the arrivals in completion order, every crewmate in one array through the offsets of __init__
+            Raises OverflowError if the times are too large to be offset by crewmate id in an int64
+        Time Complexity:
+            O(n log(n)) where n is the number of Treasures
+        '''
+
+        if self._preempting is not None:
+            return self._preempting
+
+        n = len(self)
+        if n == 0:
+            self._preempting = np.zeros(0, dtype=bool)
+            return self._preempting
+
+        if self._span is None:
+            raise OverflowError("the times of the schedule are too large to be offset by crewmate")
+
+        # Crewmates one after the other, each in completion order
+        order = self._order
+        arrival = self.arrival_time[order]
+        completion = self.completion_time[order]
+
+        # Nearest earlier position of the same crewmate whose arrival is not later, n (sentinel) if none
+        previous = np.arange(-1, n, dtype=np.int64)
+        previous[:n][self._first] = n
+        previous[n] = n
+        arrival_ext = np.r_[arrival, np.iinfo(np.int64).min]
+        active = np.flatnonzero(arrival_ext[previous[:n]] > arrival)
+        while active.size > 0:
+            previous[active] = previous[previous[active]]
+            active = active[arrival_ext[previous[active]] > arrival[active]]
+        completion_ext = np.r_[completion, np.iinfo(np.int64).min]
+        waits = completion_ext[previous[:n]] > arrival
+
+        # The times offset by crewmate are sorted by crewmate, so one searchsorted and one scan cover all of them
+        offset = self._offset[order]
+        arrival_key = arrival + offset
+        completion_key = completion + offset
+
+        # First position of the crewmate completing after arrival_i (at most i's own), and the least arrival from there on;
+        # a treasure completing exactly at arrival_i was the one processed just before, and is not interrupted
+        after = np.searchsorted(completion_key, arrival_key, side='right')
+        least_arrival = np.minimum.accumulate(arrival_key[::-1])[::-1]
+        busy = (least_arrival[after] < arrival_key) & (np.searchsorted(completion_key, arrival_key, side='left') == after)
+
+        self._preempting = np.empty(n, dtype=bool)
+        self._preempting[order] = busy & ~waits
+        return self._preempting
+
+    def _per_crew(self, reduce, values, empty=0):
+        # Reduces the values of every crewmate's treasures into an array indexed by crewmate id
+        result = np.full(self.m, empty, dtype=values.dtype)
+        if len(self) > 0:
+            result[self._crew_ids] = reduce.reduceat(values[self._order], self._starts)
+        return result
+
+    def crew_breakdown(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Dict[str, np.ndarray] : Arrays indexed by crewmate id:
+                treasures : number of treasures
+                busy : total size processed
+                utilization : busy time over the makespan
+                mean_flow, max_flow : flow times of its treasures (0 for an idle crewmate)
+                last_completion : completion time of its last treasure (0 for an idle crewmate)
+                preemptions : number of times one of its treasures was interrupted
+        Time Complexity:
+            O(n log(n) + m) where
+                m : Number of Crew Mates
+                n : Number of Treasures
+        '''
+
+        flow = self.flow_times()
+        treasures = np.bincount(self.crew, minlength=self.m)[:self.m] if len(self) > 0 else np.zeros(self.m, dtype=np.int64)
+        busy = self._per_crew(np.add, self.size)
+        flow_sum = self._per_crew(np.add, flow)
+        makespan = self.makespan()
+        return {
+            "treasures": treasures,
+            "busy": busy,
+            "utilization": busy / makespan if makespan > 0 else np.zeros(self.m),
+            "mean_flow": flow_sum / np.maximum(treasures, 1),
+            "max_flow": self._per_crew(np.maximum, flow),
+            "last_completion": self._per_crew(np.maximum, self.completion_time),
+            "preemptions": np.bincount(self.crew[self.preempting()], minlength=self.m)[:self.m],
+        }
+
+    def histogram(self, values="flow", bins=50, range=None):
+        '''
+        Arguments:
+            values : str : "flow", "wait" or "size"
+            bins : int : Number of bins of equal width (or the sequence of their edges)
+            range : Tuple[int, int] : The range covered by the bins (the range of the values if None)
+        Returns:
+            Tuple[np.ndarray, np.ndarray] : The count of treasures per bin and the edges of the bins, as np.histogram
+        '''
+
+        if values not in HISTOGRAM_VALUES:
+            raise ValueError(f"histogram values must be one of {', '.join(HISTOGRAM_VALUES)}, not {values!r}")
+        column = {"flow": self.flow_times, "wait": self.wait_times, "size": lambda: self.size}[values]()
+        return np.histogram(column, bins=bins, range=range)
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES):
+        '''
+        Arguments:
+            percentiles : Sequence[float] : The flow time percentiles reported
+        Returns:
+            Dict : treasures, crewmates, makespan, total_size, mean_flow, max_flow, mean_wait, flow_percentiles,
+                   utilization (total size over m times the makespan) and preemptions
+        Time Complexity:
+            O(n log(n)) where n is the number of Treasures
+        '''
+
+        n = len(self)
+        makespan = self.makespan()
+        flow = self.flow_times()
+        total_size = int(self.size.sum())
+        return {
+            "treasures": n,
+            "crewmates": self.m,
+            "makespan": makespan,
+            "total_size": total_size,
+            "mean_flow": float(flow.mean()) if n > 0 else 0.0,
+            "max_flow": int(flow.max()) if n > 0 else 0,
+            "mean_wait": float(self.wait_times().mean()) if n > 0 else 0.0,
+            "flow_percentiles": self.flow_percentiles(percentiles),
+            "utilization": total_size / (self.m * makespan) if makespan > 0 else 0.0,
+            "preemptions": int(self.preempting().sum()),
+        }
@@ -1,8 +1,10 @@
 class CrewMate:
-    def __init__(self):
+    __slots__ = ('id', 'treasure', 'key', 'is_taken', 'priority_list', 'processed_time', 'completed', 'simulated', 'is_dirty', 'watermark', 'clock', 'handle', 'speed')
+
+    def __init__(self, id=0):
         '''
         Arguments:
-            None
+            id : int : The index of the crewmate, used to break ties between crewmates with the same key
         Returns:
             None
         Description:
@@ -10,6 +12,43 @@ class CrewMate:
         '''
         
         # Write your code here
+        self.id = id
         self.treasure = []
         self.key = 0 # it is the free time after which the crew will be free
         self.is_taken = False
+
+        # Simulation state kept between calls of get_completion_time
+        self.priority_list = None # heap of [rem_size + arrival_time, id, treasure] entries still pending after the last simulated arrival
+        self.processed_time = 0 # time up to which the crew has been simulated
+        self.completed = [] # treasures finished before the last simulated arrival, in completion order
+        self.simulated = 0 # number of treasures of self.treasure already fed into the simulation
+        self.is_dirty = False # True if treasures were added since the last simulation
+        self.watermark = 0 # index in self.treasure of the last simulated arrival which found the queue empty
+
+        # State of the crewmate in the event-driven clock of the treasury (None until the clock is started)
+        self.clock = None
+
+        # HeapHandle of the crewmate in the crew heap of its treasury, to re-key it wherever it is in the heap
+        self.handle = None
+
+        # Size units processed per time unit, only used by MixedSpeedTreasury (StrawHatTreasury works at speed 1)
+        self.speed = 1
+
+class CrewClock:
+    __slots__ = ('priority_list', 'processed_time', 'simulated', 'load')
+
+    def __init__(self, priority_list):
+        '''
+        Arguments:
+            priority_list : KeyHeap : An empty heap for the treasures in the crewmate's queue
+        Returns:
+            None
+        Description:
+            Initializes the state of a crewmate in the event-driven clock of the treasury
+            It is kept apart from the state used by get_completion_time, which is always at the last arrival
+        '''
+
+        self.priority_list = priority_list # heap of [rem_size + arrival_time, id, treasure] entries in the queue at processed_time
+        self.processed_time = 0 # time of the last event of the crewmate
+        self.simulated = 0 # number of treasures of the crewmate which arrived up to processed_time
+        self.load = 0 # total remaining size of the queue at processed_time
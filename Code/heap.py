@@ -1,3 +1,5 @@
+import bisect
+
 class Heap:
     def __init__(self,comparison_function, init_array):
         '''
@@ -106,19 +108,968 @@ class Heap:
         '''
         Helper function to maintain heap property after extraction.
         '''
+        while True:
+            left_child = 2 * index + 1
+            right_child = 2 * index + 2
+            smallest = index
+
+            # Compare with left child
+            if left_child < self.size and self.comparison_function(self.heap[left_child], self.heap[smallest]):
+                smallest = left_child
+
+            # Compare with right child
+            if right_child < self.size and self.comparison_function(self.heap[right_child], self.heap[smallest]):
+                smallest = right_child
+
+            # If the current node is the smallest the heap property holds, else swap with the smallest child and continue
+            if smallest == index:
+                break
+            self.heap[index], self.heap[smallest] = self.heap[smallest], self.heap[index]
+            index = smallest
+
+class KeyHeap:
+    def __init__(self, key_function, init_array, init_keys=None):
+        '''
+        Arguments:
+            key_function : function : A function that takes in one argument and returns its sort key (None if the values are their own keys)
+            init_array : List[Any] : The initial array to be inserted into the heap
+            init_keys : List[Any] : The precomputed keys of init_array (computed with key_function if None)
+        Returns:
+            None
+        Description:
+            Initializes a min heap ordered by sort keys instead of a comparison function
+            The key of a value is computed once when it is inserted and kept in a list parallel to the values,
+            so every sift step is a single < between keys (tuples such as (arrival + remaining, id) break ties)
+            Orders the values exactly like Heap with the comparison function lambda x, y: key(x) < key(y)
+        Time Complexity:
+            O(n) where n is the number of elements in init_array
+        '''
+
+        self.key_function = key_function
+        self.heap = init_array[:]  # Create a copy of the input array
+        if init_keys is not None:
+            self.keys = init_keys[:]
+        elif key_function is not None:
+            self.keys = [key_function(value) for value in init_array]
+        else:
+            self.keys = init_array[:]
+        self.size = len(init_array)
+        self._build_heap()
+
+    def _build_heap(self):
+        # Heapify the array in O(n) time
+        for i in range(self.size // 2 - 1, -1, -1):
+            self._heapify_down(i)
+
+    def _key(self, value, key):
+        if key is not None:
+            return key
+        if self.key_function is not None:
+            return self.key_function(value)
+        return value
+
+    def insert(self, value, key=None):
+        '''
+        Arguments:
+            value : Any : The value to be inserted into the heap
+            key : Any : The precomputed key of the value (computed with key_function if None)
+        Returns:
+            None
+        Description:
+            Inserts a value into the heap
+        Time Complexity:
+            O(log(n)) where n is the number of elements currently in the heap
+        '''
+
+        self.heap.append(value)
+        self.keys.append(self._key(value, key))
+        self.size += 1
+        self._heapify_up(self.size - 1)
+
+    def extract(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Any : The value extracted from the top of heap
+        Description:
+            Extracts the value from the top of heap, i.e. removes it from heap
+        Time Complexity:
+            O(log(n)) where n is the number of elements currently in the heap
+        '''
+
+        if self.size == 0:
+            return None
+
+        top_value = self.heap[0]
+        last_value = self.heap.pop()
+        last_key = self.keys.pop()
+        self.size -= 1
+
+        if self.size > 0:
+            self.heap[0] = last_value
+            self.keys[0] = last_key
+            self._heapify_down(0)
+
+        return top_value
+
+    def top(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Any : The value at the top of heap
+        Description:
+            Returns the value at the top of heap
+        Time Complexity:
+            O(1)
+        '''
+
+        if self.size == 0:
+            return None
+        return self.heap[0]
+
+    def top_key(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Any : The key of the value at the top of heap
+        Description:
+            Returns the key of the value at the top of heap
+        Time Complexity:
+            O(1)
+        '''
+
+        if self.size == 0:
+            return None
+        return self.keys[0]
+
+    def replace_top(self, value, key=None):
+        '''
+        Arguments:
+            value : Any : The value replacing the top of heap
+            key : Any : The precomputed key of the value (computed with key_function if None)
+        Returns:
+            Any : The value previously at the top of heap
+        Description:
+            Extracts the top of heap and inserts the value with a single sift down
+        Time Complexity:
+            O(log(n)) where n is the number of elements currently in the heap
+        '''
+
+        if self.size == 0:
+            self.insert(value, key)
+            return None
+
+        top_value = self.heap[0]
+        self.heap[0] = value
+        self.keys[0] = self._key(value, key)
+        self._heapify_down(0)
+        return top_value
+
+    def pushpop(self, value, key=None):
+        '''
+        Arguments:
+            value : Any : The value to be inserted into the heap
+            key : Any : The precomputed key of the value (computed with key_function if None)
+        Returns:
+            Any : The smallest value among the heap and the inserted value
+        Description:
+            Inserts the value and extracts the top of heap, without touching the heap if the value is the smallest
+        Time Complexity:
+            O(log(n)) where n is the number of elements currently in the heap
+        '''
+
+        key = self._key(value, key)
+        if self.size == 0 or not self.keys[0] < key:
+            return value
+
+        top_value = self.heap[0]
+        self.heap[0] = value
+        self.keys[0] = key
+        self._heapify_down(0)
+        return top_value
+
+    def copy(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            KeyHeap : A copy of the heap
+        Description:
+            Copies the values and keys without heapifying them again
+        Time Complexity:
+            O(n) where n is the number of elements currently in the heap
+        '''
+
+        other = type(self).__new__(type(self))
+        other.key_function = self.key_function
+        other.heap = self.heap[:]
+        other.keys = self.keys[:]
+        other.size = self.size
+        return other
+
+    def _heapify_up(self, index):
+        '''
+        Helper function to maintain heap property when an element is inserted.
+        Moves the parents down into the hole instead of swapping at every level.
+        '''
+        heap = self.heap
+        keys = self.keys
+        value = heap[index]
+        key = keys[index]
+
+        while index > 0:
+            parent = (index - 1) // 2
+            if not key < keys[parent]:
+                break
+            heap[index] = heap[parent]
+            keys[index] = keys[parent]
+            index = parent
+
+        heap[index] = value
+        keys[index] = key
+
+    def _heapify_down(self, index):
+        '''
+        Helper function to maintain heap property after extraction.
+        Moves the smaller child up into the hole instead of swapping at every level.
+        '''
+        heap = self.heap
+        keys = self.keys
+        size = self.size
+        value = heap[index]
+        key = keys[index]
+
         left_child = 2 * index + 1
-        right_child = 2 * index + 2
-        smallest = index
+        while left_child < size:
+            smallest = left_child
+            smallest_key = keys[left_child]
+            if not smallest_key < key:
+                smallest = index
+                smallest_key = key
+
+            # Compare with right child
+            right_child = left_child + 1
+            if right_child < size and keys[right_child] < smallest_key:
+                smallest = right_child
+
+            if smallest == index:
+                break
+            heap[index] = heap[smallest]
+            keys[index] = keys[smallest]
+            index = smallest
+            left_child = 2 * index + 1
+
+        heap[index] = value
+        keys[index] = key
 
-        # Compare with left child
-        if left_child < self.size and self.comparison_function(self.heap[left_child], self.heap[smallest]):
+class HeapHandle:
+    __slots__ = ('value', 'index')
+
+    def __init__(self, value, index):
+        self.value = value
+        self.index = index # position of the value in the heap, -1 once it is removed
+
+class IndexedKeyHeap(KeyHeap):
+    def __init__(self, key_function, init_array, init_keys=None):
+        '''
+        Arguments:
+            key_function : function : A function that takes in one argument and returns its sort key (None if the values are their own keys)
+            init_array : List[Any] : The initial array to be inserted into the heap
+            init_keys : List[Any] : The precomputed keys of init_array (computed with key_function if None)
+        Returns:
+            None
+        Description:
+            KeyHeap tracking the position of every value in a HeapHandle, so that any value can be re-keyed or removed,
+            not only the top
+            self.handles is parallel to self.heap and self.keys; insert returns the handle of the value,
+            and the handles of init_array can be read from self.handles
+        Time Complexity:
+            O(n) where n is the number of elements in init_array
+        '''
+
+        self.handles = [HeapHandle(value, i) for i, value in enumerate(init_array)]
+        super().__init__(key_function, init_array, init_keys)
+
+    def insert(self, value, key=None):
+        '''
+        Arguments:
+            value : Any : The value to be inserted into the heap
+            key : Any : The precomputed key of the value (computed with key_function if None)
+        Returns:
+            HeapHandle : The handle of the value, valid until it is extracted or removed
+        Description:
+            Inserts a value into the heap
+        Time Complexity:
+            O(log(n)) where n is the number of elements currently in the heap
+        '''
+
+        handle = HeapHandle(value, self.size)
+        self.heap.append(value)
+        self.keys.append(self._key(value, key))
+        self.handles.append(handle)
+        self.size += 1
+        self._heapify_up(self.size - 1)
+        return handle
+
+    def extract(self):
+        if self.size == 0:
+            return None
+        return self.remove(self.handles[0])
+
+    def replace_top(self, value, key=None):
+        '''
+        Same as KeyHeap.replace_top, the handle of the top is kept and refers to the new value,
+        so replacing the top by itself with a new key keeps its handle
+        '''
+        if self.size > 0:
+            self.handles[0].value = value
+        return super().replace_top(value, key)
+
+    def pushpop(self, value, key=None):
+        '''
+        Same as KeyHeap.pushpop, the handle of the top passes to the value if the value is inserted
+        '''
+        key = self._key(value, key)
+        if self.size == 0 or not self.keys[0] < key:
+            return value
+        self.handles[0].value = value
+        return KeyHeap.replace_top(self, value, key)
+
+    def peek_key(self, handle):
+        '''
+        Arguments:
+            handle : HeapHandle : The handle of a value in the heap
+        Returns:
+            Any : The key of the value
+        Time Complexity:
+            O(1)
+        '''
+
+        return self.keys[self._position(handle)]
+
+    def update_key(self, handle, key=None):
+        '''
+        Arguments:
+            handle : HeapHandle : The handle of a value in the heap
+            key : Any : The new key of the value (computed with key_function if None)
+        Returns:
+            None
+        Description:
+            Changes the key of the value wherever it is, sifting it up if the key decreased and down otherwise
+        Time Complexity:
+            O(log(n)) where n is the number of elements currently in the heap
+        '''
+
+        index = self._position(handle)
+        key = self._key(handle.value, key)
+        decreased = key < self.keys[index]
+        self.keys[index] = key
+        if decreased:
+            self._heapify_up(index)
+        else:
+            self._heapify_down(index)
+
+    def remove(self, handle):
+        '''
+        Arguments:
+            handle : HeapHandle : The handle of a value in the heap
+        Returns:
+            Any : The value removed
+        Description:
+            Removes the value wherever it is: the last value takes its place and is sifted up or down
+            The handle is no longer valid afterwards
+        Time Complexity:
+            O(log(n)) where n is the number of elements currently in the heap
+        '''
+
+        index = self._position(handle)
+        last_value = self.heap.pop()
+        last_key = self.keys.pop()
+        last_handle = self.handles.pop()
+        self.size -= 1
+        handle.index = -1
+
+        if index < self.size:
+            removed_key = self.keys[index]
+            self.heap[index] = last_value
+            self.keys[index] = last_key
+            self.handles[index] = last_handle
+            last_handle.index = index
+            if last_key < removed_key:
+                self._heapify_up(index)
+            else:
+                self._heapify_down(index)
+
+        return handle.value
+
+    def copy(self):
+        '''
+        Same as KeyHeap.copy, the copy has its own handles (the handles of this heap do not refer to it)
+        '''
+        other = super().copy()
+        other.handles = [HeapHandle(handle.value, handle.index) for handle in self.handles]
+        return other
+
+    def _position(self, handle):
+        index = handle.index
+        if index < 0 or index >= self.size or self.handles[index] is not handle:
+            raise ValueError("the handle does not belong to a value in the heap")
+        return index
+
+    def _heapify_up(self, index):
+        '''
+        Same as KeyHeap._heapify_up, the handles move with their values
+        '''
+        heap = self.heap
+        keys = self.keys
+        handles = self.handles
+        value = heap[index]
+        key = keys[index]
+        handle = handles[index]
+
+        while index > 0:
+            parent = (index - 1) // 2
+            if not key < keys[parent]:
+                break
+            heap[index] = heap[parent]
+            keys[index] = keys[parent]
+            moved = handles[parent]
+            handles[index] = moved
+            moved.index = index
+            index = parent
+
+        heap[index] = value
+        keys[index] = key
+        handles[index] = handle
+        handle.index = index
+
+    def _heapify_down(self, index):
+        '''
+        Same as KeyHeap._heapify_down, the handles move with their values
+        '''
+        heap = self.heap
+        keys = self.keys
+        handles = self.handles
+        size = self.size
+        value = heap[index]
+        key = keys[index]
+        handle = handles[index]
+
+        left_child = 2 * index + 1
+        while left_child < size:
             smallest = left_child
+            smallest_key = keys[left_child]
+            if not smallest_key < key:
+                smallest = index
+                smallest_key = key
+
+            right_child = left_child + 1
+            if right_child < size and keys[right_child] < smallest_key:
+                smallest = right_child
+
+            if smallest == index:
+                break
+            heap[index] = heap[smallest]
+            keys[index] = keys[smallest]
+            moved = handles[smallest]
+            handles[index] = moved
+            moved.index = index
+            index = smallest
+            left_child = 2 * index + 1
+
+        heap[index] = value
+        keys[index] = key
+        handles[index] = handle
+        handle.index = index
+
+class RadixQueue:
+    def __init__(self, init_array):
+        '''
+        Arguments:
+            init_array : List[List] : The initial entries, lists whose first item is a non-negative integer key
+        Returns:
+            None
+        Description:
+            Monotone priority queue of the entries [key, id, ...] of a crewmate's queue, ordered like KeyHeap(None, ...)
+            (by key, then id), with the interface of KeyHeap used on priority_list
+            A radix heap keeps the entries whose key is at least self.base in buckets, the entry of key k in
+            bucket (k ^ base).bit_length(): inserting is an append, and finding the least entry takes the first
+            non-empty bucket, raises base to its least key and spreads it over the lower buckets, so every entry is
+            moved at most once per bit of its key
+            The top entry is kept apart in self.current, so it can be lowered in place like the top of priority_list;
+            the key of an entry pushed out of the top (or inserted) below base cannot go to the buckets, which only
+            hold keys from base on, so it goes to the KeyHeap self.low, and the entries with key == base are kept
+            sorted by id in self.zero
+        Time Complexity:
+            O(n) where n is the number of elements in init_array
+        '''
+
+        self.base = min((entry[0] for entry in init_array), default=0)
+        self.buckets = [[]]
+        self.mask = 0 # bit i set if bucket i is not empty
+        self.zero = [] # entries with key == base, by decreasing id
+        self.low = KeyHeap(None, []) # entries with key < base
+        self.current = None # least entry
+        self.size = 0
+        for entry in init_array:
+            self.insert(entry)
+
+    @property
+    def heap(self):
+        # All the entries, in no particular order
+        entries = [self.current] if self.current is not None else []
+        entries.extend(self.zero)
+        entries.extend(self.low.heap)
+        for bucket in self.buckets:
+            entries.extend(bucket)
+        return entries
+
+    def insert(self, value, key=None):
+        '''
+        Arguments:
+            value : List : The entry to be inserted (its own key)
+            key : None : Unused, for the interface of KeyHeap
+        Returns:
+            None
+        Description:
+            Inserts the entry, which becomes the top if it is the least one
+        Time Complexity:
+            O(1), O(log(n)) if the entry goes to self.low or self.zero
+        '''
+
+        self.size += 1
+        current = self.current
+        if current is None:
+            self.current = value
+            return
+        if value < current:
+            self.current = value
+            value = current
+        self._push(value)
+
+    def _push(self, value):
+        key = value[0]
+        base = self.base
+        if key > base:
+            index = (key ^ base).bit_length()
+            buckets = self.buckets
+            while len(buckets) <= index:
+                buckets.append([])
+            buckets[index].append(value)
+            self.mask |= 1 << index
+        elif key == base:
+            bisect.insort(self.zero, value, key=lambda entry: -entry[1])
+        else:
+            self.low.insert(value)
+
+    def _pop(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            List : The least entry apart from self.current, removed from the queue (None if there is none)
+        Description:
+            If no entry has key == base, raises base to the least key of the first non-empty bucket
+            and spreads that bucket over the lower buckets and self.zero
+        Time Complexity:
+            O(log(K)) amortized where K is the largest key
+        '''
+
+        zero = self.zero
+        if not zero and self.mask:
+            index = (self.mask & -self.mask).bit_length() - 1
+            bucket = self.buckets[index]
+            self.buckets[index] = []
+            mask = self.mask ^ (1 << index)
+            base = min(bucket)[0]
+            buckets = self.buckets
+            for entry in bucket:
+                key = entry[0]
+                if key == base:
+                    zero.append(entry)
+                else:
+                    # The highest bit where key and base differ is below the one of this bucket
+                    index = (key ^ base).bit_length()
+                    buckets[index].append(entry)
+                    mask |= 1 << index
+            if len(zero) > 1:
+                zero.sort(key=lambda entry: -entry[1])
+            self.base = base
+            self.mask = mask
+
+        low = self.low
+        if low.size > 0 and (not zero or low.heap[0] < zero[-1]):
+            return low.extract()
+        if zero:
+            return zero.pop()
+        return None
+
+    def top(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            List : The least entry (None if the queue is empty)
+        Time Complexity:
+            O(1)
+        '''
+
+        return self.current
+
+    def extract(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            List : The least entry, removed from the queue (None if the queue is empty)
+        Time Complexity:
+            O(log(K) + log(l)) amortized where
+                K : The largest key
+                l : Number of entries below base
+        '''
+
+        value = self.current
+        if value is None:
+            return None
+        self.size -= 1
+        self.current = self._pop()
+        return value
+
+    def copy(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            RadixQueue : A copy of the queue, sharing the entries
+        Time Complexity:
+            O(n) where n is the number of elements currently in the queue
+        '''
+
+        other = type(self).__new__(type(self))
+        other.base = self.base
+        other.buckets = [bucket[:] for bucket in self.buckets]
+        other.mask = self.mask
+        other.zero = self.zero[:]
+        other.low = self.low.copy()
+        other.current = self.current
+        other.size = self.size
+        return other
+
+class HeapStats:
+    __slots__ = ('comparisons', 'swaps', 'inserts', 'extracts')
+
+    def __init__(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            None
+        Description:
+            Initializes the counters of CountingHeap, CountingKeyHeap and CountingIndexedKeyHeap
+            One HeapStats can be shared by many heaps to count their operations together
+        '''
+
+        self.comparisons = 0 # comparisons between two values (or keys)
+        self.swaps = 0 # values moved by one level, by a swap in Heap or into the hole in KeyHeap
+        self.inserts = 0 # values inserted, replace_top and pushpop counting as one insert and one extract
+        self.extracts = 0 # values extracted
+
+    def snapshot(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Dict[str, int] : The current value of every counter
+        Description:
+            Returns a copy of the counters, which is not modified by later operations
+        Time Complexity:
+            O(1)
+        '''
+
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class CountingHeap(Heap):
+    def __init__(self, comparison_function, init_array, stats=None):
+        '''
+        Arguments:
+            comparison_function : function : A function that takes in two arguments and returns a boolean value
+            init_array : List[Any] : The initial array to be inserted into the heap
+            stats : HeapStats : The counters to be updated (new ones if None)
+        Returns:
+            None
+        Description:
+            Heap counting its comparisons, swaps, inserts and extracts in self.stats
+            Heap itself has no counting code, so using Heap when the counters are not needed costs nothing
+        Time Complexity:
+            O(n) where n is the number of elements in init_array
+        '''
+
+        self.stats = stats if stats is not None else HeapStats()
+
+        def counted_comparison(a, b):
+            self.stats.comparisons += 1
+            return comparison_function(a, b)
+
+        super().__init__(counted_comparison, init_array)
+
+    def insert(self, value):
+        self.stats.inserts += 1
+        super().insert(value)
+
+    def extract(self):
+        if self.size > 0:
+            self.stats.extracts += 1
+        return super().extract()
 
-        # Compare with right child
-        if right_child < self.size and self.comparison_function(self.heap[right_child], self.heap[smallest]):
-            smallest = right_child
+    def _heapify_up(self, index):
+        parent = (index - 1) // 2
+        while index > 0 and self.comparison_function(self.heap[index], self.heap[parent]):
+            self.heap[index], self.heap[parent] = self.heap[parent], self.heap[index]
+            self.stats.swaps += 1
+            index = parent
+            parent = (index - 1) // 2
 
-        # If the current node is not the smallest, swap with the smallest child and recurse
-        if smallest != index:
+    def _heapify_down(self, index):
+        while True:
+            left_child = 2 * index + 1
+            right_child = 2 * index + 2
+            smallest = index
+
+            if left_child < self.size and self.comparison_function(self.heap[left_child], self.heap[smallest]):
+                smallest = left_child
+            if right_child < self.size and self.comparison_function(self.heap[right_child], self.heap[smallest]):
+                smallest = right_child
+
+            if smallest == index:
+                break
             self.heap[index], self.heap[smallest] = self.heap[smallest], self.heap[index]
-            self._heapify_down(smallest)
\ No newline at end of file
+            self.stats.swaps += 1
+            index = smallest
+
+class CountingKeyHeap(KeyHeap):
+    def __init__(self, key_function, init_array, init_keys=None, stats=None):
+        '''
+        Arguments:
+            key_function : function : A function that takes in one argument and returns its sort key (None if the values are their own keys)
+            init_array : List[Any] : The initial array to be inserted into the heap
+            init_keys : List[Any] : The precomputed keys of init_array (computed with key_function if None)
+            stats : HeapStats : The counters to be updated (new ones if None)
+        Returns:
+            None
+        Description:
+            KeyHeap counting its key comparisons, moves, inserts and extracts in self.stats
+            KeyHeap itself has no counting code, so using KeyHeap when the counters are not needed costs nothing
+        Time Complexity:
+            O(n) where n is the number of elements in init_array
+        '''
+
+        self.stats = stats if stats is not None else HeapStats()
+        super().__init__(key_function, init_array, init_keys)
+
+    def insert(self, value, key=None):
+        self.stats.inserts += 1
+        super().insert(value, key)
+
+    def extract(self):
+        if self.size > 0:
+            self.stats.extracts += 1
+        return super().extract()
+
+    def replace_top(self, value, key=None):
+        # On an empty heap replace_top is an insert, counted by insert
+        if self.size > 0:
+            self.stats.inserts += 1
+            self.stats.extracts += 1
+        return super().replace_top(value, key)
+
+    def pushpop(self, value, key=None):
+        self.stats.inserts += 1
+        self.stats.extracts += 1
+        if self.size > 0:
+            self.stats.comparisons += 1
+        return super().pushpop(value, key)
+
+    def copy(self):
+        # The copy updates the same counters
+        other = super().copy()
+        other.stats = self.stats
+        return other
+
+    def _heapify_up(self, index):
+        heap = self.heap
+        keys = self.keys
+        stats = self.stats
+        value = heap[index]
+        key = keys[index]
+
+        while index > 0:
+            parent = (index - 1) // 2
+            stats.comparisons += 1
+            if not key < keys[parent]:
+                break
+            heap[index] = heap[parent]
+            keys[index] = keys[parent]
+            stats.swaps += 1
+            index = parent
+
+        heap[index] = value
+        keys[index] = key
+
+    def _heapify_down(self, index):
+        heap = self.heap
+        keys = self.keys
+        stats = self.stats
+        size = self.size
+        value = heap[index]
+        key = keys[index]
+
+        left_child = 2 * index + 1
+        while left_child < size:
+            smallest = left_child
+            smallest_key = keys[left_child]
+            stats.comparisons += 1
+            if not smallest_key < key:
+                smallest = index
+                smallest_key = key
+
+            right_child = left_child + 1
+            if right_child < size:
+                stats.comparisons += 1
+                if keys[right_child] < smallest_key:
+                    smallest = right_child
+
+            if smallest == index:
+                break
+            heap[index] = heap[smallest]
+            keys[index] = keys[smallest]
+            stats.swaps += 1
+            index = smallest
+            left_child = 2 * index + 1
+
+        heap[index] = value
+        keys[index] = key
+
+class CountingIndexedKeyHeap(IndexedKeyHeap):
+    def __init__(self, key_function, init_array, init_keys=None, stats=None):
+        '''
+        Arguments:
+            key_function : function : A function that takes in one argument and returns its sort key (None if the values are their own keys)
+            init_array : List[Any] : The initial array to be inserted into the heap
+            init_keys : List[Any] : The precomputed keys of init_array (computed with key_function if None)
+            stats : HeapStats : The counters to be updated (new ones if None)
+        Returns:
+            None
+        Description:
+            IndexedKeyHeap counting its key comparisons, moves, inserts and extracts in self.stats,
+            update_key counting as one insert and one extract and remove as one extract
+        Time Complexity:
+            O(n) where n is the number of elements in init_array
+        '''
+
+        self.stats = stats if stats is not None else HeapStats()
+        super().__init__(key_function, init_array, init_keys)
+
+    def insert(self, value, key=None):
+        self.stats.inserts += 1
+        return super().insert(value, key)
+
+    def remove(self, handle):
+        self.stats.extracts += 1
+        return super().remove(handle)
+
+    def replace_top(self, value, key=None):
+        # On an empty heap replace_top is an insert, counted by insert
+        if self.size > 0:
+            self.stats.inserts += 1
+            self.stats.extracts += 1
+        return super().replace_top(value, key)
+
+    def pushpop(self, value, key=None):
+        self.stats.inserts += 1
+        self.stats.extracts += 1
+        if self.size > 0:
+            self.stats.comparisons += 1
+        return super().pushpop(value, key)
+
+    def update_key(self, handle, key=None):
+        self.stats.inserts += 1
+        self.stats.extracts += 1
+        self.stats.comparisons += 1
+        super().update_key(handle, key)
+
+    def copy(self):
+        # The copy updates the same counters
+        other = super().copy()
+        other.stats = self.stats
+        return other
+
+    def _heapify_up(self, index):
+        heap = self.heap
+        keys = self.keys
+        handles = self.handles
+        stats = self.stats
+        value = heap[index]
+        key = keys[index]
+        handle = handles[index]
+
+        while index > 0:
+            parent = (index - 1) // 2
+            stats.comparisons += 1
+            if not key < keys[parent]:
+                break
+            heap[index] = heap[parent]
+            keys[index] = keys[parent]
+            moved = handles[parent]
+            handles[index] = moved
+            moved.index = index
+            stats.swaps += 1
+            index = parent
+
+        heap[index] = value
+        keys[index] = key
+        handles[index] = handle
+        handle.index = index
+
+    def _heapify_down(self, index):
+        heap = self.heap
+        keys = self.keys
+        handles = self.handles
+        stats = self.stats
+        size = self.size
+        value = heap[index]
+        key = keys[index]
+        handle = handles[index]
+
+        left_child = 2 * index + 1
+        while left_child < size:
+            smallest = left_child
+            smallest_key = keys[left_child]
+            stats.comparisons += 1
+            if not smallest_key < key:
+                smallest = index
+                smallest_key = key
+
+            right_child = left_child + 1
+            if right_child < size:
+                stats.comparisons += 1
+                if keys[right_child] < smallest_key:
+                    smallest = right_child
+
+            if smallest == index:
+                break
+            heap[index] = heap[smallest]
+            keys[index] = keys[smallest]
+            moved = handles[smallest]
+            handles[index] = moved
+            moved.index = index
+            stats.swaps += 1
+            index = smallest
+            left_child = 2 * index + 1
+
+        heap[index] = value
+        keys[index] = key
+        handles[index] = handle
+        handle.index = index
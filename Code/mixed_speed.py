@@ -0,0 +1,270 @@
+'''
+Treasury whose crewmates process the treasures at different speeds
+
+MixedSpeedTreasury gives every crewmate a speed, the size it processes per unit of time, and assigns each treasure to
+the crewmate which would finish it earliest. The crewmates of each speed share one heap of a CrewSpeedHeap, so the choice
+compares one candidate per distinct speed. Times are exact: they are Fractions, turned back into ints by exact
+whenever the denominator is 1, so unit speeds schedule exactly like StrawHatTreasury.
+'''
+
+import crewmate
+import heap
+import straw_hat
+import fractions
+
+
+def exact(value):
+    # A Fraction with denominator 1 is returned as an int, so that unit speeds keep integer times
+    if isinstance(value, fractions.Fraction) and value.denominator == 1:
+        return value.numerator
+    return value
+
+
+class CrewSpeedHeap:
+    def __init__(self, crewmates):
+        '''
+        Arguments:
+            crewmates : List[CrewMate] : The crewmates, with their speed set
+        Returns:
+            None
+        Description:
+            Crew heap of a MixedSpeedTreasury: one IndexedKeyHeap keyed by (free time, id) per speed
+            Within one speed the crewmate free first also finishes a new treasure first, so only the top of each
+            heap can be the crewmate with the earliest projected finish
+            Offers the parts of the IndexedKeyHeap interface used on crew_heap (heap, handles, size, insert,
+            remove, update_key), each handle going to the heap of the speed of its crewmate
+        Time Complexity:
+            O(m) where m : Number of Crew Mates
+        '''
+
+        by_speed = {}
+        for crew in crewmates:
+            by_speed.setdefault(crew.speed, []).append(crew)
+        self.heaps = {speed: heap.IndexedKeyHeap(straw_hat.crew_key, crews) for speed, crews in by_speed.items()}
+
+    @property
+    def heap(self):
+        return [crew for speed_heap in self.heaps.values() for crew in speed_heap.heap]
+
+    @property
+    def handles(self):
+        return [handle for speed_heap in self.heaps.values() for handle in speed_heap.handles]
+
+    @property
+    def size(self):
+        return sum(speed_heap.size for speed_heap in self.heaps.values())
+
+    def insert(self, crew, key=None):
+        if crew.speed not in self.heaps:
+            self.heaps[crew.speed] = heap.IndexedKeyHeap(straw_hat.crew_key, [])
+        return self.heaps[crew.speed].insert(crew, key)
+
+    def remove(self, handle):
+        return self.heaps[handle.value.speed].remove(handle)
+
+    def update_key(self, handle, key=None):
+        self.heaps[handle.value.speed].update_key(handle, key)
+
+    def best(self, arrival_time, size):
+        '''
+        Arguments:
+            arrival_time : int : The arrival time of a treasure
+            size : int : Its size
+        Returns:
+            CrewMate : The crewmate finishing the treasure first if it is assigned to it, ties broken by (free time, id)
+        Time Complexity:
+            O(s) where s : Number of different speeds
+        '''
+
+        best_crew = None
+        best_key = None
+        for speed, speed_heap in self.heaps.items():
+            if speed_heap.size == 0:
+                continue
+            crew = speed_heap.top()
+            key = (max(crew.key, arrival_time) + size / speed, crew.key, crew.id)
+            if best_key is None or key < best_key:
+                best_crew, best_key = crew, key
+        return best_crew
+
+
+class MixedSpeedTreasury(straw_hat.StrawHatTreasury):
+    def __init__(self, speeds):
+        '''
+        Arguments:
+            speeds : List[int | Fraction] : The speed of each crewmate, in size units processed per time unit (positive)
+        Returns:
+            None
+        Description:
+            Initializes a StrawHatTreasury whose crewmates work at different speeds
+            A treasure goes to the crewmate which would finish it first, max(free time, arrival) + size / speed,
+            ties broken by the least free time then id; with equal speeds this is the crewmate with the least load
+            Each crewmate still processes the treasure of least arrival_time + remaining size, and a remaining size
+            decreases by speed per time unit
+            Times are exact Fractions, and ints whenever they are integers (always with unit speeds)
+            It supports only the arrivals (add_treasure, add_treasures, add_crewmates) and the queries (get_completion_time,
+            iter_completions, completion_time_of) with retire: the clock (advance_to and the queries at its time),
+            retire_crewmate and cancel_treasure run the queues at unit speed, and save, load and schedule_columns
+            write integer times
+            get_completion_time always simulates in this process
+        Time Complexity:
+            O(m) where m : Number of Crew Mates
+        '''
+
+        self.speeds = [fractions.Fraction(speed) for speed in speeds]
+        if any(speed <= 0 for speed in self.speeds):
+            raise ValueError("the speeds of the crewmates must be positive")
+        super().__init__(len(self.speeds))
+
+    def _new_crew_heap(self, crewmates):
+        for crew in crewmates:
+            crew.speed = self.speeds[crew.id]
+        return CrewSpeedHeap(crewmates)
+
+    def add_treasure(self, treasure):
+        '''
+        Arguments:
+            treasure : Treasure : The treasure to be added to the treasury
+        Returns:
+            None
+        Description:
+            Adds the treasure to the crewmate with the earliest projected finish and updates its free time
+        Time Complexity:
+            O(s log(m)) where
+                m : Number of Crew Mates
+                s : Number of different speeds
+            as CrewSpeedHeap.best compares the top crewmate of every speed before the chosen one is sifted in its heap
+        '''
+
+        self._check_arrival(treasure.id, treasure.arrival_time)
+        if self.latest_arrival is None or treasure.arrival_time > self.latest_arrival:
+            self.latest_arrival = treasure.arrival_time
+
+        crew = self.crew_heap.best(treasure.arrival_time, treasure.size)
+        crew.treasure.append(treasure)
+        crew.key = exact(max(crew.key, treasure.arrival_time) + treasure.size / crew.speed)
+
+        if crew.is_taken == False:
+            crew.is_taken = True
+            self.taken_crew.append(crew)
+        if crew.is_dirty == False:
+            crew.is_dirty = True
+            self.dirty_crew.append(crew)
+        self.new_treasure.append(treasure)
+
+        if self.crew_of is not None:
+            self.crew_of[treasure.id] = crew
+            self.treasure_of[treasure.id] = treasure
+
+        self._update_crew(crew)
+
+    def add_treasures(self, treasures):
+        '''
+        Arguments:
+            treasures : Iterable[Treasure] : The treasures to be added to the treasury, in the order of their arrival
+        Returns:
+            None
+        Description:
+            Adds the treasures one after the other with add_treasure: the size of each treasure is divided by the speed
+            of the crewmate it may go to, so the projected finish times and the free times of the crewmates are
+            Fractions (ints when they are integers)
+        Time Complexity:
+            O(k s log(m)) where
+                m : Number of Crew Mates
+                s : Number of different speeds
+                k : Number of Treasures added
+        '''
+
+        for treasure in treasures:
+            self.add_treasure(treasure)
+
+    def add_crewmates(self, k, speed=1):
+        '''
+        Arguments:
+            k : int : Number of Crew Mates to be added
+            speed : int | Fraction : Their speed (positive)
+        Returns:
+            List[int] : The ids of the new crewmates
+        Time Complexity:
+            O(k log(m)) where m : Number of Crew Mates
+        '''
+
+        speed = fractions.Fraction(speed)
+        if speed <= 0:
+            raise ValueError("the speeds of the crewmates must be positive")
+        new_ids = []
+        for _ in range(k):
+            crew = crewmate.CrewMate(self.number_crew)
+            crew.speed = speed
+            crew.handle = self.crew_heap.insert(crew, (crew.key, crew.id))
+            self.crew_by_id.append(crew)
+            self.speeds.append(speed)
+            self.number_crew += 1
+            new_ids.append(crew.id)
+        return new_ids
+
+    def _advance_crew(self, crew, stop=None):
+        '''
+        Same as StrawHatTreasury._advance_crew, the top treasure needs remaining size / speed time units
+        to complete and loses speed size units per time unit
+        '''
+
+        if crew.priority_list is None:
+            crew.priority_list = self._new_queue([])
+
+        priority_list = crew.priority_list
+        processed_time = crew.processed_time
+        speed = crew.speed
+        treasure_list = crew.treasure
+        watermark = crew.watermark
+
+        if stop is None:
+            stop = len(treasure_list)
+
+        for i in range(crew.simulated, stop):
+            arrival_time = treasure_list[i].arrival_time
+
+            while priority_list.size > 0:
+                top_entry = priority_list.top()
+                my_treasure = top_entry[2]
+                completion_time = exact(processed_time + (top_entry[0] - my_treasure.arrival_time) / speed)
+                if completion_time > arrival_time:
+                    break
+
+                priority_list.extract()
+                my_treasure.completion_time = completion_time
+                processed_time = completion_time
+                crew.completed.append(my_treasure)
+
+            if priority_list.size > 0:
+                priority_list.top()[0] = exact(priority_list.top()[0] - (arrival_time - processed_time) * speed)
+            else:
+                watermark = i
+            processed_time = arrival_time
+            priority_list.insert(straw_hat.pending_entry(treasure_list[i].size, treasure_list[i]))
+
+        crew.processed_time = processed_time
+        crew.simulated = stop
+        crew.watermark = watermark
+
+    def _drain_crew(self, crew):
+        '''
+        Same as StrawHatTreasury._drain_crew, at the speed of the crewmate
+        '''
+
+        priority_list = crew.priority_list.copy()
+        processed_time = crew.processed_time
+        speed = crew.speed
+
+        while priority_list.size > 0:
+            top_entry = priority_list.extract()
+            my_treasure = top_entry[2]
+
+            processed_time = exact(processed_time + (top_entry[0] - my_treasure.arrival_time) / speed)
+            my_treasure.completion_time = processed_time
+            yield my_treasure
+
+    def _simulate_parallel(self, dirty_crew, processes):
+        # simulate_arrays works at unit speed on int64 arrays, so the crewmates are simulated here
+        for crew in dirty_crew:
+            self._simulate_crew(crew)
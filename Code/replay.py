@@ -0,0 +1,256 @@
+'''
+Replays a trace of treasures through a ColumnarTreasury and writes their completion times
+
+    python -m replay TRACE -m CREWMATES [-o OUTPUT] [--batch N]     (from Code/, or with Code/ on PYTHONPATH)
+
+Trace formats (chosen by the extension, .csv or anything else, unless --input-format is given):
+    csv    : one "id,size,arrival_time" line per treasure, an optional header line
+    binary : one record of three little-endian int64 (id, size, arrival_time) per treasure, 24 bytes
+Output formats (chosen the same way from OUTPUT, or --output-format):
+    csv    : an "id,completion_time" header, then one line per treasure
+    binary : one record of two little-endian int64 (id, completion_time) per treasure, 16 bytes
+The treasures must be in the order of their arrival; the output keeps the order of the trace.
+The trace is memory-mapped and fed to the treasury in batches, so it is never held in memory as a whole:
+only the four int64 columns of the treasury grow with it.
+With --memory-budget BYTES a SpillingTreasury is used instead: the crewmate queues spill to disk beyond the budget
+and the output, grouped by crewmate, is written while the queues are streamed back.
+'''
+
+import spilling
+import straw_hat
+import argparse
+import mmap
+import sys
+import time
+from array import array
+
+TRACE_FIELDS = 3
+OUTPUT_FIELDS = 2
+ITEM_SIZE = 8
+CSV_LINE_BYTES = 32 # approximate length of a CSV line, to turn a batch of treasures into a number of bytes
+
+
+def file_format(path, given):
+    if given is not None:
+        return given
+    return "csv" if path.lower().endswith(".csv") else "binary"
+
+
+def split_columns(values, count):
+    '''
+    Arguments:
+        values : array('q') : The fields of count records one after the other
+        count : int : The number of fields per record
+    Returns:
+        List[array('q')] : One column per field
+    Description:
+        Deinterleaves the records with one strided slice per field
+    Time Complexity:
+        O(n) where n is the number of values
+    '''
+
+    return [values[i::count] for i in range(count)]
+
+
+def iter_binary_trace(mapped, batch):
+    '''
+    Arguments:
+        mapped : mmap : The memory-mapped binary trace
+        batch : int : The number of treasures per batch
+    Returns:
+        Iterator[Tuple[array('q'), array('q'), array('q')]] : The (ids, sizes, arrival_times) columns of each batch
+    Description:
+        Reads the records straight from the mapping, batch by batch
+    Time Complexity:
+        O(n) where n is the number of treasures
+    '''
+
+    record_size = TRACE_FIELDS * ITEM_SIZE
+    if len(mapped) % record_size != 0:
+        raise ValueError(f"binary trace of {len(mapped)} bytes is not made of {record_size}-byte records")
+
+    for start in range(0, len(mapped), batch * record_size):
+        values = array('q', mapped[start:start + batch * record_size])
+        if sys.byteorder == "big":
+            values.byteswap()
+        yield split_columns(values, TRACE_FIELDS)
+
+
+def iter_csv_trace(mapped, batch):
+    '''
+    Arguments:
+        mapped : mmap : The memory-mapped CSV trace
+        batch : int : The approximate number of treasures per batch
+    Returns:
+        Iterator[Tuple[array('q'), array('q'), array('q')]] : The (ids, sizes, arrival_times) columns of each batch
+    Description:
+        Cuts the mapping into chunks of about batch lines ending on a line break and parses each chunk at once
+        A first line which is not made of integers is skipped as a header
+    Time Complexity:
+        O(n) where n is the size of the trace
+    '''
+
+    size = len(mapped)
+    start = 0
+    first_break = mapped.find(b"\n")
+    first_line = mapped[:size if first_break == -1 else first_break]
+    try:
+        [int(field) for field in first_line.replace(b",", b" ").split()]
+    except ValueError:
+        start = len(first_line) + 1
+
+    chunk_bytes = max(1, batch * CSV_LINE_BYTES)
+    while start < size:
+        stop = mapped.find(b"\n", min(start + chunk_bytes, size) - 1)
+        stop = size if stop == -1 else stop + 1
+        try:
+            values = array('q', map(int, mapped[start:stop].replace(b",", b" ").split()))
+        except ValueError:
+            raise ValueError(f"malformed CSV trace between bytes {start} and {stop}") from None
+        if len(values) % TRACE_FIELDS != 0:
+            raise ValueError(f"malformed CSV trace between bytes {start} and {stop}: expected {TRACE_FIELDS} fields per line")
+        yield split_columns(values, TRACE_FIELDS)
+        start = stop
+
+
+def write_completions(file, output_format, ids, completion_times, batch, header=True):
+    '''
+    Arguments:
+        file : BinaryIO : The output file
+        output_format : str : "csv" or "binary"
+        ids : array('q') : The ids of the treasures
+        completion_times : array('q') : Their completion times
+        batch : int : The number of treasures written per write
+        header : bool : Whether the CSV header is written first
+    Returns:
+        None
+    Description:
+        Writes the (id, completion_time) pairs batch by batch
+    Time Complexity:
+        O(n) where n is the number of treasures
+    '''
+
+    if output_format == "csv" and header:
+        file.write(b"id,completion_time\n")
+    for start in range(0, len(ids), batch):
+        stop = min(start + batch, len(ids))
+        if output_format == "csv":
+            file.write("".join(f"{ids[i]},{completion_times[i]}\n" for i in range(start, stop)).encode())
+        else:
+            values = array('q', bytes(OUTPUT_FIELDS * ITEM_SIZE * (stop - start)))
+            values[0::2] = ids[start:stop]
+            values[1::2] = completion_times[start:stop]
+            if sys.byteorder == "big":
+                values.byteswap()
+            file.write(values.tobytes())
+
+
+def replay(trace, m, output=None, batch=1 << 16, input_format=None, output_format=None, report=print, memory_budget=None):
+    '''
+    Arguments:
+        trace : str : The trace file
+        m : int : Number of Crew Mates
+        output : str : The file receiving the completion times (not written if None)
+        batch : int : The number of treasures per batch
+        input_format : str : "csv" or "binary" (from the extension of trace if None)
+        output_format : str : "csv" or "binary" (from the extension of output if None)
+        report : function : Called with one line of text per phase
+        memory_budget : int : Bytes of treasures kept in memory by a SpillingTreasury (a ColumnarTreasury if None)
+    Returns:
+        ColumnarTreasury : The treasury holding the whole trace, simulated (None with memory_budget)
+    Description:
+        Loads the trace into a ColumnarTreasury batch by batch, simulates it and writes the completion times,
+        reporting the time and the throughput of each phase
+        With memory_budget the crewmate queues spill to disk and are streamed back by iter_completion_records,
+        which simulates and writes in one pass; the output is then grouped by crewmate instead of in trace order
+    Time Complexity:
+        O(n (log(m) + log(n))) where n is the number of treasures
+    '''
+
+    if memory_budget is not None:
+        with spilling.SpillingTreasury(m, memory_budget) as treasury:
+            replay_treasury(treasury, trace, output, batch, input_format, output_format, report)
+        return None
+
+    treasury = straw_hat.ColumnarTreasury(m)
+    replay_treasury(treasury, trace, output, batch, input_format, output_format, report)
+    return treasury
+
+
+def replay_treasury(treasury, trace, output, batch, input_format, output_format, report):
+    '''
+    Loads the trace into the treasury and writes its completion times, with the arguments of replay
+    '''
+    reader = iter_csv_trace if file_format(trace, input_format) == "csv" else iter_binary_trace
+    n = 0
+
+    def phase(name, start_time):
+        elapsed = time.perf_counter() - start_time
+        report(f"[+] {name.ljust(8)} {n} treasures in {elapsed:.2f}s ({n / elapsed if elapsed > 0 else 0:.0f} treasures/s)")
+        return elapsed
+
+    total = 0
+    start_time = time.perf_counter()
+    with open(trace, "rb") as file:
+        if file.seek(0, 2) > 0:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for ids, sizes, arrival_times in reader(mapped, batch):
+                    treasury.add_columns(ids, sizes, arrival_times)
+                    n += len(ids)
+    total += phase("load", start_time)
+
+    if isinstance(treasury, spilling.SpillingTreasury):
+        start_time = time.perf_counter()
+        file = open(output, "wb") if output is not None else None
+        try:
+            ids = array('q')
+            completion_times = array('q')
+            header = True
+            for id, _, _, completion_time in treasury.iter_completion_records():
+                ids.append(id)
+                completion_times.append(completion_time)
+                if len(ids) == batch:
+                    if file is not None:
+                        write_completions(file, file_format(output, output_format), ids, completion_times, batch, header)
+                    ids, completion_times, header = array('q'), array('q'), False
+            if file is not None and (len(ids) > 0 or header):
+                write_completions(file, file_format(output, output_format), ids, completion_times, batch, header)
+        finally:
+            if file is not None:
+                file.close()
+        total += phase("stream", start_time)
+    else:
+        start_time = time.perf_counter()
+        ids, completion_times = treasury.completion_columns()
+        total += phase("simulate", start_time)
+
+        if output is not None:
+            start_time = time.perf_counter()
+            with open(output, "wb") as file:
+                write_completions(file, file_format(output, output_format), ids, completion_times, batch)
+            total += phase("write", start_time)
+
+    report(f"[+] {'total'.ljust(8)} {n} treasures in {total:.2f}s ({n / total if total > 0 else 0:.0f} treasures/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m replay", description="Replay a trace of treasures and write their completion times")
+    parser.add_argument("trace", help="CSV or binary trace of (id, size, arrival_time)")
+    parser.add_argument("-m", "--crewmates", type=int, required=True, help="number of crewmates")
+    parser.add_argument("-o", "--output", help="file receiving the (id, completion_time) pairs")
+    parser.add_argument("--batch", type=int, default=1 << 16, help="treasures per batch")
+    parser.add_argument("--input-format", choices=["csv", "binary"], help="format of the trace (from its extension by default)")
+    parser.add_argument("--output-format", choices=["csv", "binary"], help="format of the output (from its extension by default)")
+    parser.add_argument("--memory-budget", type=int, help="bytes of treasures kept in memory, the crewmate queues spill to disk beyond it")
+    args = parser.parse_args(argv)
+
+    try:
+        replay(args.trace, args.crewmates, args.output, args.batch, args.input_format, args.output_format,
+               report=lambda line: print(line, file=sys.stderr), memory_budget=args.memory_budget)
+    except (OSError, ValueError) as e:
+        print(f"[!] {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+'''
+Asyncio server owning a StrawHatTreasury
+
+    python -m server -m CREWMATES [--host HOST] [--port PORT | --unix PATH] [--max-pending N]
+
+Clients send newline-terminated ASCII requests, any number of them per connection:
+    A id size arrival_time      arrival of a treasure, no reply
+    C id                        completion time of a treasure  ->  "C id completion_time"
+    L [crew_id]                 loads at the latest arrival    ->  "L time load" or "L time load_0 ... load_m-1"
+    S                           statistics                     ->  "S added rejected time"
+A request which cannot be answered gets "E message" instead. The last request may lack its newline, it is
+handled when the client closes its side of the connection.
+
+Every connection pushes its arrivals, one batch per read of the socket, into a single bounded queue consumed by
+one ingestion task, which coalesces the queued batches into one add_treasures call and answers the queries in
+their order in the queue: a query sees all the arrivals sent before it on its connection, and the treasury is
+only touched by the ingestion task, so it needs no lock. When the queue is full, the connections stop reading
+their sockets until it drains, which pushes back on the clients through the socket buffers.
+
+Arrivals must come in the order of their arrival time; an arrival before the latest one (or malformed) is
+rejected and counted in S, like an arrival the treasury raises on. A query the treasury raises on gets
+"E message" and the server goes on.
+'''
+
+import straw_hat
+import treasure
+import argparse
+import asyncio
+
+READ_SIZE = 1 << 16
+
+
+class TreasuryServer:
+    def __init__(self, treasury, max_pending=256):
+        '''
+        Arguments:
+            treasury : StrawHatTreasury : The treasury served (only used by the ingestion task from now on)
+            max_pending : int : Number of batches of arrivals and queries queued before the connections are paused
+        Returns:
+            None
+        Description:
+            Initializes the server, start has to be awaited to accept connections
+        '''
+
+        self.treasury = treasury
+        self.queue = asyncio.Queue(max_pending)
+        self.crew_by_id = sorted(treasury.crew_heap.heap, key=lambda crew: crew.id)
+        self.time = 0 # latest arrival time added
+        self.added = 0
+        self.rejected = 0
+        self.server = None
+        self.ingest_task = None
+
+    async def start(self, host=None, port=None, path=None):
+        '''
+        Arguments:
+            host : str : The host to listen on with TCP
+            port : int : The TCP port (0 for any free port)
+            path : str : The path of a Unix socket, used instead of TCP if given
+        Returns:
+            None
+        Description:
+            Starts the ingestion task and listens for connections
+        '''
+
+        self.ingest_task = asyncio.ensure_future(self._ingest())
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, path=path)
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port)
+
+    async def close(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            None
+        Description:
+            Stops accepting connections, lets the ingestion task empty the queue and stops it
+        '''
+
+        self.server.close()
+        await self.server.wait_closed()
+        await self.queue.join()
+        self.ingest_task.cancel()
+
+    async def _handle(self, reader, writer):
+        '''
+        Arguments:
+            reader : asyncio.StreamReader : The stream of the requests
+            writer : asyncio.StreamWriter : The stream of the replies
+        Returns:
+            None
+        Description:
+            Parses the requests of one connection, a whole read at a time
+            The arrivals of a read are queued as one batch; a query is queued after them and answered before
+            reading further, so the replies come in the order of the queries
+            At the end of the stream, a last request without its newline is handled like the others
+        '''
+
+        rest = b''
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                lines = (rest + data).split(b'\n')
+                rest = lines.pop()
+                await self._dispatch(lines, writer)
+            if rest.strip():
+                await self._dispatch([rest], writer)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, lines, writer):
+        # Queues the arrivals of the lines in batches and each query after them, writing the replies in order
+        loop = asyncio.get_running_loop()
+        arrivals = []
+        for line in lines:
+            if line[:1] == b'A':
+                arrivals.append(line)
+            elif line.strip():
+                if arrivals:
+                    await self.queue.put(arrivals)
+                    arrivals = []
+                reply = loop.create_future()
+                await self.queue.put((line, reply))
+                writer.write(await reply)
+        if arrivals:
+            await self.queue.put(arrivals)
+        await writer.drain()
+
+    async def _ingest(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            None
+        Description:
+            Takes everything queued at once, adds the arrivals with a single add_treasures call per run of arrivals
+            and answers the queries in between
+            _add and _answer turn the errors of the treasury into rejections and "E" replies, so the task keeps
+            running and every query gets its reply
+        '''
+
+        queue = self.queue
+        while True:
+            items = [await queue.get()]
+            while not queue.empty():
+                items.append(queue.get_nowait())
+
+            try:
+                batch = []
+                for item in items:
+                    if isinstance(item, list):
+                        batch.extend(item)
+                    else:
+                        self._add(batch)
+                        batch = []
+                        line, reply = item
+                        reply.set_result(self._answer(line))
+                self._add(batch)
+            finally:
+                for _ in items:
+                    queue.task_done()
+
+    def _add(self, lines):
+        '''
+        Arguments:
+            lines : List[bytes] : "A id size arrival_time" lines
+        Returns:
+            None
+        Description:
+            Parses the lines and adds their treasures with one add_treasures call, rejecting the malformed ones
+            and the ones arriving before the latest arrival
+            If the treasury raises on a treasure, the treasures before it are added, that one is rejected
+            and add_treasures goes on with the next ones
+        '''
+
+        treasures = []
+        time = self.time
+        for line in lines:
+            try:
+                _, id, size, arrival_time = line.split()
+                my_treasure = treasure.Treasure(int(id), int(size), int(arrival_time))
+            except ValueError:
+                self.rejected += 1
+                continue
+            if my_treasure.arrival_time < time:
+                self.rejected += 1
+                continue
+            time = my_treasure.arrival_time
+            treasures.append(my_treasure)
+
+        # add_treasures takes the treasures from a generator, so the position of a treasure it raises on is known
+        position = 0
+        def pending():
+            nonlocal position
+            while position < len(treasures):
+                yield treasures[position]
+                position += 1
+
+        failed = set()
+        while position < len(treasures):
+            try:
+                self.treasury.add_treasures(pending())
+            except Exception:
+                failed.add(position)
+                position += 1
+
+        self.added += len(treasures) - len(failed)
+        self.rejected += len(failed)
+        for i in range(len(treasures) - 1, -1, -1):
+            if i not in failed:
+                self.time = treasures[i].arrival_time
+                break
+
+    def _answer(self, line):
+        '''
+        Arguments:
+            line : bytes : A query
+        Returns:
+            bytes : Its reply
+        Description:
+            Answers from the state of the treasury: completion_time_of only simulates the crewmate of the treasure
+            if it received treasures since, and the load of a crewmate at a time not before its last arrival is
+            its free time (crew.key) minus the time, as it works continuously until then
+        '''
+
+        fields = line.split()
+        try:
+            if fields[0] == b'C' and len(fields) == 2:
+                id = int(fields[1])
+                return f"C {id} {self.treasury.completion_time_of(id)}\n".encode()
+            if fields[0] == b'L' and len(fields) <= 2:
+                if len(fields) == 2 and not 0 <= int(fields[1]) < len(self.crew_by_id):
+                    return f"E unknown crewmate {int(fields[1])}\n".encode()
+                crews = self.crew_by_id if len(fields) == 1 else [self.crew_by_id[int(fields[1])]]
+                loads = " ".join(str(max(0, crew.key - self.time)) for crew in crews)
+                return f"L {self.time} {loads}\n".encode()
+            if fields[0] == b'S' and len(fields) == 1:
+                return f"S {self.added} {self.rejected} {self.time}\n".encode()
+        except KeyError:
+            return f"E unknown treasure {fields[1].decode(errors='replace')}\n".encode()
+        except (ValueError, IndexError):
+            pass
+        except Exception as e:
+            return f"E {type(e).__name__}: {e}\n".encode()
+        return f"E malformed request {line.decode(errors='replace')}\n".encode()
+
+
+class TreasuryClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host=None, port=None, path=None):
+        '''
+        Arguments:
+            host : str : The host of a TCP server
+            port : int : Its port
+            path : str : The path of the Unix socket of the server, used instead of TCP if given
+        Returns:
+            TreasuryClient : A client connected to a TreasuryServer
+        '''
+
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    def send_arrivals(self, treasures):
+        '''
+        Arguments:
+            treasures : Iterable[Tuple[int, int, int]] : (id, size, arrival_time) of the treasures, in the order of arrival
+        Returns:
+            None
+        Description:
+            Writes the arrivals without waiting for the server, drain waits for the socket buffer
+        '''
+
+        self.writer.write("".join(f"A {id} {size} {arrival_time}\n" for id, size, arrival_time in treasures).encode())
+
+    async def drain(self):
+        await self.writer.drain()
+
+    async def _request(self, line):
+        self.writer.write(line.encode() + b'\n')
+        reply = (await self.reader.readline()).decode().split()
+        if not reply or reply[0] == 'E':
+            raise ValueError(" ".join(reply[1:]) or "connection closed")
+        return [int(field) for field in reply[1:]]
+
+    async def completion_time_of(self, id):
+        return (await self._request(f"C {id}"))[1]
+
+    async def loads(self):
+        '''
+        Returns:
+            Tuple[int, List[int]] : The latest arrival time and the load of every crewmate at that time
+        '''
+
+        time, *loads = await self._request("L")
+        return time, loads
+
+    async def stats(self):
+        '''
+        Returns:
+            Tuple[int, int, int] : The number of treasures added and rejected, and the latest arrival time
+        '''
+
+        return tuple(await self._request("S"))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def serve(m, host=None, port=None, path=None, max_pending=256):
+    server = TreasuryServer(straw_hat.StrawHatTreasury(m), max_pending)
+    await server.start(host, port, path)
+    print(f"[+] Serving {m} crewmates on {path if path is not None else f'{host}:{port}'}", flush=True)
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m server", description="Serve a StrawHatTreasury over TCP or a Unix socket")
+    parser.add_argument("-m", "--crewmates", type=int, required=True, help="number of crewmates")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="path of a Unix socket to listen on instead of TCP")
+    parser.add_argument("--max-pending", type=int, default=256, help="queued batches before the connections are paused")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.crewmates, args.host, args.port, args.unix, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
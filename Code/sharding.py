@@ -0,0 +1,294 @@
+'''
+Treasury whose crewmates are split across worker processes
+
+ShardedTreasury routes every treasure to the crewmate StrawHatTreasury.add_treasure would pick, with one KeyHeap of
+crewmates per shard and a KeyHeap of the shards, and sends the treasures in batches through a pipe to the shard
+process (shard_main) owning the crewmate. Each shard process keeps its crewmates and treasures in a TreasuryShard,
+so the simulation of get_completion_time runs on all the shards at once.
+'''
+
+import crewmate
+import heap
+import straw_hat
+import treasure
+import multiprocessing
+from array import array
+
+
+class ShardedTreasury:
+    def __init__(self, m, shards, batch_size=4096):
+        '''
+        Arguments:
+            m : int : Number of Crew Mates (positive integer)
+            shards : int : Number of worker processes the crewmates are split across
+            batch_size : int : Number of treasures sent to a shard at a time
+        Returns:
+            None
+        Description:
+            Initializes a treasury whose crewmates and treasures live in shard processes (TreasuryShard),
+            shard k holding the crewmates with ids in [k m / s, (k + 1) m / s)
+            The router in this process keeps a KeyHeap of the crewmates of each shard and a KeyHeap of the shards
+            keyed by the (key, id) at the top of theirs: the top shard holds the crewmate with the least (key, id)
+            over all the crewmates, so every treasure goes to the crewmate StrawHatTreasury would choose, ties included
+            The router only updates keys; the treasures are sent in batches and the shards store, simulate and
+            answer queries in parallel
+        Time Complexity:
+            O(m) plus the start of the processes
+        '''
+
+        shards = min(shards, m)
+        self.number_crew = m
+        self.crews = [crewmate.CrewMate(i) for i in range(m)]
+        self.shard_heaps = []
+        self.connections = []
+        self.processes = []
+        for k in range(shards):
+            crew_ids = range(k * m // shards, (k + 1) * m // shards)
+            self.shard_heaps.append(heap.KeyHeap(straw_hat.crew_key, [self.crews[i] for i in crew_ids]))
+            connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=shard_main, args=(child_connection, crew_ids), daemon=True)
+            process.start()
+            child_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+        self.router_heap = heap.KeyHeap(None, list(range(shards)), [shard_heap.top_key() for shard_heap in self.shard_heaps])
+
+        self.batch_size = batch_size
+        self.batches = [(array('q'), array('q'), array('q'), array('q')) for _ in range(shards)] # crew ids, ids, sizes, arrival times
+        self.sent = [[] for _ in range(shards)] # the treasures of each shard, in the order they were sent
+        self.treasure_array = [] # all the treasures sorted by id as of the last get_completion_time
+        self.new_treasure = [] # treasures added since the last get_completion_time
+        self.shard_of = None # treasure id -> shard, built by the first completion_time_of
+
+    def add_treasure(self, treasure):
+        '''
+        Arguments:
+            treasure : Treasure : The treasure to be added to the treasury
+        Returns:
+            None
+        Description:
+            Picks the crewmate with the least (key, id) through the shard at the top of router_heap,
+            updates its key like StrawHatTreasury.add_treasure and queues the treasure for its shard
+        Time Complexity:
+            O(log(m)) amortized where m : Number of Crew Mates
+        '''
+
+        k = self.router_heap.top()
+        shard_heap = self.shard_heaps[k]
+        crew = shard_heap.top()
+
+        if crew.key < treasure.arrival_time:
+            crew.key = treasure.arrival_time + treasure.size
+        else:
+            crew.key += treasure.size
+        shard_heap.replace_top(crew, (crew.key, crew.id))
+        self.router_heap.replace_top(k, shard_heap.top_key())
+
+        crew_ids, ids, sizes, arrival_times = self.batches[k]
+        crew_ids.append(crew.id)
+        ids.append(treasure.id)
+        sizes.append(treasure.size)
+        arrival_times.append(treasure.arrival_time)
+        self.sent[k].append(treasure)
+        self.new_treasure.append(treasure)
+        if self.shard_of is not None:
+            self.shard_of[treasure.id] = k
+        if len(ids) >= self.batch_size:
+            self._flush(k)
+
+    def add_treasures(self, treasures):
+        for treasure in treasures:
+            self.add_treasure(treasure)
+
+    def _flush(self, k):
+        # Sends the treasures queued for shard k
+        if len(self.batches[k][0]) > 0:
+            self.connections[k].send(('add',) + self.batches[k])
+            self.batches[k] = (array('q'), array('q'), array('q'), array('q'))
+
+    def _call(self, requests):
+        '''
+        Arguments:
+            requests : Dict[int, tuple] : The request to each shard, by shard index
+        Returns:
+            Dict[int, Any] : The reply of each shard
+        Description:
+            Sends the pending treasures and the requests to all the shards first, then collects the replies,
+            so the shards work on them in parallel
+            Raises the exception of a shard which failed
+        '''
+
+        for k, request in requests.items():
+            self._flush(k)
+            self.connections[k].send(request)
+        replies = {}
+        for k in requests:
+            status, value = self.connections[k].recv()
+            if status == 'error':
+                raise value
+            replies[k] = value
+        return replies
+
+    def get_completion_time(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            List[Treasure] : List of treasures in the order of their id after updating Treasure.completion_time
+        Description:
+            Every shard simulates its crewmates which received treasures (in parallel with the other shards)
+            and returns the completion times of its treasures in the order they were sent
+        Time Complexity:
+            O(n + k log(n) / s) where
+                n : Number of Treasures
+                k : Number of Treasures added since the last call
+                s : Number of shards
+        '''
+
+        replies = self._call({k: ('complete',) for k in range(len(self.connections))})
+        for k, completion_times in replies.items():
+            sent = self.sent[k]
+            for i in range(len(sent)):
+                sent[i].completion_time = completion_times[i]
+
+        if self.new_treasure:
+            self.treasure_array.extend(self.new_treasure)
+            self.new_treasure = []
+            self.treasure_array.sort(key=lambda treasure: treasure.id)
+        return self.treasure_array[:]
+
+    def completion_time_of(self, id):
+        '''
+        Arguments:
+            id : int : The id of a treasure added to the treasury
+        Returns:
+            int : The completion time of the treasure
+        Description:
+            Asks the shard of the treasure, which answers with StrawHatTreasury.completion_time_of
+            Raises KeyError if no treasure has the id
+        Time Complexity:
+            O(1) plus the simulation of the crewmate of the treasure if it received treasures since
+            (O(n) for the first call, which builds the index)
+        '''
+
+        if self.shard_of is None:
+            self.shard_of = {}
+            for k in range(len(self.sent)):
+                for my_treasure in self.sent[k]:
+                    self.shard_of[my_treasure.id] = k
+
+        k = self.shard_of[id]
+        return self._call({k: ('completion_time_of', id)})[k]
+
+    def close(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            None
+        Description:
+            Stops the shard processes
+        '''
+
+        for connection, process in zip(self.connections, self.processes):
+            if process.is_alive():
+                connection.send(('close',))
+            process.join()
+            connection.close()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TreasuryShard(straw_hat.StrawHatTreasury):
+    def __init__(self, crew_ids):
+        '''
+        Arguments:
+            crew_ids : Iterable[int] : The ids of the crewmates of the shard
+        Returns:
+            None
+        Description:
+            Initializes the part of a ShardedTreasury running in one worker process
+            The router has already chosen the crewmate of every treasure, so crew_heap is not used;
+            the simulation and the queries are the ones of StrawHatTreasury
+        Time Complexity:
+            O(m) where m : Number of Crew Mates of the shard
+        '''
+
+        super().__init__(0)
+        self.shard_crews = {crew_id: crewmate.CrewMate(crew_id) for crew_id in crew_ids}
+        self.received = [] # the treasures in the order they were received
+
+    def add_assigned(self, crew_ids, ids, sizes, arrival_times):
+        '''
+        Arguments:
+            crew_ids : array : The crewmate chosen by the router for each treasure
+            ids, sizes, arrival_times : array : The columns of the treasures
+        Returns:
+            None
+        Description:
+            Appends the treasures to their crewmates and marks them for simulation, like add_treasure after its choice
+        Time Complexity:
+            O(k) where k : Number of Treasures
+        '''
+
+        shard_crews = self.shard_crews
+        for j in range(len(ids)):
+            my_treasure = treasure.Treasure(ids[j], sizes[j], arrival_times[j])
+            crew = shard_crews[crew_ids[j]]
+            crew.treasure.append(my_treasure)
+
+            if crew.is_taken == False:
+                crew.is_taken = True
+                self.taken_crew.append(crew)
+            if crew.is_dirty == False:
+                crew.is_dirty = True
+                self.dirty_crew.append(crew)
+            self.new_treasure.append(my_treasure)
+            self.received.append(my_treasure)
+            if self.crew_of is not None:
+                self.crew_of[my_treasure.id] = crew
+                self.treasure_of[my_treasure.id] = my_treasure
+
+    def completion_array(self):
+        # Completion times of all the treasures of the shard, in the order they were received
+        self._simulate_dirty()
+        return array('q', [my_treasure.completion_time for my_treasure in self.received])
+
+
+def shard_main(connection, crew_ids):
+    '''
+    Arguments:
+        connection : multiprocessing.Connection : The pipe to the router
+        crew_ids : Iterable[int] : The ids of the crewmates of the shard
+    Returns:
+        None
+    Description:
+        Entry point of the shard processes of ShardedTreasury: serves the requests of the router
+        until it sends ('close',), replying ('ok', value) or ('error', exception) to each request but 'add'
+    '''
+
+    shard = TreasuryShard(crew_ids)
+    while True:
+        request = connection.recv()
+        if request[0] == 'add':
+            shard.add_assigned(*request[1:])
+            continue
+        if request[0] == 'close':
+            break
+        try:
+            if request[0] == 'complete':
+                reply = shard.completion_array()
+            elif request[0] == 'completion_time_of':
+                reply = shard.completion_time_of(request[1])
+            else:
+                raise ValueError(f"unknown request {request[0]}")
+            connection.send(('ok', reply))
+        except Exception as e:
+            connection.send(('error', e))
+    connection.close()
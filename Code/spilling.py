@@ -0,0 +1,278 @@
+'''
+Treasury whose crewmate queues spill to disk beyond a memory budget
+
+SpillingTreasury assigns the treasures like StrawHatTreasury.add_treasure, but keeps every crewmate's treasures as
+(id, size, arrival_time) records in an array('q') buffer, appended to a file of the crewmate once the buffers
+outgrow the budget. The crewmates are then simulated one after the other by simulate_stream, which reads their
+files back in chunks, so memory is bounded by the budget and the longest queue rather than the number of treasures.
+python -m replay --memory-budget BYTES uses it.
+'''
+
+import crewmate
+import heap
+import straw_hat
+import treasure
+import os
+import tempfile
+from array import array
+
+SPILL_RECORD_BYTES = 24 # (id, size, arrival_time) as native 64-bit integers in the files of SpillingTreasury
+
+
+class SpillingTreasury:
+    def __init__(self, m, memory_budget, directory=None, chunk_size=1 << 16):
+        '''
+        Arguments:
+            m : int : Number of Crew Mates (positive integer)
+            memory_budget : int : Number of bytes of treasure records kept in memory before spilling to disk
+            directory : str : Directory of the spill files (a new temporary directory, removed by close, if None)
+            chunk_size : int : Number of treasures read back from a spill file at a time
+        Returns:
+            None
+        Description:
+            Initializes a treasury whose crewmate queues live in append-only files once they outgrow memory_budget
+            Treasures are assigned like StrawHatTreasury.add_treasure and appended to their crewmate's buffer,
+            an array('q') of (id, size, arrival_time) records; when the buffers exceed the budget,
+            the largest ones are appended to their crewmate's file until half of the budget is left
+            The treasures are simulated crewmate after crewmate, streaming each file back in chunks,
+            so memory is bounded by the budget, m and the longest queue, not by the number of treasures
+        Time Complexity:
+            O(m)
+        '''
+
+        self.number_crew = m
+        crewmates = [crewmate.CrewMate(i) for i in range(m)]
+        for crew in crewmates:
+            crew.treasure = array('q')
+        self.crew_heap = heap.KeyHeap(straw_hat.crew_key, crewmates)
+        self.taken_crew = []
+
+        self.memory_budget = memory_budget
+        self.chunk_size = chunk_size
+        self.buffered = 0 # number of records in the buffers
+        self.spilled = [0] * m # number of records in the file of each crewmate
+        self.size = 0 # number of treasures added
+        self.owns_directory = directory is None
+        self.directory = tempfile.mkdtemp(prefix='treasury-') if directory is None else directory
+
+    def add(self, id, size, arrival_time):
+        '''
+        Arguments:
+            id : int : The id of the treasure
+            size : int : The size of the treasure
+            arrival_time : int : The arrival time of the treasure
+        Returns:
+            None
+        Description:
+            Assigns the treasure like StrawHatTreasury.add_treasure and appends its record to the crewmate's buffer,
+            spilling the largest buffers if the budget is exceeded
+        Time Complexity:
+            O(log(m)) amortized where m : Number of Crew Mates, plus the writes of a spill
+        '''
+
+        crew = self.crew_heap.top()
+        buffer = crew.treasure
+        buffer.append(id)
+        buffer.append(size)
+        buffer.append(arrival_time)
+
+        if crew.key < arrival_time:
+            crew.key = arrival_time + size
+        else:
+            crew.key += size
+
+        if crew.is_taken == False:
+            crew.is_taken = True
+            self.taken_crew.append(crew)
+
+        self.crew_heap.replace_top(crew, (crew.key, crew.id))
+
+        self.size += 1
+        self.buffered += 1
+        if self.buffered * SPILL_RECORD_BYTES > self.memory_budget:
+            self._spill()
+
+    def add_treasure(self, treasure):
+        '''
+        Arguments:
+            treasure : Treasure : The treasure to be added to the treasury
+        Returns:
+            None
+        Description:
+            Copies the treasure into its crewmate's buffer, the Treasure object itself is not kept
+        Time Complexity:
+            O(log(m)) amortized where m : Number of Crew Mates
+        '''
+
+        self.add(treasure.id, treasure.size, treasure.arrival_time)
+
+    def add_treasures(self, treasures):
+        for treasure in treasures:
+            self.add(treasure.id, treasure.size, treasure.arrival_time)
+
+    def add_columns(self, ids, sizes, arrival_times):
+        for i in range(len(ids)):
+            self.add(ids[i], sizes[i], arrival_times[i])
+
+    def _spill_path(self, crew):
+        return os.path.join(self.directory, f'crew_{crew.id}.bin')
+
+    def _spill(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            None
+        Description:
+            Appends the largest buffers to the files of their crewmates until at most half of the budget is buffered,
+            so that a spill writes large sequential blocks and the next one is not triggered immediately
+            The first spill of a crewmate overwrites its file, only the records spilled by this treasury are read back
+        Time Complexity:
+            O(m log(m) + b) where
+                m : Number of Crew Mates
+                b : Number of records written
+        '''
+
+        for crew in sorted(self.taken_crew, key=lambda crew: len(crew.treasure), reverse=True):
+            if self.buffered * SPILL_RECORD_BYTES <= self.memory_budget // 2 or len(crew.treasure) == 0:
+                break
+            # The first spill truncates the file, which may be left in the directory by a treasury that was not closed
+            with open(self._spill_path(crew), 'ab' if self.spilled[crew.id] > 0 else 'wb') as file:
+                crew.treasure.tofile(file)
+            records = len(crew.treasure) // 3
+            self.spilled[crew.id] += records
+            self.buffered -= records
+            crew.treasure = array('q')
+
+    def _crew_chunks(self, crew):
+        '''
+        Arguments:
+            crew : CrewMate : The crewmate
+        Returns:
+            Iterator[array('q')] : The records of the crewmate's treasures in the order of their arrival, chunk by chunk
+        Description:
+            Reads the crewmate's file sequentially, chunk_size records at a time, then yields its buffer
+        Time Complexity:
+            O(n) where n is the number of Treasures of the crewmate
+        '''
+
+        if self.spilled[crew.id] > 0:
+            with open(self._spill_path(crew), 'rb') as file:
+                while True:
+                    chunk = array('q')
+                    chunk.frombytes(file.read(self.chunk_size * SPILL_RECORD_BYTES))
+                    if len(chunk) == 0:
+                        break
+                    yield chunk
+        if len(crew.treasure) > 0:
+            yield crew.treasure
+
+    def iter_completion_records(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Iterator[Tuple[int, int, int, int]] : (id, size, arrival_time, completion_time) of every treasure
+        Description:
+            Simulates the crewmates one after the other with simulate_stream, reading their queues back in chunks
+            The treasures of a crewmate are yielded in the order of their completion, crewmate after crewmate
+        Time Complexity:
+            O(n log(n)) where n : Number of Treasures, with O(chunk_size + p) memory where p is the longest queue
+        '''
+
+        for crew in self.taken_crew:
+            yield from simulate_stream(self._crew_chunks(crew))
+
+    def get_completion_time(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            List[Treasure] : List of treasures in the order of their id, with Treasure.completion_time set
+        Description:
+            Same result as StrawHatTreasury.get_completion_time, built from iter_completion_records
+            It holds every treasure in memory, iter_completion_records is the bounded memory alternative
+        Time Complexity:
+            O(n log(n)) where n : Number of Treasures
+        '''
+
+        result = []
+        for id, size, arrival_time, completion_time in self.iter_completion_records():
+            my_treasure = treasure.Treasure(id, size, arrival_time)
+            my_treasure.completion_time = completion_time
+            result.append(my_treasure)
+        result.sort(key=lambda my_treasure: my_treasure.id)
+        return result
+
+    def close(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            None
+        Description:
+            Deletes the spill files (and the directory if the treasury created it); the treasury cannot be used afterwards
+        Time Complexity:
+            O(m)
+        '''
+
+        for crew in self.taken_crew:
+            if self.spilled[crew.id] > 0:
+                os.remove(self._spill_path(crew))
+                self.spilled[crew.id] = 0
+        if self.owns_directory:
+            os.rmdir(self.directory)
+            self.owns_directory = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def simulate_stream(chunks):
+    '''
+    Arguments:
+        chunks : Iterable[array] : The (id, size, arrival_time) records of the treasures of one crewmate
+                                   in the order of their arrival, flattened and split into chunks
+    Returns:
+        Iterator[Tuple[int, int, int, int]] : (id, size, arrival_time, completion_time) in the order of completion
+    Description:
+        Same simulation as simulate_arrays, yielding each treasure as soon as it completes
+        Only the queue is kept, as [remaining size + arrival time, id, size, arrival_time] entries,
+        so the chunks can be streamed from disk
+    Time Complexity:
+        O(n log(p)) where
+            n : Number of Treasures
+            p : Largest number of Treasures pending at the same time
+    '''
+
+    priority_list = heap.KeyHeap(None, [])
+    processed_time = 0
+
+    for records in chunks:
+        for i in range(0, len(records), 3):
+            arrival_time = records[i + 2]
+
+            while priority_list.size > 0:
+                top_entry = priority_list.top()
+                rem_size = top_entry[0] - top_entry[3]
+                if processed_time + rem_size > arrival_time:
+                    break
+
+                priority_list.extract()
+                processed_time += rem_size
+                yield (top_entry[1], top_entry[2], top_entry[3], processed_time)
+
+            if priority_list.size > 0:
+                # The top treasure is processed until the arrival, which lowers its key in place
+                priority_list.top()[0] -= arrival_time - processed_time
+            processed_time = arrival_time
+
+            priority_list.insert([records[i + 1] + arrival_time, records[i], records[i + 1], arrival_time])
+
+    while priority_list.size > 0:
+        top_entry = priority_list.extract()
+        processed_time += top_entry[0] - top_entry[3]
+        yield (top_entry[1], top_entry[2], top_entry[3], processed_time)
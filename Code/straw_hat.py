@@ -1,6 +1,19 @@
 import crewmate
 import heap
 import treasure
+import bisect
+import mmap
+import time
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+SNAPSHOT_MAGIC = b'STRAWHAT'
+# The sections of a snapshot in the order of the file, each an array of native 64-bit integers (see write_snapshot)
+SNAPSHOT_SECTIONS = ('heap_order', 'keys', 'counts', 'taken', 'dirty', 'ids', 'sizes', 'arrival_times', 'completion_times', 'crew_index',
+                     'moved', 'processed_times', 'simulated', 'watermarks', 'completed_counts', 'pending_counts', 'completed', 'pending')
+SNAPSHOT_HEADER = struct.Struct('=8sqqq' + 'q' * len(SNAPSHOT_SECTIONS)) # magic, byte order check, latest_arrival, retire_time, lengths
+COMPACT_RATIO = 0.25 # tombstones of cancelled treasures, as a fraction of the treasures, which trigger a compaction
 
 def comparator(a, b):
     return a.key < b.key
@@ -10,6 +23,19 @@ def comparator2(x, y):
         return x[1].id < y[1].id
     else:
         return x[0] + x[1].arrival_time < y[0] + y[1].arrival_time
+
+def crew_key(a):
+    return (a.key, a.id)
+    
+def pending_entry(rem_size, treasure):
+    # Mutable heap entry of a treasure in a crewmate's queue: [rem_size + arrival_time, id, treasure]
+    # Lists compare like tuples, so the entry is its own key, and preempting the top treasure
+    # only lowers entry[0] in place instead of allocating a new entry
+    return [rem_size + treasure.arrival_time, treasure.id, treasure]
+
+def original_treasure(slot):
+    # The Treasure of a slot of a crewmate's list, which is a MovedTreasure for the treasures moved by retire_crewmate
+    return slot.treasure if type(slot) is treasure.MovedTreasure else slot
     
 class StrawHatTreasury:    
     def __init__(self, m):
@@ -27,10 +53,27 @@ class StrawHatTreasury:
         self.number_crew = m
 
         # Create m crewmates
-        crewmates = [crewmate.CrewMate() for _ in range(m)]
+        crewmates = [crewmate.CrewMate(i) for i in range(m)]
 
-        self.crew_heap = heap.Heap(comparator, crewmates) 
+        self.crew_heap = self._new_crew_heap(crewmates) 
+        self._index_crew_heap()
         self.taken_crew = [] 
+
+        self.dirty_crew = [] # crewmates which received treasures since the last get_completion_time
+        self.new_treasure = [] # treasures added since the last get_completion_time
+        self.treasure_array = [] # all the treasures sorted by ID as of the last get_completion_time
+
+        self.clock_time = None # time reached by advance_to (None until it is first called)
+        self.event_heap = None # crewmates keyed by (time of their next event, id), with stale entries skipped
+        self.crew_by_id = crewmates # crewmates indexed by id, the retired ones included
+
+        self.crew_of = None # treasure id -> crewmate, built by the first completion_time_of
+        self.treasure_of = None # treasure id -> treasure, built by the first completion_time_of
+        self.entry_of = None # treasure id -> entry in the queue of its crewmate, built by the first cancel_treasure
+        self.cancelled = set() # ids of the cancelled treasures still tombstoned in a queue or in treasure_array
+        self.latest_arrival = None # latest arrival time added, over all the crewmates
+        self.retire_time = None # time of the last retire_crewmate, no arrival can be added before it
+        self.snapshot = None # sections of the snapshot loaded, until _restore_treasures turns them into objects
     
     def add_treasure(self, treasure):
         '''
@@ -40,17 +83,25 @@ class StrawHatTreasury:
             None
         Description:
             Adds the treasure to the treasury
+            Raises ValueError if the treasure arrives before the last retire_crewmate or the time of the clock (advance_to)
         Time Complexity:
-            O(log(m) + log(n)) where
-                m : Number of Crew Mates
-                n : Number of Treasures
+            O(log(m)) where m : Number of Crew Mates
         '''
 
-        # Extract the crewmate with the least key (free time)
-        crewmate_in_which_treasure_is_added = self.crew_heap.extract()
+        self._check_arrival(treasure.id, treasure.arrival_time)
+        if self.latest_arrival is None or treasure.arrival_time > self.latest_arrival:
+            self.latest_arrival = treasure.arrival_time
+        if self.cancelled and treasure.id in self.cancelled:
+            # The tombstones of a cancelled treasure must not be taken for a new treasure with its id
+            self._compact()
+
+        # Take the crewmate with the least key (free time), ties broken by the least id
+        crewmate_in_which_treasure_is_added = self.crew_heap.top()
         
         # Add the treasure to the crewmate's list
         crewmate_in_which_treasure_is_added.treasure.append(treasure)
+        if crewmate_in_which_treasure_is_added.clock is not None:
+            self._schedule_arrival(crewmate_in_which_treasure_is_added)
         
         # Update the crewmate's key (free time) based on treasure's arrival time and size
         if crewmate_in_which_treasure_is_added.key < treasure.arrival_time:
@@ -58,73 +109,1917 @@ class StrawHatTreasury:
         else:
             crewmate_in_which_treasure_is_added.key += treasure.size
         
-        # Re-insert the updated crewmate back into the heap
         if crewmate_in_which_treasure_is_added.is_taken == False:
             crewmate_in_which_treasure_is_added.is_taken = True
             self.taken_crew.append(crewmate_in_which_treasure_is_added)
 
-        self.crew_heap.insert(crewmate_in_which_treasure_is_added)
+        # Mark the crewmate for simulation in the next get_completion_time
+        if crewmate_in_which_treasure_is_added.is_dirty == False:
+            crewmate_in_which_treasure_is_added.is_dirty = True
+            self.dirty_crew.append(crewmate_in_which_treasure_is_added)
+        self.new_treasure.append(treasure)
+
+        if self.crew_of is not None:
+            self.crew_of[treasure.id] = crewmate_in_which_treasure_is_added
+            self.treasure_of[treasure.id] = treasure
+
+        # Sift the updated crewmate down from the top of the heap
+        self.crew_heap.replace_top(crewmate_in_which_treasure_is_added, (crewmate_in_which_treasure_is_added.key, crewmate_in_which_treasure_is_added.id))
 
-    def get_completion_time(self):
+    def add_treasures(self, treasures):
         '''
         Arguments:
+            treasures : Iterable[Treasure] : The treasures to be added to the treasury, in the order of their arrival
+        Returns:
             None
+        Description:
+            Adds the treasures to the treasury one after the other, with the same assignment as add_treasure
+            The key of the crewmate at the top of crew_heap is updated in place and sifted down once per treasure
+            Raises ValueError at the first treasure arriving before the last retire_crewmate or the time of the clock,
+            the ones before it are added
+        Time Complexity:
+            O(k log(m)) where
+                m : Number of Crew Mates
+                k : Number of Treasures added
+        '''
+
+        crew_heap = self.crew_heap
+        taken_crew = self.taken_crew
+        dirty_crew = self.dirty_crew
+        new_treasure = self.new_treasure
+        crew_of = self.crew_of
+        treasure_of = self.treasure_of
+        # The earliest arrival allowed only changes with retire_crewmate and advance_to, which cannot run meanwhile
+        earliest_arrival = max((time for time in (self.retire_time, self.clock_time) if time is not None), default=None)
+        latest_arrival = self.latest_arrival
+        cancelled = self.cancelled
+
+        # latest_arrival is kept in a local and stored back even if a treasure is rejected
+        try:
+            for treasure in treasures:
+                if earliest_arrival is not None and treasure.arrival_time < earliest_arrival:
+                    self._check_arrival(treasure.id, treasure.arrival_time)
+                if latest_arrival is None or treasure.arrival_time > latest_arrival:
+                    latest_arrival = treasure.arrival_time
+                if cancelled and treasure.id in cancelled:
+                    self._compact()
+
+                crew = crew_heap.top()
+                crew.treasure.append(treasure)
+                if crew.clock is not None:
+                    self._schedule_arrival(crew)
+
+                if crew.key < treasure.arrival_time:
+                    crew.key = treasure.arrival_time + treasure.size
+                else:
+                    crew.key += treasure.size
+
+                if crew.is_taken == False:
+                    crew.is_taken = True
+                    taken_crew.append(crew)
+                if crew.is_dirty == False:
+                    crew.is_dirty = True
+                    dirty_crew.append(crew)
+                new_treasure.append(treasure)
+                if crew_of is not None:
+                    crew_of[treasure.id] = crew
+                    treasure_of[treasure.id] = treasure
+
+                crew_heap.replace_top(crew, (crew.key, crew.id))
+        finally:
+            self.latest_arrival = latest_arrival
+
+    def add_crewmates(self, k):
+        '''
+        Arguments:
+            k : int : Number of Crew Mates to be added
+        Returns:
+            List[int] : The ids of the new crewmates (the next unused ids)
+        Description:
+            Inserts k idle crewmates into crew_heap, so that the next arrivals can be assigned to them
+            Their key is 0 like the initial crewmates, so among idle crewmates they are chosen first
+        Time Complexity:
+            O(k log(m)) where m : Number of Crew Mates
+        '''
+
+        new_ids = []
+        for _ in range(k):
+            crew = crewmate.CrewMate(self.number_crew)
+            crew.handle = self.crew_heap.insert(crew, (crew.key, crew.id))
+            if self.event_heap is not None:
+                crew.clock = crewmate.CrewClock(heap.KeyHeap(None, []))
+            self.crew_by_id.append(crew)
+            self.number_crew += 1
+            new_ids.append(crew.id)
+        return new_ids
+
+    def retire_crewmate(self, crew_id, time):
+        '''
+        Arguments:
+            crew_id : int : The id of the crewmate to be retired
+            time : int : The time of the retirement, not before any arrival added so far (to any crewmate)
+        Returns:
+            List[Treasure] : The treasures moved to other crewmates, in the order they were reassigned
+        Description:
+            Removes the crewmate from crew_heap, so it receives no more treasures, and simulates it until the time
+            The treasures it has started (including the ones it was interrupted on) stay with it and it completes them;
+            the ones still untouched in its queue arrive again at the time, in the order of their arrival at the crewmate,
+            and are assigned by the least load policy like new arrivals
+            They only reach their new crewmate at the time, which is kept in the MovedTreasure of their slot in its list
+            (and so in their queue entry), while the arrival_time of the Treasure objects is left as it is
+            The crewmate and its treasures are kept, so its id is not reused
+            The moved treasures are appended to the lists of their new crewmates, which stay in the order of arrival
+            because the time is not before the latest arrival of the treasury, and later arrivals cannot be before the time
+            The event-driven clock, whose time cannot be after the time either, drops them from the queue of the crewmate
+            (they are untouched there too) and the new crewmates receive them as arrivals at the time
+            Raises ValueError for an unknown or already retired crewmate, the last crewmate, or a time before the latest
+            arrival or the time of the clock
+        Time Complexity:
+            O((k + p) log(m) + q log(q) + b) where
+                m : Number of Crew Mates
+                k : Number of Treasures moved
+                p : Number of Treasures of the crewmate not simulated yet
+                q : Number of Treasures in its queue
+                b : Number of Treasures of the crewmate after its watermark
+        '''
+
+        self._check_retire(crew_id, time)
+        if self.snapshot is not None:
+            self._restore_treasures()
+        if self.cancelled:
+            self._compact()
+        crew = self.crew_by_id[crew_id]
+        self.retire_time = time
+        self.latest_arrival = time
+
+        self.crew_heap.remove(crew.handle)
+        crew.handle = None
+        if not crew.treasure:
+            return []
+
+        # Simulate the crewmate to its last arrival, then process its queue until the time
+        self._advance_crew(crew)
+        priority_list = crew.priority_list
+        processed_time = crew.processed_time
+        while priority_list.size > 0:
+            top_entry = priority_list.top()
+            my_treasure = top_entry[2]
+            rem_size = top_entry[0] - my_treasure.arrival_time
+            if processed_time + rem_size > time:
+                priority_list.top()[0] -= time - processed_time
+                break
+            priority_list.extract()
+            my_treasure.completion_time = processed_time + rem_size
+            processed_time += rem_size
+            crew.completed.append(my_treasure)
+            if self.entry_of is not None:
+                del self.entry_of[my_treasure.id]
+        crew.processed_time = time
+
+        # An entry whose remaining size is still its size was never processed
+        started = [entry for entry in priority_list.heap if entry[0] - entry[2].arrival_time < entry[2].size]
+        moved = [entry[2] for entry in priority_list.heap if entry[0] - entry[2].arrival_time == entry[2].size]
+        if not moved:
+            return []
+        crew.priority_list = self._new_queue(started)
+        if self.entry_of is not None:
+            for my_treasure in moved:
+                del self.entry_of[my_treasure.id]
+
+        # The moved treasures all arrived after the watermark, the last arrival which found the queue empty
+        moved_ids = {my_treasure.id for my_treasure in moved}
+        clock = crew.clock
+        if clock is not None:
+            # The moved treasures reached by the clock are untouched in its queue, as the clock is not after the time
+            clock.simulated -= sum(1 for my_treasure in crew.treasure[:clock.simulated] if my_treasure.id in moved_ids)
+            clock.load -= sum(entry[2].size for entry in clock.priority_list.heap if entry[1] in moved_ids)
+            clock.priority_list = heap.KeyHeap(None, [entry for entry in clock.priority_list.heap if entry[1] not in moved_ids])
+        watermark = crew.watermark
+        if crew.treasure[watermark].id in moved_ids:
+            crew.watermark = 0
+        crew.treasure[watermark:] = [my_treasure for my_treasure in crew.treasure[watermark:] if my_treasure.id not in moved_ids]
+        crew.simulated = len(crew.treasure)
+        if clock is not None:
+            # Its next event may be earlier than the one in event_heap, which is then skipped as stale
+            next_time = self._next_event(crew)
+            if next_time is not None:
+                self.event_heap.insert(crew, (next_time, crew.id))
+        crew.key = time + sum(entry[0] - entry[2].arrival_time for entry in started)
+        if crew.is_dirty == False:
+            crew.is_dirty = True
+            self.dirty_crew.append(crew)
+
+        # Reassign them as arrivals at the time, in the order of their arrival at the crewmate
+        moved.sort(key=lambda my_treasure: (my_treasure.arrival_time, my_treasure.id))
+        moved = [original_treasure(my_treasure) for my_treasure in moved]
+        crew_heap = self.crew_heap
+        for my_treasure in moved:
+            moved_treasure = treasure.MovedTreasure(my_treasure, time)
+            target = crew_heap.top()
+            target.treasure.append(moved_treasure)
+            if target.clock is not None:
+                self._schedule_arrival(target)
+            if target.key < time:
+                target.key = time + my_treasure.size
+            else:
+                target.key += my_treasure.size
+            if target.is_taken == False:
+                target.is_taken = True
+                self.taken_crew.append(target)
+            if target.is_dirty == False:
+                target.is_dirty = True
+                self.dirty_crew.append(target)
+            if self.crew_of is not None:
+                self.crew_of[my_treasure.id] = target
+                self.treasure_of[my_treasure.id] = moved_treasure
+            crew_heap.replace_top(target, (target.key, target.id))
+        return moved
+
+    def cancel_treasure(self, id):
+        '''
+        Arguments:
+            id : int : The id of a treasure added to the treasury
+        Returns:
+            Treasure : The cancelled treasure, whose completion_time is reset to None
+        Description:
+            Withdraws the treasure as if it had never been given to its crewmate: the other treasures of the crewmate
+            keep their crewmate and are processed without it, and get_completion_time, completion_time_of and save
+            no longer include it
+            The key (free time) of the crewmate is recomputed from its treasures after the cancelled one, up to the start
+            of its current busy period at most, and the crewmate is moved in crew_heap through its handle, so the load
+            of every crewmate stays exact for the next arrivals
+            The treasure is found in the list of its crewmate by bisection on its arrival time, and its slot there is
+            tombstoned (its id is in self.cancelled) and skipped by the simulation instead of being deleted
+            Its queue entry is found in entry_of: if the simulation has not processed any of the treasure, the entry is
+            only tombstoned too and skipped when it reaches the top of the queue; otherwise the saved state of the
+            crewmate is rewound to its watermark (to its first treasure if the treasure is before it) and simulated again lazily
+            Tombstones are compacted by get_completion_time, when they reach COMPACT_RATIO of the treasures, or when
+            a treasure with a tombstoned id is added, so the tombstone is not taken for the new treasure
+            Raises KeyError if no treasure has the id; NotImplementedError once the event-driven clock is started
+        Time Complexity:
+            O(log(m) + log(n) + b) amortized where
+                m : Number of Crew Mates
+                n : Number of Treasures of the crewmate
+                b : Number of Treasures of the crewmate after the cancelled one in its current busy period
+            The first call builds the indexes by id, in O(N) for N Treasures. A rewind drops the completed treasures
+            of the crewmate from the point it goes back to, in O(c) for c of them, and the next simulation of the
+            crewmate starts again from there
+        '''
+
+        if self.event_heap is not None:
+            raise NotImplementedError("cancel_treasure is not supported once the clock is started")
+        if self.crew_of is None:
+            self._build_index()
+        if self.entry_of is None:
+            self._build_entry_index()
+
+        crew = self.crew_of.pop(id)
+        my_treasure = self.treasure_of.pop(id)
+        entry = self.entry_of.pop(id, None)
+        treasure_list = crew.treasure
+        cancelled = self.cancelled
+
+        # The treasures of a crewmate are in the order of their arrival
+        k = bisect.bisect_left(treasure_list, my_treasure.arrival_time, key=lambda t: t.arrival_time)
+        while treasure_list[k] is not my_treasure:
+            k += 1
+
+        # The free time is the maximum over the treasures of arrival_time + the sizes from that treasure on: the terms
+        # up to the cancelled treasure lose its size and the ones after it are unchanged, so only the treasures after
+        # it are scanned, down to the term equal to the key (the start of the current busy period) at most
+        # If the crewmate is left idle the key may stay at the arrival of the cancelled treasure, which is not after
+        # the next arrivals, so only the ties between idle crewmates can differ from a treasury without the treasure
+        if crew.handle is not None:
+            key = crew.key
+            new_key = key - my_treasure.size
+            suffix = 0
+            for i in range(len(treasure_list) - 1, k, -1):
+                if cancelled and treasure_list[i].id in cancelled:
+                    continue
+                suffix += treasure_list[i].size
+                term = treasure_list[i].arrival_time + suffix
+                if term > new_key:
+                    new_key = term
+                    if term == key:
+                        break
+            crew.key = new_key
+            self._update_crew(crew)
+
+        if k < crew.simulated:
+            if k < crew.watermark:
+                self._rewind_crew(crew, 0)
+            elif entry is None or entry[0] - my_treasure.arrival_time < my_treasure.size:
+                # Completed or started: the treasures processed after it have to be simulated again
+                self._rewind_crew(crew, crew.watermark)
+
+        if crew.is_dirty == False:
+            crew.is_dirty = True
+            self.dirty_crew.append(crew)
+        my_treasure.completion_time = None
+
+        # Tombstone for the list and the queue of the crewmate and for treasure_array
+        cancelled.add(id)
+        if len(cancelled) > COMPACT_RATIO * (len(self.treasure_array) + len(self.new_treasure)):
+            self._compact()
+        return original_treasure(my_treasure)
+
+    def get_completion_time(self, processes=None):
+        '''
+        Arguments:
+            processes : int : Number of worker processes to simulate the crewmates in parallel (sequential if None or 1)
         Returns:
             List[Treasure] : List of treasures in the order of their completion after updating Treasure.completion_time
         Description:
             Returns all the treasure after processing them
+            Only the crewmates which received treasures since the last call are simulated again,
+            starting from the state saved at the end of the previous call
+        Time Complexity:
+            O(k(log(m) + log(n)) + n) where
+                m : Number of Crew Mates
+                n : Number of Treasures
+                k : Number of Treasures added since the last call and still pending in their crewmate's queue
+            In parallel mode the crewmates which received treasures are simulated again from their first treasure,
+            split across the processes
+        '''
+
+        self._simulate_dirty(processes)
+        self._merge_new_treasures()
+        return self.treasure_array[:]
+
+    def _simulate_dirty(self, processes=None):
+        if self.snapshot is not None:
+            self._restore_treasures()
+        # The tombstones are removed first, as the parallel simulation and the callers work on whole lists
+        if self.cancelled:
+            self._compact()
+        # Crewmates already simulated by completion_time_of are no longer dirty
+        dirty_crew = [crew for crew in self.dirty_crew if crew.is_dirty]
+        if processes is not None and processes > 1 and len(dirty_crew) > 1:
+            self._simulate_parallel(dirty_crew, processes)
+        else:
+            for crew in dirty_crew:
+                self._simulate_crew(crew)
+        for crew in dirty_crew:
+            crew.is_dirty = False
+        self.dirty_crew = []
+
+    def _merge_new_treasures(self):
+        # Merge the new treasures into the array sorted by treasure ID
+        # (the old part is already one sorted run, so the sort is linear in it)
+        if self.new_treasure:
+            self.treasure_array.extend(self.new_treasure)
+            self.new_treasure = []
+            self.treasure_array.sort(key=lambda treasure: treasure.id)
+
+    def completion_time_of(self, id):
+        '''
+        Arguments:
+            id : int : The id of a treasure added to the treasury
+        Returns:
+            int : The completion time of the treasure
+        Description:
+            Looks the treasure and its crewmate up in an index by id, and simulates only that crewmate
+            if it received treasures since it was last simulated
+            The index is built by the first call and then kept up to date by add_treasure
+            Raises KeyError if no treasure has the id
+        Time Complexity:
+            O(1) if the crewmate of the treasure is up to date, else the cost of simulating that crewmate
+            (O(n) for the first call, which builds the index)
+        '''
+
+        if self.crew_of is None:
+            self._build_index()
+
+        crew = self.crew_of[id]
+        if crew.is_dirty:
+            self._simulate_crew(crew)
+            crew.is_dirty = False
+        return self.treasure_of[id].completion_time
+
+    def schedule_columns(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Tuple[array('q'), array('q'), array('q'), array('q'), array('q')] : The (ids, crew_ids, arrival_times, sizes,
+                completion_times) columns of the schedule, one entry per treasure grouped by crewmate
+        Description:
+            Simulates the crewmates which received treasures and gathers the schedule as columns for analytics.py
+        Time Complexity:
+            O(k(log(m) + log(n)) + n) where
+                m : Number of Crew Mates
+                n : Number of Treasures
+                k : Number of Treasures not simulated yet
+        '''
+
+        self._simulate_dirty()
+
+        columns = tuple(array('q') for _ in range(5))
+        ids, crew_ids, arrival_times, sizes, completion_times = columns
+        for crew in self.taken_crew:
+            for my_treasure in crew.treasure:
+                ids.append(my_treasure.id)
+                crew_ids.append(crew.id)
+                arrival_times.append(my_treasure.arrival_time)
+                sizes.append(my_treasure.size)
+                completion_times.append(my_treasure.completion_time)
+        return columns
+
+    def retire(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            List[Treasure] : The retired treasures, with their final completion time, in the order of their id
+        Description:
+            Drops the treasures whose completion time can no longer change and returns them
+            A crewmate's treasures are final before its watermark, the last arrival which found its queue empty:
+            the crewmate is idle at that arrival, so simulating it again from there (in parallel mode, or after load)
+            gives the same result as from its first treasure
+            Afterwards get_completion_time, save and the index of completion_time_of only cover the treasures left,
+            so memory and the cost of those calls depend on the backlog instead of the whole history
+            A crewmate whose event-driven clock has not reached its watermark yet keeps its treasures until it has
+        Time Complexity:
+            O(k(log(m) + log(n)) + n + r log(r)) where
+                m : Number of Crew Mates
+                n : Number of Treasures before the call
+                k : Number of Treasures not simulated yet
+                r : Number of Treasures retired
+        '''
+
+        self._simulate_dirty()
+
+        retired = []
+        for crew in self.taken_crew:
+            watermark = crew.watermark
+            if watermark == 0 or (crew.clock is not None and crew.clock.simulated < watermark):
+                continue
+
+            # All the treasures before the watermark completed before it, so they are the first completed ones
+            retired.extend(original_treasure(my_treasure) for my_treasure in crew.completed[:watermark])
+            del crew.completed[:watermark]
+            del crew.treasure[:watermark]
+            crew.simulated -= watermark
+            crew.watermark = 0
+            if crew.clock is not None:
+                crew.clock.simulated -= watermark
+
+        if retired:
+            retired_ids = {my_treasure.id for my_treasure in retired}
+            self._merge_new_treasures()
+            self.treasure_array = [my_treasure for my_treasure in self.treasure_array if my_treasure.id not in retired_ids]
+            if self.crew_of is not None:
+                for id in retired_ids:
+                    del self.crew_of[id]
+                    del self.treasure_of[id]
+            retired.sort(key=lambda my_treasure: my_treasure.id)
+        return retired
+
+    def _new_crew_heap(self, crewmates):
+        # Indexed heap of the crewmates keyed by (free time, id), overridden by InstrumentedTreasury
+        return heap.IndexedKeyHeap(crew_key, crewmates)
+
+    def _index_crew_heap(self):
+        # Gives every crewmate its handle in crew_heap (replace_top keeps the handle of the top)
+        for handle in self.crew_heap.handles:
+            handle.value.handle = handle
+
+    def _check_arrival(self, id, arrival_time):
+        # Moved treasures of retire_crewmate arrive at its time, an earlier arrival would be out of order in their lists,
+        # and the clock has already processed the events before its time
+        if self.retire_time is not None and arrival_time < self.retire_time:
+            raise ValueError(f"treasure {id} arrives at {arrival_time}, before the crewmate retired at {self.retire_time}")
+        if self.clock_time is not None and arrival_time < self.clock_time:
+            raise ValueError(f"treasure {id} arrives at {arrival_time}, before the time of the clock {self.clock_time}")
+
+    def _check_retire(self, crew_id, time):
+        # Arguments of retire_crewmate, checked before the treasury is modified
+        if not 0 <= crew_id < len(self.crew_by_id) or self.crew_by_id[crew_id].handle is None:
+            raise ValueError(f"no crewmate {crew_id} to retire")
+        if self.crew_heap.size == 1:
+            raise ValueError("cannot retire the last crewmate")
+        if self.latest_arrival is not None and time < self.latest_arrival:
+            raise ValueError(f"cannot retire crewmate {crew_id} at {time}, before the latest arrival at {self.latest_arrival}")
+        if self.clock_time is not None and time < self.clock_time:
+            raise ValueError(f"cannot retire crewmate {crew_id} at {time}, before the time of the clock {self.clock_time}")
+
+    def _update_crew(self, crew):
+        '''
+        Arguments:
+            crew : CrewMate : A crewmate whose key changed
+        Returns:
+            None
+        Description:
+            Moves the crewmate to its place in crew_heap for its new key, wherever it was in the heap,
+            instead of rebuilding crew_heap
+        Time Complexity:
+            O(log(m)) where m : Number of Crew Mates
+        '''
+
+        self.crew_heap.update_key(crew.handle, (crew.key, crew.id))
+
+    def _rewind_crew(self, crew, start):
+        # Drops the saved state of the crewmate from its treasure at start on (0 or its watermark, so that the
+        # completed treasures kept are the ones before it), to be simulated again from there
+        # The ones before the watermark completed by its arrival and the others after it; tombstoned slots have none
+        if start == 0:
+            crew.completed.clear()
+        else:
+            del crew.completed[bisect.bisect_right(crew.completed, crew.treasure[start].arrival_time, key=lambda t: t.completion_time):]
+        crew.priority_list = self._new_queue([])
+        crew.processed_time = 0
+        crew.simulated = start
+        crew.watermark = start if start < len(crew.treasure) else 0
+
+    def _compact(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            None
+        Description:
+            Removes the tombstones of the cancelled treasures from the lists and the queues of the crewmates,
+            treasure_array and new_treasure
+            The positions of the saved state of a crewmate (simulated, watermark) move down by the tombstones before them
+        Time Complexity:
+            O(n) where n : Number of Treasures
+        '''
+
+        cancelled = self.cancelled
+        for crew in self.taken_crew:
+            priority_list = crew.priority_list
+            if priority_list is not None and any(entry[1] in cancelled for entry in priority_list.heap):
+                crew.priority_list = self._new_queue([entry for entry in priority_list.heap if entry[1] not in cancelled])
+            treasure_list = crew.treasure
+            if any(my_treasure.id in cancelled for my_treasure in treasure_list):
+                crew.simulated -= sum(1 for my_treasure in treasure_list[:crew.simulated] if my_treasure.id in cancelled)
+                crew.watermark -= sum(1 for my_treasure in treasure_list[:crew.watermark] if my_treasure.id in cancelled)
+                crew.treasure = [my_treasure for my_treasure in treasure_list if my_treasure.id not in cancelled]
+        # In place, as add_treasures holds new_treasure in a local
+        self.treasure_array[:] = [my_treasure for my_treasure in self.treasure_array if my_treasure.id not in cancelled]
+        self.new_treasure[:] = [my_treasure for my_treasure in self.new_treasure if my_treasure.id not in cancelled]
+        cancelled.clear()
+
+    def _new_queue(self, entries):
+        # Heap of the pending entries of a crewmate, overridden by InstrumentedTreasury
+        return heap.KeyHeap(None, entries)
+
+    def _build_index(self):
+        if self.snapshot is not None:
+            self._restore_treasures()
+        self.crew_of = {}
+        self.treasure_of = {}
+        for crew in self.taken_crew:
+            for my_treasure in crew.treasure:
+                self.crew_of[my_treasure.id] = crew
+                self.treasure_of[my_treasure.id] = my_treasure
+
+    def _build_entry_index(self):
+        # Entries of the pending treasures, then kept up to date where entries are inserted and extracted
+        self.entry_of = {}
+        for crew in self.taken_crew:
+            if crew.priority_list is not None:
+                for entry in crew.priority_list.heap:
+                    self.entry_of[entry[1]] = entry
+
+    def _simulate_crew(self, crew):
+        '''
+        Arguments:
+            crew : CrewMate : The crewmate to be simulated
+        Returns:
+            None
+        Description:
+            Advances the saved state of the crewmate to its last arrival and updates the completion times of its pending treasures
+        Time Complexity:
+            O((k + p) log(n)) where
+                k : Number of Treasures added to the crewmate since its last simulation
+                p : Number of Treasures pending in its queue
+                n : Number of Treasures of the crewmate
+        '''
+
+        self._advance_crew(crew)
+        for _ in self._drain_crew(crew):
+            pass
+
+    def _simulate_parallel(self, dirty_crew, processes):
+        '''
+        Arguments:
+            dirty_crew : List[CrewMate] : The crewmates to be simulated
+            processes : int : Number of worker processes
+        Returns:
+            None
+        Description:
+            Simulates the crewmates which received treasures on a process pool
+            Each crewmate is sent as (id, size, arrival_time) arrays, the crewmates are split into one batch per process
+            balancing the number of treasures, and the results are written back into the treasures and the saved state
+        Time Complexity:
+            O(n log(n) / p + n) where
+                n : Number of Treasures of the crewmates which received treasures
+                p : Number of processes
+        '''
+
+        # Greedily give the largest crewmate to the batch with the fewest treasures
+        batch_heap = heap.KeyHeap(None, [(0, i) for i in range(processes)])
+        batches = [[] for _ in range(processes)]
+        for crew in sorted(dirty_crew, key=lambda crew: len(crew.treasure), reverse=True):
+            load, i = batch_heap.top()
+            batches[i].append(crew)
+            batch_heap.replace_top((load + len(crew.treasure), i))
+        batches = [batch for batch in batches if batch]
+
+        with ProcessPoolExecutor(max_workers=len(batches)) as executor:
+            futures = [executor.submit(simulate_batch, [self._crew_columns(crew) for crew in batch]) for batch in batches]
+            for batch, future in zip(batches, futures):
+                for crew, result in zip(batch, future.result()):
+                    self._apply_simulation(crew, result)
+
+    def _crew_columns(self, crew):
+        # (ids, sizes, arrival_times) of the treasures of the crewmate, the input of simulate_arrays
+        return (
+            array('q', [t.id for t in crew.treasure]),
+            array('q', [t.size for t in crew.treasure]),
+            array('q', [t.arrival_time for t in crew.treasure]),
+        )
+
+    def _apply_simulation(self, crew, result):
+        # Writes the result of simulate_arrays into the treasures and the saved state of the crewmate
+        completion, completed, pending_size, pending_index, processed_time, watermark = result
+        treasure_list = crew.treasure
+        for i in range(len(treasure_list)):
+            treasure_list[i].completion_time = completion[i]
+
+        crew.completed = [treasure_list[i] for i in completed]
+        crew.priority_list = self._new_queue([pending_entry(pending_size[j], treasure_list[pending_index[j]]) for j in range(len(pending_index))])
+        if self.entry_of is not None:
+            for my_treasure in crew.completed:
+                self.entry_of.pop(my_treasure.id, None)
+            for entry in crew.priority_list.heap:
+                self.entry_of[entry[1]] = entry
+        crew.processed_time = processed_time
+        crew.simulated = len(treasure_list)
+        crew.watermark = watermark
+
+    def iter_completions(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Iterator[Treasure] : The treasures in the order of their completion time (ties broken by ID)
+        Description:
+            Yields the treasures after updating Treasure.completion_time, merging the schedules of all the crewmates
+            Each crewmate is simulated lazily, one arrival at a time, only when its next completion is needed,
+            so the merge holds a single pending treasure per crewmate
+            No treasure should be added while the iterator is in use
         Time Complexity:
-            O(n(log(m) + log(n))) where
+            O(log(m) + log(n)) amortized per yielded treasure where
                 m : Number of Crew Mates
                 n : Number of Treasures
         '''
 
-        treasure_array = []
-        for crew in range(len(self.taken_crew)): #self.number_crew
-            treasure_list = self.taken_crew[crew].treasure
-            # if not treasure_list:  # Skip if no treasures
-            #     continue
+        if self.snapshot is not None:
+            self._restore_treasures()
+        merge_heap = heap.KeyHeap(None, [])
+        for crew in self.taken_crew:
+            schedule = self._crew_schedule(crew)
+            first_treasure = next(schedule, None)
+            if first_treasure is not None:
+                merge_heap.insert((first_treasure, schedule), (first_treasure.completion_time, first_treasure.id))
 
-            priority_list = heap.Heap(comparator2, [])
+        while merge_heap.size > 0:
+            my_treasure, schedule = merge_heap.top()
+            yield original_treasure(my_treasure)
 
-            priority_list.insert((treasure_list[0].size,treasure_list[0])) # rem_size, treasure
+            next_treasure = next(schedule, None)
+            if next_treasure is not None:
+                merge_heap.replace_top((next_treasure, schedule), (next_treasure.completion_time, next_treasure.id))
+            else:
+                merge_heap.extract()
 
-            processed_time = treasure_list[0].arrival_time
+    def _crew_schedule(self, crew):
+        '''
+        Arguments:
+            crew : CrewMate : The crewmate whose schedule is required
+        Returns:
+            Iterator[Treasure] : The treasures of the crewmate in the order of their completion
+        Description:
+            Yields the already completed treasures of the crewmate, then advances its saved state one arrival at a time
+            and finally yields the treasures left in its queue
+        Time Complexity:
+            O(log(n)) amortized per yielded treasure where n is the number of Treasures of the crewmate
+        '''
 
-            for i in range(1, len(treasure_list)):
-                time_diff = treasure_list[i].arrival_time - processed_time# - priority_list.top()[0] # how much time more needed for the treasure to complete
+        index = 0
+        while True:
+            while index < len(crew.completed):
+                yield crew.completed[index]
+                index += 1
+            if crew.simulated == len(crew.treasure):
+                break
+            self._advance_crew(crew, crew.simulated + 1)
 
-                while priority_list.size > 0 and (time_diff - priority_list.top()[0]) >= 0:
-                    top_treasure = priority_list.extract()
-                    rem_size, my_treasure = top_treasure[0], top_treasure[1]
+        yield from self._drain_crew(crew)
 
-                    my_treasure.completion_time = processed_time + rem_size
-                    processed_time += rem_size
-                    treasure_array.append(my_treasure)
-                    time_diff -= rem_size
+    def _advance_crew(self, crew, stop=None):
+        '''
+        Arguments:
+            crew : CrewMate : The crewmate to be simulated
+            stop : int : Number of treasures of the crewmate to be simulated up to (all of them if None)
+        Returns:
+            None
+        Description:
+            Feeds the treasures added to the crewmate since its last simulation into its saved state
+            (priority_list, processed_time, completed) so that it reflects the time of its last arrival
+        Time Complexity:
+            O(k log(n)) where
+                k : Number of Treasures added to the crewmate since its last simulation
+                n : Number of Treasures pending in the crewmate's queue
+        '''
 
-                if priority_list.size > 0:
-                    top_treasure = priority_list.extract()
-                    rem_size, my_treasure = top_treasure[0], top_treasure[1]   
+        if crew.priority_list is None:
+            crew.priority_list = self._new_queue([])
 
-                    new_rem_size = rem_size - (treasure_list[i].arrival_time - processed_time)
-                    processed_time = treasure_list[i].arrival_time
+        priority_list = crew.priority_list
+        processed_time = crew.processed_time
+        completed = crew.completed
+        treasure_list = crew.treasure
+        watermark = crew.watermark
+        cancelled = self.cancelled
+        entry_of = self.entry_of
+        spare_entry = None
 
-                    priority_list.insert((new_rem_size, my_treasure))
-                
-                elif priority_list.size == 0:
-                    processed_time = treasure_list[i].arrival_time
+        if stop is None:
+            stop = len(treasure_list)
 
-                priority_list.insert((treasure_list[i].size,treasure_list[i]))
+        for i in range(crew.simulated, stop):
+            if cancelled and treasure_list[i].id in cancelled:
+                # Tombstoned slot of a cancelled treasure
+                continue
+            arrival_time = treasure_list[i].arrival_time
 
             while priority_list.size > 0:
-                top_treasure = priority_list.extract()
-                rem_size, my_treasure = top_treasure[0], top_treasure[1]
+                top_entry = priority_list.top()
+                if cancelled and top_entry[1] in cancelled:
+                    # Tombstone of a cancelled treasure, never processed
+                    priority_list.extract()
+                    continue
+                my_treasure = top_entry[2]
+                rem_size = top_entry[0] - my_treasure.arrival_time
+                if processed_time + rem_size > arrival_time:
+                    break
 
+                priority_list.extract()
                 my_treasure.completion_time = processed_time + rem_size
-                treasure_array.append(my_treasure)
                 processed_time += rem_size
+                completed.append(my_treasure)
+                if entry_of is not None:
+                    del entry_of[top_entry[1]]
+                spare_entry = top_entry
+
+            if priority_list.size > 0:
+                # Process the top treasure until the arrival, its key only decreases so it stays at the top
+                priority_list.top()[0] -= arrival_time - processed_time
+            else:
+                # The queue is empty at this arrival, so the treasures before it are final
+                watermark = i
+            processed_time = arrival_time
+
+            # Reuse the entry of a completed treasure instead of allocating a new one
+            if spare_entry is not None:
+                spare_entry[0] = treasure_list[i].size + arrival_time
+                spare_entry[1] = treasure_list[i].id
+                spare_entry[2] = treasure_list[i]
+                entry = spare_entry
+                spare_entry = None
+            else:
+                entry = pending_entry(treasure_list[i].size, treasure_list[i])
+            priority_list.insert(entry)
+            if entry_of is not None:
+                entry_of[entry[1]] = entry
+
+        crew.processed_time = processed_time
+        crew.simulated = stop
+        crew.watermark = watermark
+
+    def _drain_crew(self, crew):
+        '''
+        Arguments:
+            crew : CrewMate : The crewmate whose pending treasures are to be completed
+        Returns:
+            Iterator[Treasure] : The pending treasures in the order of their completion
+        Description:
+            Updates Treasure.completion_time of the treasures left in the crewmate's queue after its last arrival
+            Works on a copy of priority_list and does not modify the entries, so the saved state is not modified
+        Time Complexity:
+            O(n log(n)) where n is the number of Treasures pending in the crewmate's queue
+        '''
+
+        priority_list = crew.priority_list.copy()
+        processed_time = crew.processed_time
+        cancelled = self.cancelled
+
+        while priority_list.size > 0:
+            top_entry = priority_list.extract()
+            if cancelled and top_entry[1] in cancelled:
+                continue
+            my_treasure = top_entry[2]
+
+            processed_time += top_entry[0] - my_treasure.arrival_time
+            my_treasure.completion_time = processed_time
+            yield my_treasure
+
+    def advance_to(self, time):
+        '''
+        Arguments:
+            time : int : The time to advance the clock to (not less than the time of the previous call)
+        Returns:
+            None
+        Description:
+            Advances the event-driven clock of the treasury to the time
+            The events are the arrivals and the completions of the treasures, processed in the order of their time
+            from a heap of crewmates keyed by their next event, so crewmates without events are not visited
+            The clock keeps its own queues, so it can be used together with get_completion_time
+            Treasures must be added in the order of their arrival time and not before the time of the clock
+        Time Complexity:
+            O(e(log(m) + log(n))) where
+                e : Number of events up to the time since the previous call
+                m : Number of Crew Mates
+                n : Number of Treasures in the queue of a crewmate
+        '''
+
+        if self.event_heap is None:
+            self._start_clock()
+        if time < self.clock_time:
+            raise ValueError(f"cannot advance the clock back from {self.clock_time} to {time}")
+
+        event_heap = self.event_heap
+        while event_heap.size > 0 and event_heap.top_key()[0] <= time:
+            event_time = event_heap.top_key()[0]
+            crew = event_heap.extract()
+
+            # Entries left behind by an earlier arrival are stale
+            if self._next_event(crew) != event_time:
+                continue
+
+            self._process_event(crew)
+            next_time = self._next_event(crew)
+            if next_time is not None:
+                event_heap.insert(crew, (next_time, crew.id))
+
+        self.clock_time = time
+
+    def current_treasure(self, crew_id):
+        '''
+        Arguments:
+            crew_id : int : The id of the crewmate
+        Returns:
+            Treasure : The treasure processed by the crewmate at the time of the clock (None if it is idle)
+        Description:
+            Returns the treasure with the maximum priority in the crewmate's queue
+        Time Complexity:
+            O(1)
+        '''
+
+        clock = self._crew_by_id(crew_id).clock
+        if clock.priority_list.size == 0:
+            return None
+        return original_treasure(clock.priority_list.top()[2])
+
+    def remaining_sizes(self, crew_id):
+        '''
+        Arguments:
+            crew_id : int : The id of the crewmate
+        Returns:
+            List[Tuple[Treasure, int]] : The treasures in the crewmate's queue with their remaining size, in the order they will be processed if nothing arrives
+        Description:
+            Returns the queue of the crewmate at the time of the clock
+        Time Complexity:
+            O(k log(k)) where k is the number of Treasures in the crewmate's queue
+        '''
+
+        clock = self._crew_by_id(crew_id).clock
+        entries = sorted(clock.priority_list.heap)
+        remaining = [(original_treasure(entry[2]), entry[0] - entry[2].arrival_time) for entry in entries]
+        if remaining:
+            # Only the first treasure has been processed since the last event
+            remaining[0] = (remaining[0][0], remaining[0][1] - (self.clock_time - clock.processed_time))
+        return remaining
+
+    def crew_load(self, crew_id):
+        '''
+        Arguments:
+            crew_id : int : The id of the crewmate
+        Returns:
+            int : The total remaining size of the crewmate's queue at the time of the clock
+        Description:
+            Between two events a crewmate with a non-empty queue works continuously, so its load decreases by the elapsed time
+        Time Complexity:
+            O(1)
+        '''
+
+        clock = self._crew_by_id(crew_id).clock
+        if clock.priority_list.size == 0:
+            return 0
+        return clock.load - (self.clock_time - clock.processed_time)
+
+    def crew_loads(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            List[int] : The load of every crewmate at the time of the clock, indexed by crewmate id
+        Description:
+            Returns crew_load(crew_id) for all the crewmates
+        Time Complexity:
+            O(m) where m : Number of Crew Mates
+        '''
+
+        return [self.crew_load(crew_id) for crew_id in range(self.number_crew)]
+
+    def _start_clock(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            None
+        Description:
+            Gives every crewmate an empty CrewClock at time 0 and schedules the first arrival of the crewmates with treasures
+        Time Complexity:
+            O(m log(m)) where m : Number of Crew Mates
+        '''
+
+        if self.snapshot is not None:
+            self._restore_treasures()
+        if self.cancelled:
+            # The clock indexes the lists of the crewmates, and cancel_treasure is not supported once it is started
+            self._compact()
+        self.clock_time = 0
+        self.event_heap = heap.KeyHeap(None, [])
+        for crew in self.crew_by_id:
+            crew.clock = crewmate.CrewClock(heap.KeyHeap(None, []))
+            if crew.treasure:
+                self.event_heap.insert(crew, (crew.treasure[0].arrival_time, crew.id))
+
+    def _crew_by_id(self, crew_id):
+        if self.event_heap is None:
+            self._start_clock()
+        return self.crew_by_id[crew_id]
+
+    def _schedule_arrival(self, crew):
+        # Only the first arrival not yet processed by the clock can be the next event of the crewmate
+        if crew.clock.simulated == len(crew.treasure) - 1:
+            self.event_heap.insert(crew, (crew.treasure[-1].arrival_time, crew.id))
+
+    def _next_event(self, crew):
+        '''
+        Arguments:
+            crew : CrewMate : The crewmate
+        Returns:
+            int : The time of the next arrival or completion of the crewmate (None if there is none)
+        Time Complexity:
+            O(1)
+        '''
+
+        clock = crew.clock
+        next_time = None
+        if clock.simulated < len(crew.treasure):
+            next_time = crew.treasure[clock.simulated].arrival_time
+        if clock.priority_list.size > 0:
+            top_entry = clock.priority_list.top()
+            completion_time = clock.processed_time + top_entry[0] - top_entry[2].arrival_time
+            if next_time is None or completion_time <= next_time:
+                next_time = completion_time
+        return next_time
+
+    def _process_event(self, crew):
+        '''
+        Arguments:
+            crew : CrewMate : The crewmate whose next event is processed
+        Returns:
+            None
+        Description:
+            Completes the treasure at the top of the queue if it finishes before the next arrival (or at the same time),
+            else processes it until the next arrival and adds the arriving treasure to the queue
+        Time Complexity:
+            O(log(n)) where n is the number of Treasures in the crewmate's queue
+        '''
+
+        clock = crew.clock
+        priority_list = clock.priority_list
+
+        if priority_list.size > 0:
+            top_entry = priority_list.top()
+            rem_size = top_entry[0] - top_entry[2].arrival_time
+            completion_time = clock.processed_time + rem_size
+            if clock.simulated == len(crew.treasure) or completion_time <= crew.treasure[clock.simulated].arrival_time:
+                priority_list.extract()
+                clock.processed_time = completion_time
+                clock.load -= rem_size
+                return
+
+        arriving = crew.treasure[clock.simulated]
+        if priority_list.size > 0:
+            elapsed = arriving.arrival_time - clock.processed_time
+            priority_list.top()[0] -= elapsed
+            clock.load -= elapsed
+        clock.processed_time = arriving.arrival_time
+        clock.simulated += 1
+        clock.load += arriving.size
+        priority_list.insert(pending_entry(arriving.size, arriving))
+
+    def save(self, path):
+        '''
+        Arguments:
+            path : str : The file to be written
+        Returns:
+            None
+        Description:
+            Writes the state of the treasury in the binary layout of write_snapshot
+            The columns of the treasures are written in the order of their id, with their completion times,
+            and every crewmate, the retired ones included, as the indices of its treasures into them with its saved
+            simulation state (processed_time, simulated, watermark, completed treasures and queue entries)
+            The treasures moved by retire_crewmate are written with their arrival at their new crewmate
+            The event-driven clock is not written
+        Time Complexity:
+            O(n + m) where
+                m : Number of Crew Mates
+                n : Number of Treasures
+        '''
+
+        if self.snapshot is not None:
+            self._restore_treasures()
+        if self.cancelled:
+            self._compact()
+        self._merge_new_treasures()
+
+        treasure_array = self.treasure_array
+        index_of = {my_treasure.id: j for j, my_treasure in enumerate(treasure_array)}
+        sections = crew_sections(self.crew_by_id, self.crew_heap.heap, self.taken_crew, self.dirty_crew)
+        sections['ids'] = array('q', [my_treasure.id for my_treasure in treasure_array])
+        sections['sizes'] = array('q', [my_treasure.size for my_treasure in treasure_array])
+        sections['arrival_times'] = array('q', [my_treasure.arrival_time for my_treasure in treasure_array])
+        sections['completion_times'] = array('q', [-1 if my_treasure.completion_time is None else my_treasure.completion_time
+                                                   for my_treasure in treasure_array])
+
+        for name in ('crew_index', 'moved', 'processed_times', 'simulated', 'watermarks', 'completed_counts', 'pending_counts',
+                     'completed', 'pending'):
+            sections[name] = array('q')
+        crew_index, moved, completed, pending = sections['crew_index'], sections['moved'], sections['completed'], sections['pending']
+        for crew in self.crew_by_id:
+            # The completed treasures and the queue entries are written as positions in the list of the crewmate
+            position_of = {}
+            for my_treasure in crew.treasure:
+                if type(my_treasure) is treasure.MovedTreasure:
+                    moved.append(len(crew_index))
+                    moved.append(my_treasure.arrival_time)
+                position_of[my_treasure.id] = len(position_of)
+                crew_index.append(index_of[my_treasure.id])
+            entries = crew.priority_list.heap if crew.priority_list is not None else []
+            completed.extend([position_of[my_treasure.id] for my_treasure in crew.completed])
+            for entry in entries:
+                pending.append(position_of[entry[1]])
+                pending.append(entry[0])
+            sections['processed_times'].append(crew.processed_time)
+            sections['simulated'].append(crew.simulated)
+            sections['watermarks'].append(crew.watermark)
+            sections['completed_counts'].append(len(crew.completed))
+            sections['pending_counts'].append(len(entries))
+
+        write_snapshot(path, sections, self.latest_arrival, self.retire_time)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Arguments:
+            path : str : A file written by save
+        Returns:
+            StrawHatTreasury : The restored treasury
+        Description:
+            Memory-maps the file and rebuilds crew_heap in its saved order with the saved keys,
+            without assigning the treasures again, and the retired crewmates outside of it
+            The sections are copied into arrays, and the Treasure objects, the lists and the saved simulation state
+            of the crewmates are only rebuilt from them by the first call which needs them (any call but the additions),
+            so no crewmate is simulated again
+        Time Complexity:
+            O(n + m) where
+                m : Number of Crew Mates
+                n : Number of Treasures
+            with O(m) Python operations, the sections being copied as bytes
+        '''
+
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            latest_arrival, retire_time, sections = read_snapshot(mapped)
+            try:
+                treasury = cls(len(sections['keys']))
+                treasury.latest_arrival = latest_arrival
+                treasury.retire_time = retire_time
+                treasury._restore(sections)
+            finally:
+                # The views must be released before the file is unmapped
+                for section in sections.values():
+                    section.release()
+        return treasury
+
+    def _restore(self, sections):
+        '''
+        Arguments:
+            sections : dict : The memoryviews returned by read_snapshot
+        Returns:
+            None
+        Description:
+            Rebuilds crew_heap of a new treasury from a snapshot and copies the sections of the treasures
+            and of the simulation state into arrays, which _restore_treasures turns into objects
+        Time Complexity:
+            O(n + m) where
+                m : Number of Crew Mates
+                n : Number of Treasures
+        '''
+
+        self.snapshot = {name: copy_section(section) for name, section in sections.items()}
+        self._restore_heap(self.crew_by_id, sections)
+
+    def _restore_treasures(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            None
+        Description:
+            Creates the Treasure objects of a loaded treasury, in the order of their id as treasure_array,
+            and gives every crewmate its list, completed treasures and queue as they were saved
+            The treasures added since the load, which the crewmates received after the saved ones, stay after them
+        Time Complexity:
+            O(n + m) where
+                m : Number of Crew Mates
+                n : Number of Treasures
+        '''
+
+        snapshot = self.snapshot
+        self.snapshot = None
+
+        treasures = [treasure.Treasure(*columns) for columns in zip(snapshot['ids'], snapshot['sizes'], snapshot['arrival_times'])]
+        for my_treasure, completion_time in zip(treasures, snapshot['completion_times']):
+            if completion_time != -1:
+                my_treasure.completion_time = completion_time
+        self.treasure_array = treasures
+
+        crew_index, completed, pending = snapshot['crew_index'], snapshot['completed'], snapshot['pending']
+        moved = snapshot['moved']
+        moved_at = {moved[j]: moved[j + 1] for j in range(0, len(moved), 2)}
+        start = completed_start = pending_start = 0
+        # The crewmates added since the load are not in the snapshot
+        for crew in self.crew_by_id[:len(snapshot['keys'])]:
+            stop = start + snapshot['counts'][crew.id]
+            treasure_list = [treasures[j] for j in crew_index[start:stop]]
+            # The moved treasures are given by their position in crew_index
+            for position in range(start, stop) if moved_at else ():
+                if position in moved_at:
+                    treasure_list[position - start] = treasure.MovedTreasure(treasure_list[position - start], moved_at[position])
+            start = stop
+
+            completed_stop = completed_start + snapshot['completed_counts'][crew.id]
+            crew.completed = [treasure_list[k] for k in completed[completed_start:completed_stop]]
+            completed_start = completed_stop
+            pending_stop = pending_start + 2 * snapshot['pending_counts'][crew.id]
+            entries = [[pending[j + 1], treasure_list[pending[j]].id, treasure_list[pending[j]]] for j in range(pending_start, pending_stop, 2)]
+            pending_start = pending_stop
+
+            crew.processed_time = snapshot['processed_times'][crew.id]
+            crew.simulated = snapshot['simulated'][crew.id]
+            crew.watermark = snapshot['watermarks'][crew.id]
+            crew.priority_list = self._new_queue(entries)
+            crew.treasure = treasure_list + crew.treasure
+
+    def _restore_heap(self, crews, sections):
+        # The saved heap order is already a valid heap, so building it only compares
+        # The retired crewmates are left out of it
+        for crew in crews:
+            crew.key = sections['keys'][crew.id]
+            crew.handle = None
+        self.crew_heap = self._new_crew_heap([crews[i] for i in sections['heap_order']])
+        self._index_crew_heap()
+        self.crew_by_id = crews
+        for i in sections['taken']:
+            crews[i].is_taken = True
+            self.taken_crew.append(crews[i])
+        for i in sections['dirty']:
+            crews[i].is_dirty = True
+            self.dirty_crew.append(crews[i])
+
+class ColumnarTreasury(StrawHatTreasury):
+    def __init__(self, m, store=None):
+        '''
+        Arguments:
+            m : int : Number of Crew Mates (positive integer)
+            store : TreasureStore : The store receiving the treasures (a new one if None)
+        Returns:
+            None
+        Description:
+            Initializes a treasury keeping the treasures in a columnar TreasureStore
+            Each crewmate holds an array('q') of store indices instead of a list of Treasure objects,
+            and Treasure objects are only materialized as TreasureView when results are requested
+            It supports only the arrivals (add_treasure, add_treasures, add_columns, add_crewmates), the queries
+            (get_completion_time, iter_completions, completion_columns, schedule_columns, completion_time_of) and save / load:
+            the clock, retire, retire_crewmate and cancel_treasure work on the Treasure objects and the queues of the crewmates,
+            which it does not keep
+        Time Complexity:
+            O(m)
+        '''
+
+        super().__init__(m)
+        self.store = store if store is not None else treasure.TreasureStore()
+        for crew in self.crew_heap.heap:
+            crew.treasure = array('q')
+
+    def add(self, id, size, arrival_time):
+        '''
+        Arguments:
+            id : int : The id of the treasure
+            size : int : The size of the treasure
+            arrival_time : int : The arrival time of the treasure
+        Returns:
+            None
+        Description:
+            Adds a treasure to the store and assigns it like StrawHatTreasury.add_treasure
+        Time Complexity:
+            O(log(m)) where m : Number of Crew Mates
+        '''
+
+        self._check_arrival(id, arrival_time)
+        if self.latest_arrival is None or arrival_time > self.latest_arrival:
+            self.latest_arrival = arrival_time
+        index = self.store.append(id, size, arrival_time)
+
+        crew = self.crew_heap.top()
+        crew.treasure.append(index)
+
+        if crew.key < arrival_time:
+            crew.key = arrival_time + size
+        else:
+            crew.key += size
+
+        if crew.is_taken == False:
+            crew.is_taken = True
+            self.taken_crew.append(crew)
+        if crew.is_dirty == False:
+            crew.is_dirty = True
+            self.dirty_crew.append(crew)
+
+        if self.crew_of is not None:
+            self.crew_of[id] = crew
+            self.treasure_of[id] = index
+
+        self.crew_heap.replace_top(crew, (crew.key, crew.id))
+
+    def add_columns(self, ids, sizes, arrival_times):
+        '''
+        Arguments:
+            ids : array('q') : The ids of the treasures
+            sizes : array('q') : The sizes of the treasures
+            arrival_times : array('q') : The arrival times of the treasures, in non-decreasing order
+        Returns:
+            None
+        Description:
+            Appends a batch of treasures to the store with one extend per column, then assigns them like add
+            The arguments can be any sequences of ints supported by array.extend (e.g. memoryviews cast to 'q')
+        Time Complexity:
+            O(k log(m)) where
+                m : Number of Crew Mates
+                k : Number of Treasures added
+        '''
+
+        store = self.store
+        start = len(store)
+        store.id.extend(ids)
+        store.size.extend(sizes)
+        store.arrival_time.extend(arrival_times)
+        store.completion_time.extend(array('q', [-1]) * (len(store.id) - start))
+
+        crew_heap = self.crew_heap
+        taken_crew = self.taken_crew
+        dirty_crew = self.dirty_crew
+        crew_of = self.crew_of
+        store_sizes = store.size
+        store_arrival_times = store.arrival_time
+
+        if len(store) > start and (self.latest_arrival is None or store_arrival_times[-1] > self.latest_arrival):
+            self.latest_arrival = store_arrival_times[-1]
+
+        for index in range(start, len(store)):
+            size = store_sizes[index]
+            arrival_time = store_arrival_times[index]
+
+            crew = crew_heap.top()
+            crew.treasure.append(index)
+            if crew.key < arrival_time:
+                crew.key = arrival_time + size
+            else:
+                crew.key += size
+
+            if crew.is_taken == False:
+                crew.is_taken = True
+                taken_crew.append(crew)
+            if crew.is_dirty == False:
+                crew.is_dirty = True
+                dirty_crew.append(crew)
+            if crew_of is not None:
+                crew_of[store.id[index]] = crew
+                self.treasure_of[store.id[index]] = index
+
+            crew_heap.replace_top(crew, (crew.key, crew.id))
+
+    def add_treasure(self, treasure):
+        '''
+        Arguments:
+            treasure : Treasure : The treasure to be added to the treasury
+        Returns:
+            None
+        Description:
+            Copies the treasure into the store, the Treasure object itself is not kept
+        Time Complexity:
+            O(log(m)) where m : Number of Crew Mates
+        '''
+
+        self.add(treasure.id, treasure.size, treasure.arrival_time)
+
+    def add_treasures(self, treasures):
+        '''
+        Arguments:
+            treasures : Iterable[Treasure] : The treasures to be added to the treasury, in the order of their arrival
+        Returns:
+            None
+        Description:
+            Copies the treasures into the store one after the other
+        Time Complexity:
+            O(k log(m)) where
+                m : Number of Crew Mates
+                k : Number of Treasures added
+        '''
+
+        for treasure in treasures:
+            self.add(treasure.id, treasure.size, treasure.arrival_time)
+
+    def get_completion_time(self, processes=None):
+        '''
+        Arguments:
+            processes : int : Number of worker processes to simulate the crewmates in parallel (sequential if None or 1)
+        Returns:
+            List[TreasureView] : List of views on the treasures in the order of their id after updating the completion times
+        Description:
+            Simulates the crewmates which received treasures since the last call on their columns gathered from the store,
+            with simulate_arrays, and writes the completion times into the store
+            In parallel mode the crewmates are split across the processes like StrawHatTreasury.get_completion_time
+        Time Complexity:
+            O(k log(k) + n log(n)) where
+                n : Number of Treasures
+                k : Number of Treasures of the crewmates which received treasures
+        '''
+
+        self._simulate_columns(processes)
+
+        store = self.store
+        order = sorted(range(len(store)), key=store.id.__getitem__)
+        return [store.view(index) for index in order]
+
+    def iter_completions(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Iterator[TreasureView] : Views on the treasures in the order of their completion time (ties broken by id)
+        Description:
+            Simulates the crewmates which received treasures, then yields the views one at a time
+            Only the order (one index per treasure) is kept in memory, the views are created as they are yielded
+        Time Complexity:
+            O(n log(n)) where n : Number of Treasures
+        '''
+
+        self._simulate_columns()
+
+        store = self.store
+        ids = store.id
+        completion_times = store.completion_time
+        order = sorted(range(len(store)), key=lambda index: (completion_times[index], ids[index]))
+        for index in order:
+            yield store.view(index)
+
+    def completion_columns(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Tuple[array('q'), array('q')] : The id and completion time columns of the store, in the order of addition
+        Description:
+            Simulates the crewmates which received treasures and returns the columns of the store themselves,
+            without creating any object per treasure (they are modified by later additions)
+        Time Complexity:
+            O(k log(k)) where k : Number of Treasures of the crewmates which received treasures
+        '''
+
+        self._simulate_columns()
+        return self.store.id, self.store.completion_time
+
+    def schedule_columns(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Tuple[array('q'), array('q'), array('q'), array('q'), array('q')] : The (ids, crew_ids, arrival_times, sizes,
+                completion_times) columns of the schedule, in the order of addition
+        Description:
+            Same as StrawHatTreasury.schedule_columns, the columns of the store are returned themselves
+            and only the crewmate column is built, by scattering the id of each crewmate over its store indices
+        Time Complexity:
+            O(k log(k) + n) where
+                n : Number of Treasures
+                k : Number of Treasures of the crewmates which received treasures
+        '''
+
+        self._simulate_columns()
+
+        store = self.store
+        crew_ids = array('q', bytes(8 * len(store)))
+        for crew in self.taken_crew:
+            crew_id = crew.id
+            for index in crew.treasure:
+                crew_ids[index] = crew_id
+        return store.id, crew_ids, store.arrival_time, store.size, store.completion_time
+
+    def _simulate_columns(self, processes=None):
+        '''
+        Arguments:
+            processes : int : Number of worker processes (sequential if None or 1)
+        Returns:
+            None
+        Description:
+            Runs simulate_arrays on every crewmate which received treasures and scatters the completion times into the store
+        Time Complexity:
+            O(k log(k)) where k : Number of Treasures of the crewmates which received treasures
+        '''
+
+        self._simulate_dirty(processes)
+
+    def _simulate_crew(self, crew):
+        '''
+        Arguments:
+            crew : CrewMate : The crewmate to be simulated
+        Returns:
+            None
+        Description:
+            Gathers the columns of the crewmate's treasures, runs simulate_arrays and scatters the completion times into the store
+        Time Complexity:
+            O(n log(n)) where n is the number of Treasures of the crewmate
+        '''
+
+        self._apply_simulation(crew, simulate_arrays(*self._crew_columns(crew)))
+
+    def _crew_columns(self, crew):
+        store = self.store
+        indices = crew.treasure
+        return (
+            array('q', [store.id[index] for index in indices]),
+            array('q', [store.size[index] for index in indices]),
+            array('q', [store.arrival_time[index] for index in indices]),
+        )
+
+    def _apply_simulation(self, crew, result):
+        # Only the completion times are kept, scattered into the store
+        completion = result[0]
+        indices = crew.treasure
+        completion_times = self.store.completion_time
+        for j in range(len(indices)):
+            completion_times[indices[j]] = completion[j]
+
+    def completion_time_of(self, id):
+        '''
+        Arguments:
+            id : int : The id of a treasure added to the treasury
+        Returns:
+            int : The completion time of the treasure
+        Description:
+            Same as StrawHatTreasury.completion_time_of, the index maps the id to the store index of the treasure
+        Time Complexity:
+            O(1) if the crewmate of the treasure is up to date, else the cost of simulating that crewmate
+        '''
+
+        if self.crew_of is None:
+            self._build_index()
+
+        crew = self.crew_of[id]
+        if crew.is_dirty:
+            self._simulate_crew(crew)
+            crew.is_dirty = False
+        return self.store.completion_time[self.treasure_of[id]]
+
+    def _build_index(self):
+        store = self.store
+        self.crew_of = {}
+        self.treasure_of = {}
+        for crew in self.taken_crew:
+            for index in crew.treasure:
+                self.crew_of[store.id[index]] = crew
+                self.treasure_of[store.id[index]] = index
+
+    def save(self, path):
+        '''
+        Arguments:
+            path : str : The file to be written
+        Returns:
+            None
+        Description:
+            Writes the columns of the store, with the completion times, and the index arrays of the crewmates
+            in the binary layout of write_snapshot
+            The crewmates are simulated again from their columns, so no other simulation state is written
+        Time Complexity:
+            O(n + m) where
+                m : Number of Crew Mates
+                n : Number of Treasures
+        '''
+
+        sections = crew_sections(self.crew_by_id, self.crew_heap.heap, self.taken_crew, self.dirty_crew)
+        sections['crew_index'] = array('q')
+        for crew in self.crew_by_id:
+            sections['crew_index'].extend(crew.treasure)
+
+        store = self.store
+        sections.update(ids=store.id, sizes=store.size, arrival_times=store.arrival_time, completion_times=store.completion_time)
+        write_snapshot(path, sections, self.latest_arrival)
+
+    def _restore(self, sections):
+        '''
+        Arguments:
+            sections : dict : The memoryviews returned by read_snapshot
+        Returns:
+            None
+        Description:
+            Copies the columns and the index arrays straight from the mapped file, without creating any object per treasure
+            Only the crewmates which were to be simulated again when saved are marked dirty
+        Time Complexity:
+            O(n + m) where
+                m : Number of Crew Mates
+                n : Number of Treasures
+        '''
+
+        store = self.store
+        store.id.frombytes(sections['ids'].cast('B'))
+        store.size.frombytes(sections['sizes'].cast('B'))
+        store.arrival_time.frombytes(sections['arrival_times'].cast('B'))
+        store.completion_time.frombytes(sections['completion_times'].cast('B'))
+
+        crew_index = sections['crew_index']
+        start = 0
+        for crew in self.crew_by_id:
+            stop = start + sections['counts'][crew.id]
+            crew.treasure.frombytes(crew_index[start:stop].cast('B'))
+            start = stop
+
+        self._restore_heap(self.crew_by_id, sections)
+
+class TreasuryStats:
+    __slots__ = ('assignment_ns', 'simulation_ns', 'sort_ns', 'preemptions', 'crew_heap', 'queues')
+
+    def __init__(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            None
+        Description:
+            Initializes the counters and phase timers of an InstrumentedTreasury
+        '''
+
+        self.assignment_ns = 0 # time spent in add_treasure and add_treasures
+        self.simulation_ns = 0 # time spent simulating crewmates (get_completion_time and completion_time_of)
+        self.sort_ns = 0 # time spent merging the new treasures into the array sorted by id
+        self.preemptions = 0 # arrivals which took the place of the treasure in service of their crewmate
+        self.crew_heap = heap.HeapStats() # operations on crew_heap
+        self.queues = heap.HeapStats() # operations on the queues of all the crewmates
+
+    def snapshot(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Dict[str, Any] : The current value of every counter and timer, with the heap counters as nested dicts
+        Description:
+            Returns a copy of the counters, which is not modified by later operations
+        Time Complexity:
+            O(1)
+        '''
+
+        return {
+            'assignment_ns': self.assignment_ns,
+            'simulation_ns': self.simulation_ns,
+            'sort_ns': self.sort_ns,
+            'preemptions': self.preemptions,
+            'crew_heap': self.crew_heap.snapshot(),
+            'queues': self.queues.snapshot(),
+        }
+
+class CrewQueue(heap.CountingKeyHeap):
+    def __init__(self, entries, treasury_stats):
+        '''
+        Arguments:
+            entries : List[List] : The initial [rem_size + arrival_time, id, treasure] entries of the queue
+            treasury_stats : TreasuryStats : The counters of the treasury
+        Returns:
+            None
+        Description:
+            Queue of a crewmate counting its heap operations in treasury_stats.queues, and the preemptions:
+            in _advance_crew an entry is only inserted at its arrival, after the treasures completed until then were
+            extracted, so an entry inserted ahead of the top interrupts it if the top was in service just before the arrival,
+            i.e. if it was processed since the last completion or the last arrival (or was in service at an arrival at the same time)
+        Time Complexity:
+            O(n) where n is the number of entries
+        '''
+
+        self.treasury_stats = treasury_stats
+        self.insert_time = None # arrival time of the last inserted entry
+        self.serving = False # whether the top entry was in service just before the last insert, and still is the top
+        self.extracted = [] # treasures extracted since the last insert
+        super().__init__(None, entries, stats=treasury_stats.queues)
+
+    def insert(self, value, key=None):
+        arrival_time = value[0] - value[2].size
+        serving = False
+        if self.size > 0:
+            # Tombstones of cancelled treasures have no completion time
+            completions = [my_treasure.completion_time for my_treasure in self.extracted if my_treasure.completion_time is not None]
+            if completions:
+                serving = max(completions) < arrival_time
+            else:
+                serving = self.insert_time is None or self.insert_time < arrival_time or self.serving
+            if serving and value < self.keys[0]:
+                self.treasury_stats.preemptions += 1
+                serving = False
+        self.insert_time = arrival_time
+        self.serving = serving
+        self.extracted.clear()
+        super().insert(value, key)
+
+    def extract(self):
+        top_entry = super().extract()
+        if top_entry is not None:
+            self.extracted.append(top_entry[2])
+        return top_entry
+
+    def copy(self):
+        other = super().copy()
+        other.treasury_stats = self.treasury_stats
+        other.insert_time = self.insert_time
+        other.serving = self.serving
+        other.extracted = self.extracted[:]
+        return other
+
+class InstrumentedTreasury(StrawHatTreasury):
+    def __init__(self, m):
+        '''
+        Arguments:
+            m : int : Number of Crew Mates (positive integer)
+        Returns:
+            None
+        Description:
+            Initializes a StrawHatTreasury which counts the operations of its heaps and times its phases
+            (assignment, simulation and sort), reported by stats()
+            StrawHatTreasury itself has no instrumentation code, so it pays nothing for it
+            Preemptions happening in worker processes (get_completion_time with processes > 1) are not counted
+        Time Complexity:
+            O(m)
+        '''
+
+        self.counters = TreasuryStats()
+        super().__init__(m)
+
+    def _new_crew_heap(self, crewmates):
+        return heap.CountingIndexedKeyHeap(crew_key, crewmates, stats=self.counters.crew_heap)
+
+    def _new_queue(self, entries):
+        return CrewQueue(entries, self.counters)
+
+    def add_treasure(self, treasure):
+        start_time = time.perf_counter_ns()
+        super().add_treasure(treasure)
+        self.counters.assignment_ns += time.perf_counter_ns() - start_time
+
+    def add_treasures(self, treasures):
+        start_time = time.perf_counter_ns()
+        super().add_treasures(treasures)
+        self.counters.assignment_ns += time.perf_counter_ns() - start_time
+
+    def _simulate_crew(self, crew):
+        start_time = time.perf_counter_ns()
+        super()._simulate_crew(crew)
+        self.counters.simulation_ns += time.perf_counter_ns() - start_time
+
+    def _simulate_parallel(self, dirty_crew, processes):
+        start_time = time.perf_counter_ns()
+        super()._simulate_parallel(dirty_crew, processes)
+        self.counters.simulation_ns += time.perf_counter_ns() - start_time
+
+    def _merge_new_treasures(self):
+        start_time = time.perf_counter_ns()
+        super()._merge_new_treasures()
+        self.counters.sort_ns += time.perf_counter_ns() - start_time
+
+    def stats(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            Dict[str, Any] : Snapshot of the counters and timers, with the number of crewmates and treasures
+        Description:
+            Returns the counters accumulated since the treasury was created, as plain ints in nested dicts
+            which can be serialized (e.g. with json) and exported as they are
+        Time Complexity:
+            O(1)
+        '''
+
+        snapshot = self.counters.snapshot()
+        snapshot['crewmates'] = self.number_crew
+        snapshot['treasures'] = len(self.treasure_array) + len(self.new_treasure)
+        return snapshot
+
+class RadixTreasury(StrawHatTreasury):
+    def __init__(self, m):
+        '''
+        Arguments:
+            m : int : Number of Crew Mates (positive integer)
+        Returns:
+            None
+        Description:
+            StrawHatTreasury whose crewmates' queues are RadixQueues instead of KeyHeaps, for crewmates with long queues
+            The keys of the entries (arrival_time + remaining size) are non-negative integers, and an entry never goes
+            below the last completed one once it has left the top, so the queue is monotone except for the top,
+            which the RadixQueue keeps apart
+            The schedule is the same as StrawHatTreasury's
+        Time Complexity:
+            O(m)
+        '''
+
+        super().__init__(m)
+
+    def _new_queue(self, entries):
+        return heap.RadixQueue(entries)
+
+def crew_sections(crews, crew_heap_order, taken_crew, dirty_crew):
+    '''
+    Arguments:
+        crews : List[CrewMate] : All the crewmates by id, the retired ones included
+        crew_heap_order : List[CrewMate] : The crewmates not retired, in the order of the crew_heap array
+        taken_crew : List[CrewMate] : The crewmates which received treasures, in the order of taken_crew
+        dirty_crew : List[CrewMate] : The crewmates which received treasures since their last simulation
+    Returns:
+        dict : The heap_order, keys, counts, taken and dirty sections of a snapshot
+    Time Complexity:
+        O(m) where m : Number of Crew Mates
+    '''
+
+    return {
+        'heap_order': array('q', [crew.id for crew in crew_heap_order]),
+        'keys': array('q', [crew.key for crew in crews]),
+        'counts': array('q', [len(crew.treasure) for crew in crews]),
+        'taken': array('q', [crew.id for crew in taken_crew]),
+        'dirty': array('q', [crew.id for crew in dirty_crew if crew.is_dirty]),
+    }
+
+def write_snapshot(path, sections, latest_arrival=None, retire_time=None):
+    '''
+    Arguments:
+        path : str : The file to be written
+        sections : dict : The sections of SNAPSHOT_SECTIONS as arrays of integers (empty if missing)
+        latest_arrival : int : The latest arrival time added to the treasury (None if none)
+        retire_time : int : The time of the last retire_crewmate (None if no crewmate retired)
+    Returns:
+        None
+    Description:
+        Writes the header, with the times (-1 for None) and the length of every section, followed by the sections
+        in the order of SNAPSHOT_SECTIONS, all as native 64-bit integers:
+            heap_order : ids of the crewmates not retired in crew_heap order
+            keys, counts : key and number of treasures of each crewmate by id
+            taken, dirty : crewmate ids in taken_crew order, and the ones to be simulated again in dirty_crew order
+            ids, sizes, arrival_times, completion_times : the columns of the treasures (-1 for no completion time)
+            crew_index : the treasures of each crewmate as indices into the columns, crewmate after crewmate by id
+            moved : (position in crew_index, arrival time at the crewmate) of the treasures moved by retire_crewmate
+            processed_times, simulated, watermarks, completed_counts, pending_counts : the saved simulation state
+                of each crewmate by id
+            completed : the completed treasures of each crewmate as positions in its list, crewmate after crewmate
+            pending : (position in its list, key) of the queue entries of each crewmate, crewmate after crewmate
+    Time Complexity:
+        O(n + m) where
+            m : Number of Crew Mates
+            n : Number of Treasures
+    '''
+
+    columns = [sections.get(name, ()) for name in SNAPSHOT_SECTIONS]
+    with open(path, 'wb') as file:
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, 1, -1 if latest_arrival is None else latest_arrival,
+                                        -1 if retire_time is None else retire_time, *(len(column) for column in columns)))
+        for column in columns:
+            file.write(column.tobytes() if isinstance(column, array) else array('q', column).tobytes())
+
+def read_snapshot(buffer):
+    '''
+    Arguments:
+        buffer : Buffer : The content of a file written by write_snapshot, e.g. an mmap
+    Returns:
+        Tuple[int, int, dict] : The latest_arrival and retire_time of the header (None for -1)
+                                and the sections as memoryviews of 64-bit integers on the buffer
+    Description:
+        Checks the header and slices the sections without copying them
+    Time Complexity:
+        O(1)
+    '''
+
+    magic, byte_order, latest_arrival, retire_time, *lengths = SNAPSHOT_HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC or byte_order != 1:
+        raise ValueError("not a treasury snapshot written on this architecture")
+
+    view = memoryview(buffer)[SNAPSHOT_HEADER.size:]
+    sections = {}
+    offset = 0
+    for name, length in zip(SNAPSHOT_SECTIONS, lengths):
+        sections[name] = view[offset:offset + 8 * length].cast('q')
+        offset += 8 * length
+    return None if latest_arrival == -1 else latest_arrival, None if retire_time == -1 else retire_time, sections
+
+def copy_section(section):
+    # Copies a section returned by read_snapshot into an array, as bytes
+    copy = array('q')
+    copy.frombytes(section.cast('B'))
+    return copy
+
+def simulate_batch(columns):
+    '''
+    Arguments:
+        columns : List[Tuple[array, array, array]] : (ids, sizes, arrival_times) of the treasures of each crewmate
+    Returns:
+        List[Tuple] : The result of simulate_arrays for each crewmate
+    Description:
+        Entry point of the worker processes used by StrawHatTreasury.get_completion_time in parallel mode
+    Time Complexity:
+        O(n log(n)) where n is the total number of Treasures in the batch
+    '''
+
+    return [simulate_arrays(ids, sizes, arrival_times) for ids, sizes, arrival_times in columns]
+
+def simulate_arrays(ids, sizes, arrival_times):
+    '''
+    Arguments:
+        ids : array : The ids of the treasures of one crewmate, in the order of their arrival
+        sizes : array : The sizes of the treasures
+        arrival_times : array : The arrival times of the treasures
+    Returns:
+        Tuple[array, array, array, array, int, int] :
+            completion times indexed like the input,
+            indices of the treasures completed before the last arrival in the order of their completion,
+            remaining sizes and indices of the treasures pending after the last arrival (in heap order),
+            processed time at the last arrival,
+            index of the last arrival which found the queue empty (0 if none)
+    Description:
+        Same simulation as StrawHatTreasury._advance_crew followed by _drain_crew, on plain integer arrays
+        The heap entries are [remaining size + arrival time, id, index] lists
+    Time Complexity:
+        O(n log(n)) where n is the number of Treasures
+    '''
+
+    n = len(ids)
+    completion = array('q', bytes(8 * n))
+    completed = array('q')
+    priority_list = heap.KeyHeap(None, [])
+    processed_time = 0
+    watermark = 0
+
+    for i in range(n):
+        arrival_time = arrival_times[i]
+
+        while priority_list.size > 0:
+            top_entry = priority_list.top()
+            index = top_entry[2]
+            rem_size = top_entry[0] - arrival_times[index]
+            if processed_time + rem_size > arrival_time:
+                break
+
+            priority_list.extract()
+            processed_time += rem_size
+            completion[index] = processed_time
+            completed.append(index)
+
+        if priority_list.size > 0:
+            # The top treasure is processed until the arrival, which lowers its key in place
+            priority_list.top()[0] -= arrival_time - processed_time
+        else:
+            watermark = i
+        processed_time = arrival_time
+
+        priority_list.insert([sizes[i] + arrival_time, ids[i], i])
+
+    pending = priority_list.heap
+    pending_size = array('q', [key - arrival_times[index] for key, _, index in pending])
+    pending_index = array('q', [index for _, _, index in pending])
+    last_processed_time = processed_time
+
+    while priority_list.size > 0:
+        key, _, index = priority_list.extract()
+        processed_time += key - arrival_times[index]
+        completion[index] = processed_time
 
-        # Sort the treasure_array based on treasure ID
-        treasure_array.sort(key=lambda treasure: treasure.id)
-        return treasure_array        
\ No newline at end of file
+    return completion, completed, pending_size, pending_index, last_processed_time, watermark
@@ -1,4 +1,8 @@
+from array import array
+
 class Treasure:
+    __slots__ = ('id', 'size', 'arrival_time', 'completion_time')
+
     def __init__(self, id, size, arrival_time):
         '''
         Arguments:
@@ -17,4 +21,150 @@ class Treasure:
         self.arrival_time = arrival_time
         self.completion_time = None
     
-    # You can add more methods if required
\ No newline at end of file
+    # You can add more methods if required
+
+class TreasureStore:
+    def __init__(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            None
+        Description:
+            Initializes an empty columnar store of treasures
+            The id, size, arrival time and completion time of the treasure at index i are kept at position i
+            of four parallel array('q') columns, i.e. 32 bytes per treasure and no Python object per treasure
+            A completion time not computed yet is stored as -1
+        '''
+
+        self.id = array('q')
+        self.size = array('q')
+        self.arrival_time = array('q')
+        self.completion_time = array('q')
+
+    def __len__(self):
+        return len(self.id)
+
+    def append(self, id, size, arrival_time):
+        '''
+        Arguments:
+            id : int : The id of the treasure
+            size : int : The size of the treasure
+            arrival_time : int : The arrival time of the treasure
+        Returns:
+            int : The index of the treasure in the store
+        Description:
+            Appends a treasure to the columns
+        Time Complexity:
+            O(1) amortized
+        '''
+
+        self.id.append(id)
+        self.size.append(size)
+        self.arrival_time.append(arrival_time)
+        self.completion_time.append(-1)
+        return len(self.id) - 1
+
+    def view(self, index):
+        '''
+        Arguments:
+            index : int : The index of the treasure in the store
+        Returns:
+            TreasureView : A view with the attributes of a Treasure, reading and writing the columns
+        Description:
+            Materializes the treasure at the index on demand
+        Time Complexity:
+            O(1)
+        '''
+
+        return TreasureView(self, index)
+
+    def nbytes(self):
+        '''
+        Arguments:
+            None
+        Returns:
+            int : The number of bytes used by the columns
+        Description:
+            Returns the memory used by the stored treasures
+        Time Complexity:
+            O(1)
+        '''
+
+        return (len(self.id) * self.id.itemsize + len(self.size) * self.size.itemsize
+                + len(self.arrival_time) * self.arrival_time.itemsize + len(self.completion_time) * self.completion_time.itemsize)
+
+class TreasureView:
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        '''
+        Arguments:
+            store : TreasureStore : The store holding the treasure
+            index : int : The index of the treasure in the store
+        Returns:
+            None
+        Description:
+            Initializes a view on one treasure of a TreasureStore
+        '''
+
+        self.store = store
+        self.index = index
+
+    @property
+    def id(self):
+        return self.store.id[self.index]
+
+    @property
+    def size(self):
+        return self.store.size[self.index]
+
+    @property
+    def arrival_time(self):
+        return self.store.arrival_time[self.index]
+
+    @property
+    def completion_time(self):
+        completion_time = self.store.completion_time[self.index]
+        if completion_time == -1:
+            return None
+        return completion_time
+
+    @completion_time.setter
+    def completion_time(self, value):
+        self.store.completion_time[self.index] = -1 if value is None else value
+
+class MovedTreasure:
+    __slots__ = ('treasure', 'arrival_time')
+
+    def __init__(self, treasure, arrival_time):
+        '''
+        Arguments:
+            treasure : Treasure : A treasure moved to another crewmate by StrawHatTreasury.retire_crewmate
+            arrival_time : int : The time it arrives at its new crewmate, the time of the retirement
+        Returns:
+            None
+        Description:
+            Initializes the slot of the treasure in the list of its new crewmate, with the attributes of a Treasure:
+            arrival_time is the arrival at the new crewmate, the other attributes are read and written on the treasure,
+            whose own arrival_time is left as it is
+        '''
+
+        self.treasure = treasure
+        self.arrival_time = arrival_time
+
+    @property
+    def id(self):
+        return self.treasure.id
+
+    @property
+    def size(self):
+        return self.treasure.size
+
+    @property
+    def completion_time(self):
+        return self.treasure.completion_time
+
+    @completion_time.setter
+    def completion_time(self, value):
+        self.treasure.completion_time = value
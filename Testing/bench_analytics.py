@@ -0,0 +1,126 @@
+from straw_hat import *
+from treasure import *
+from analytics import Schedule
+import argparse
+import random
+import sys
+import time
+
+
+def tick_preemptions(m, treasures, crew_of):
+    '''
+    Counts the interruptions of every crewmate by running its treasures one time unit at a time, processing the
+    treasure of least (arrival_time + remaining size, id) among the arrived ones
+    '''
+    preemptions = [0] * m
+    for crew_id in range(m):
+        pending = [[size, arrival_time, id] for id, size, arrival_time in treasures if crew_of[id] == crew_id]
+        current = None
+        t = 0
+        while pending:
+            arrived = [item for item in pending if item[1] <= t]
+            if not arrived:
+                t, current = min(item[1] for item in pending), None
+                continue
+            item = min(arrived, key=lambda item: (item[1] + item[0], item[2]))
+            if current is not None and current is not item and current[0] > 0:
+                preemptions[crew_id] += 1
+            item[0] -= 1
+            if item[0] == 0:
+                pending.remove(item)
+                item = None
+            current = item
+            t += 1
+    return preemptions
+
+
+def check(cases, seed):
+    '''
+    Compares the per-crew preemptions of Schedule and the preemptions counted by InstrumentedTreasury with tick_preemptions,
+    and the other metrics with plain loops over Treasure objects
+    '''
+    rng = random.Random(seed)
+    errors = 0
+    for _ in range(cases):
+        m = rng.randint(1, 4)
+        arrival_time = 0
+        treasures = []
+        for i in range(rng.randint(1, 30)):
+            arrival_time += rng.randint(0, 4)
+            treasures.append((i + 1, rng.randint(1, 12), arrival_time))
+
+        test_treasury = InstrumentedTreasury(m)
+        test_treasury.add_treasures(Treasure(*item) for item in treasures)
+        result = test_treasury.get_completion_time()
+        schedule = Schedule.from_treasury(test_treasury)
+        crew_of = dict(zip(schedule.id.tolist(), schedule.crew.tolist()))
+
+        breakdown = schedule.crew_breakdown()
+        summary = schedule.summary()
+        flows = [my_treasure.completion_time - my_treasure.arrival_time for my_treasure in result]
+        expected_busy = [sum(size for id, size, _ in treasures if crew_of[id] == crew_id) for crew_id in range(m)]
+        preemptions = tick_preemptions(m, treasures, crew_of)
+        if (breakdown["preemptions"].tolist() != preemptions
+                or test_treasury.stats()["preemptions"] != sum(preemptions)
+                or breakdown["busy"].tolist() != expected_busy
+                or summary["max_flow"] != max(flows)
+                or summary["makespan"] != max(my_treasure.completion_time for my_treasure in result) - treasures[0][2]):
+            errors += 1
+            print(f"[!] m = {m}, treasures (id, size, arrival_time) = {treasures}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the analytics of a simulated schedule")
+    parser.add_argument("-n", type=int, default=10 ** 6, help="number of treasures simulated")
+    parser.add_argument("-m", type=int, default=64, help="number of crewmates")
+    parser.add_argument("--repeat", type=int, default=10, help="copies of the schedule, shifted in time, analysed together")
+    parser.add_argument("--checks", type=int, default=300, help="small random cases checked against tick-by-tick preemption counts")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    errors = check(args.checks, args.seed)
+    print(f"[+] {args.checks} small schedules checked, {errors} errors")
+
+    rng = random.Random(args.seed)
+    ids, sizes, arrival_times = array('q'), array('q'), array('q')
+    arrival_time = 0
+    for i in range(args.n):
+        arrival_time += rng.randint(0, 3)
+        ids.append(i + 1)
+        sizes.append(rng.randint(1, 200))
+        arrival_times.append(arrival_time)
+
+    start_time = time.perf_counter()
+    test_treasury = ColumnarTreasury(args.m)
+    test_treasury.add_columns(ids, sizes, arrival_times)
+    columns = test_treasury.schedule_columns()
+    print(f"[+] Simulated {args.n} treasures in {time.perf_counter() - start_time:.2f}s")
+
+    # Copies shifted after the end of the previous one make a larger schedule without simulating it
+    ids, crew_ids, arrival_times, sizes, completion_times = (array('q', column) for column in columns)
+    shift = max(completion_times) + 1
+    for column in (ids, crew_ids, arrival_times, sizes, completion_times):
+        column *= args.repeat
+    for k in range(1, args.repeat):
+        for i in range(k * args.n, (k + 1) * args.n):
+            ids[i] += k * args.n
+            arrival_times[i] += k * shift
+            completion_times[i] += k * shift
+
+    start_time = time.perf_counter()
+    schedule = Schedule(ids, crew_ids, arrival_times, sizes, completion_times, m=args.m)
+    summary = schedule.summary()
+    breakdown = schedule.crew_breakdown()
+    histogram = schedule.histogram("flow", bins=100)
+    elapsed = time.perf_counter() - start_time
+    print(f"[+] Analysed {len(schedule)} treasures in {elapsed:.2f}s ({len(schedule) / elapsed:.0f} treasures/s)")
+    print(f"    makespan {summary['makespan']}, mean flow {summary['mean_flow']:.1f}, percentiles {summary['flow_percentiles']}")
+    print(f"    utilization {summary['utilization']:.3f} (crewmates {breakdown['utilization'].min():.3f} to {breakdown['utilization'].max():.3f}), "
+          f"{summary['preemptions']} preemptions, {histogram[0].max()} treasures in the fullest flow bin")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+from straw_hat import *
+from heap import *
+from treasure import *
+from crewmate import *
+import argparse
+import random
+import time
+
+random.seed(42)
+
+
+def pending_key(x):
+    return (x[0] + x[1].arrival_time, x[1].id)
+
+
+def time_ms(function):
+    start_time = time.perf_counter_ns()
+    function()
+    end_time = time.perf_counter_ns()
+    return (end_time - start_time) / 1000000
+
+
+def fill_and_drain(test_heap, values, keys=None):
+    def run():
+        if keys is None:
+            for value in values:
+                test_heap.insert(value)
+        else:
+            for i in range(len(values)):
+                test_heap.insert(values[i], keys[i])
+        while test_heap.size > 0:
+            test_heap.extract()
+    return run
+
+
+def preempt_top(test_heap, rounds, use_replace):
+    # Lower the remaining size of the top entry and put it back, like get_completion_time does on every arrival
+    def run():
+        for _ in range(rounds):
+            rem_size, my_treasure = test_heap.top()
+            if use_replace:
+                test_heap.replace_top((rem_size - 1, my_treasure), (rem_size - 1 + my_treasure.arrival_time, my_treasure.id))
+            else:
+                test_heap.extract()
+                test_heap.insert((rem_size - 1, my_treasure))
+    return run
+
+
+def check_indexed(rounds):
+    # Random inserts, extracts, update_key and remove on an IndexedKeyHeap, checked against a dict of the keys
+    test_heap = IndexedKeyHeap(None, [])
+    expected = {}
+    for i in range(rounds):
+        operation = random.random()
+        if operation < 0.4 or not expected:
+            handle = test_heap.insert(i, (random.randint(0, 100), i))
+            expected[handle] = test_heap.peek_key(handle)
+        elif operation < 0.6:
+            handle = min(expected, key=expected.get)
+            del expected[handle]
+            if test_heap.extract() != handle.value or handle.index != -1:
+                return False
+        else:
+            handle = random.choice(list(expected))
+            if test_heap.peek_key(handle) != expected[handle]:
+                return False
+            if operation < 0.8:
+                expected[handle] = (random.randint(0, 100), handle.value)
+                test_heap.update_key(handle, expected[handle])
+            else:
+                del expected[handle]
+                if test_heap.remove(handle) != handle.value:
+                    return False
+        if test_heap.size != len(expected) or any(test_heap.handles[index].index != index for index in range(test_heap.size)):
+            return False
+    return test_heap.top_key() == (min(expected.values()) if expected else None)
+
+
+def large_queues(n, m, max_size):
+    # Arrivals faster than the crewmates can process them, so every crewmate's queue grows to about n / m entries
+    rng = random.Random(42)
+    arrivals = []
+    arrival_time = 0
+    for i in range(n):
+        arrival_time += rng.randint(0, 3)
+        arrivals.append((i + 1, rng.randint(1, max_size), arrival_time))
+    times, results = [], []
+    for treasury_class in (StrawHatTreasury, RadixTreasury):
+        test_treasury = treasury_class(m)
+        test_treasury.add_treasures(Treasure(*item) for item in arrivals)
+        times.append(time_ms(lambda: results.append([my_treasure.completion_time for my_treasure in test_treasury.get_completion_time()])))
+    return times, results[0] == results[1]
+
+
+def main(n=10**6):
+    format_len = 44
+    print(f"[*] Heap vs KeyHeap, n = {n}")
+    print("-" * 80)
+    print(f"| {'workload'.ljust(format_len)} | {'Heap'.rjust(12)} | {'KeyHeap'.rjust(12)} | {'speedup'.rjust(6)} |")
+    print("-" * 80)
+
+    values = [random.randint(0, 10 ** 9) for _ in range(n)]
+    old_time = time_ms(fill_and_drain(Heap(lambda x, y: x < y, []), values))
+    new_time = time_ms(fill_and_drain(KeyHeap(None, []), values))
+    print(f"| {'insert + extract, integers'.ljust(format_len)} | {old_time:10.1f}ms | {new_time:10.1f}ms | x{old_time / new_time:6.2f} |")
+
+    entries = [(random.randint(1, 10 ** 6), Treasure(i, 1, random.randint(0, 10 ** 9))) for i in range(n)]
+    keys = [pending_key(entry) for entry in entries]
+    old_time = time_ms(fill_and_drain(Heap(comparator2, []), entries))
+    new_time = time_ms(fill_and_drain(KeyHeap(pending_key, []), entries, keys))
+    print(f"| {'insert + extract, (rem_size, treasure)'.ljust(format_len)} | {old_time:10.1f}ms | {new_time:10.1f}ms | x{old_time / new_time:6.2f} |")
+
+    entries = [(10 ** 9, Treasure(i, 10 ** 9, random.randint(0, 10 ** 9))) for i in range(n)]
+    old_heap = Heap(comparator2, entries)
+    new_heap = KeyHeap(pending_key, entries)
+    old_time = time_ms(preempt_top(old_heap, n, False))
+    new_time = time_ms(preempt_top(new_heap, n, True))
+    print(f"| {'preempt top (extract + insert / replace_top)'.ljust(format_len)} | {old_time:10.1f}ms | {new_time:10.1f}ms | x{old_time / new_time:6.2f} |")
+
+    old_heap = Heap(comparator, [CrewMate() for _ in range(64)])
+    new_heap = KeyHeap(crew_key, [CrewMate() for _ in range(64)])
+    def reassign(test_heap):
+        def run():
+            for i in range(n):
+                crew = test_heap.extract()
+                crew.key += 1 + i % 7
+                test_heap.insert(crew)
+        return run
+    old_time = time_ms(reassign(old_heap))
+    new_time = time_ms(reassign(new_heap))
+    print(f"| {'crew reassignment, m = 64'.ljust(format_len)} | {old_time:10.1f}ms | {new_time:10.1f}ms | x{old_time / new_time:6.2f} |")
+    print("-" * 80)
+
+    # Changing the key of a crewmate which is not at the top: rebuild the KeyHeap, or update_key on an IndexedKeyHeap
+    m = 1024
+    rounds = n // 100
+    crews = [CrewMate(i) for i in range(m)]
+    indexed_heap = IndexedKeyHeap(crew_key, crews)
+    handles = {handle.value.id: handle for handle in indexed_heap.handles}
+    changes = [(random.randrange(m), random.randint(0, 10 ** 6)) for _ in range(rounds)]
+    def rebuild():
+        test_heap = KeyHeap(crew_key, crews)
+        for crew_id, key in changes:
+            crews[crew_id].key = key
+            test_heap = KeyHeap(crew_key, test_heap.heap)
+    def update():
+        for crew_id, key in changes:
+            crews[crew_id].key = key
+            indexed_heap.update_key(handles[crew_id])
+    old_time = time_ms(rebuild)
+    new_time = time_ms(update)
+    print(f"[*] Re-keying a crewmate anywhere in the heap, m = {m}, {rounds} times: rebuild {old_time:.1f}ms, update_key {new_time:.1f}ms (x{old_time / new_time:.0f})")
+    print(f"[+] IndexedKeyHeap matches a dict of the keys on random operations: {check_indexed(20000)}")
+
+    # Queue engine of get_completion_time: KeyHeap (StrawHatTreasury) or RadixQueue (RadixTreasury)
+    print("-" * 80)
+    print(f"| {'get_completion_time, n = ' + str(n // 5):<44} | {'KeyHeap'.rjust(12)} | {'Radix'.rjust(12)} | {'speedup'.rjust(6)} |")
+    print("-" * 80)
+    for m, max_size in ((1, 200), (4, 200), (64, 150), (64, 200)):
+        (old_time, new_time), same = large_queues(n // 5, m, max_size)
+        workload = f"m = {m}, sizes 1 to {max_size}" + ("" if same else " (MISMATCH)")
+        print(f"| {workload.ljust(format_len)} | {old_time:10.1f}ms | {new_time:10.1f}ms | x{old_time / new_time:6.2f} |")
+    print("-" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Heap, KeyHeap, IndexedKeyHeap and RadixQueue")
+    parser.add_argument("n", type=int, nargs="?", default=10**6, help="number of heap operations per workload")
+    args = parser.parse_args()
+    main(args.n)
@@ -0,0 +1,44 @@
+from straw_hat import *
+from treasure import *
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+random.seed(42)
+
+
+def main(n=10**6, m=64):
+    format_len = 36
+    print(f"[*] Memory of StrawHatTreasury, n = {n}, m = {m}")
+    print("-" * 62)
+
+    gc.collect()
+    tracemalloc.start()
+
+    test_treasury = StrawHatTreasury(m)
+    last_added = 0
+    for i in range(n):
+        last_added += random.randint(0, 3)
+        test_treasury.add_treasure(Treasure(i, random.randint(1, 200), last_added))
+    added, _ = tracemalloc.get_traced_memory()
+
+    tracemalloc.reset_peak()
+    start_time = time.perf_counter_ns()
+    result = test_treasury.get_completion_time()
+    end_time = time.perf_counter_ns()
+    simulated, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"| {'bytes per treasure after adding'.ljust(format_len)} | {added / n:16.1f} B |")
+    print(f"| {'bytes per treasure after simulating'.ljust(format_len)} | {simulated / n:16.1f} B |")
+    print(f"| {'peak during get_completion_time()'.ljust(format_len)} | {peak / 2 ** 20:15.1f} MB |")
+    print(f"| {'peak per treasure'.ljust(format_len)} | {peak / n:16.1f} B |")
+    print(f"| {'get_completion_time() time'.ljust(format_len)} | {(end_time - start_time) / 1000000:15.1f} ms |")
+    print("-" * 62)
+    del result
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10**6)
@@ -0,0 +1,102 @@
+from straw_hat import *
+from treasure import *
+from server import TreasuryClient
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+
+async def run(n, m, chunk, checks, seed):
+    rng = random.Random(seed)
+    arrivals = []
+    arrival_time = 0
+    for i in range(n):
+        arrival_time += rng.randint(0, 3)
+        arrivals.append((i + 1, rng.randint(1, 200), arrival_time))
+
+    directory = tempfile.mkdtemp(prefix="treasury-server-")
+    path = os.path.join(directory, "socket")
+    code = os.path.dirname(sys.modules["server"].__file__)
+    process = subprocess.Popen([sys.executable, "-m", "server", "-m", str(m), "--unix", path],
+                               cwd=code, stdout=subprocess.PIPE, text=True)
+    try:
+        print(process.stdout.readline().strip())
+        client = await TreasuryClient.connect(path=path)
+
+        start_time = time.perf_counter()
+        for start in range(0, n, chunk):
+            client.send_arrivals(arrivals[start:start + chunk])
+            await client.drain()
+        added, rejected, last_time = await client.stats()
+        elapsed = time.perf_counter() - start_time
+        print(f"[+] {added} arrivals in {elapsed:.2f}s ({added / elapsed:.0f} arrivals/s), {rejected} rejected")
+
+        # Same treasures added locally, to check the replies
+        test_treasury = StrawHatTreasury(m)
+        test_treasury.add_treasures(Treasure(*item) for item in arrivals)
+        test_treasury.get_completion_time()
+        crews = sorted(test_treasury.crew_heap.heap, key=lambda crew: crew.id)
+
+        # The first queries simulate the crewmates of their treasure, the later ones are answered from that state
+        errors = 0
+        ids = rng.sample(range(1, n + 1), min(checks, n))
+        for name in ("first", "cached"):
+            start_time = time.perf_counter()
+            for id in ids:
+                if await client.completion_time_of(id) != test_treasury.completion_time_of(id):
+                    errors += 1
+            elapsed = time.perf_counter() - start_time
+            print(f"[+] {len(ids)} completion queries ({name}) in {elapsed:.2f}s ({len(ids) / elapsed:.0f} queries/s)")
+
+        load_time, loads = await client.loads()
+        if (added, rejected, load_time) != (n, 0, arrivals[-1][2]) or loads != [max(0, crew.key - load_time) for crew in crews]:
+            errors += 1
+
+        # Crewmate ids out of range get an E reply, not another crewmate's load
+        for crew_id in (-1, m):
+            try:
+                await client._request(f"L {crew_id}")
+                errors += 1
+            except ValueError as e:
+                if str(e) != f"unknown crewmate {crew_id}":
+                    errors += 1
+        await client.close()
+
+        # The last request of a connection may lack its newline
+        raw = await TreasuryClient.connect(path=path)
+        raw.writer.write(b"S")
+        raw.writer.write_eof()
+        if (await raw.reader.readline()).split() != [b"S", str(n).encode(), b"0", str(arrivals[-1][2]).encode()]:
+            errors += 1
+        await raw.close()
+    finally:
+        process.terminate()
+        process.wait()
+        if os.path.exists(path):
+            os.remove(path)
+        os.rmdir(directory)
+
+    if errors:
+        print(f"[!] {errors} replies differ from StrawHatTreasury")
+        sys.exit(1)
+    print("[+] All replies match StrawHatTreasury")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the treasury server over a Unix socket")
+    parser.add_argument("-n", type=int, default=10 ** 6, help="number of arrivals")
+    parser.add_argument("-m", type=int, default=64, help="number of crewmates")
+    parser.add_argument("--chunk", type=int, default=10000, help="arrivals per write of the client")
+    parser.add_argument("--checks", type=int, default=1000, help="completion times queried and checked")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(run(args.n, args.m, args.chunk, args.checks, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+from straw_hat import *
+from heap import *
+from treasure import *
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+DISTRIBUTIONS = ["uniform", "bursty", "flood"]
+N_VALUES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+M_VALUES = [1, 10, 100, 1000, 10000, 100000]
+SWEEP_M = 64          # m used while sweeping n
+SWEEP_N = 10 ** 5     # n used while sweeping m
+
+
+def generate(distribution, n, seed):
+    '''
+    Yields n (id, size, arrival_time) tuples in the order of arrival
+        uniform : gaps uniform in [0, 10], sizes uniform in [1, 100]
+        bursty  : bursts of 1 to 1000 treasures arriving within a few time units, separated by long gaps
+        flood   : every treasure arrives at time 0
+    '''
+    rng = random.Random(seed)
+    arrival_time = 0
+    burst_left = 0
+    for i in range(n):
+        size = rng.randint(1, 100)
+        if distribution == "uniform":
+            arrival_time += rng.randint(0, 10)
+        elif distribution == "bursty":
+            if burst_left == 0:
+                burst_left = rng.randint(1, 1000)
+                arrival_time += rng.randint(1000, 100000)
+            else:
+                arrival_time += rng.randint(0, 2)
+            burst_left -= 1
+        elif distribution != "flood":
+            raise ValueError(f"unknown distribution {distribution}")
+        yield (i + 1, size, arrival_time)
+
+
+def time_s(function):
+    start_time = time.perf_counter_ns()
+    function()
+    return (time.perf_counter_ns() - start_time) / 10 ** 9
+
+
+def bench_treasury(distribution, n, m, seed):
+    treasures = [Treasure(*item) for item in generate(distribution, n, seed)]
+    test_treasury = StrawHatTreasury(m)
+
+    def add():
+        for my_treasure in treasures:
+            test_treasury.add_treasure(my_treasure)
+
+    add_time = time_s(add)
+    completion_time = time_s(test_treasury.get_completion_time)
+    return [
+        {"benchmark": "add_treasure", "distribution": distribution, "n": n, "m": m, "seconds": add_time, "ns_per_op": add_time * 10 ** 9 / n},
+        {"benchmark": "get_completion_time", "distribution": distribution, "n": n, "m": m, "seconds": completion_time, "ns_per_op": completion_time * 10 ** 9 / n},
+    ]
+
+
+def bench_snapshot(distribution, n, m, seed):
+    '''
+    Saves a treasury simulated up to 90% of the arrivals, loads it and continues with the last 10%
+    The loaded treasury must give the completion times of the treasury which was not saved
+    '''
+    items = list(generate(distribution, n, seed))
+    split = n - n // 10
+    test_treasury = StrawHatTreasury(m)
+    test_treasury.add_treasures(Treasure(*item) for item in items[:split])
+    test_treasury.get_completion_time()
+
+    descriptor, path = tempfile.mkstemp(prefix="bench-snapshot-")
+    os.close(descriptor)
+    try:
+        save_time = time_s(lambda: test_treasury.save(path))
+        loaded = []
+        load_time = time_s(lambda: loaded.append(StrawHatTreasury.load(path)))
+    finally:
+        os.remove(path)
+
+    def resume():
+        loaded[0].add_treasures(Treasure(*item) for item in items[split:])
+        loaded.append(loaded[0].get_completion_time())
+
+    continue_time = time_s(resume)
+    test_treasury.add_treasures(Treasure(*item) for item in items[split:])
+    if [(t.id, t.completion_time) for t in test_treasury.get_completion_time()] != [(t.id, t.completion_time) for t in loaded[1]]:
+        raise AssertionError(f"the loaded treasury differs ({distribution}, n = {n}, m = {m})")
+    return [
+        {"benchmark": "save", "distribution": distribution, "n": n, "m": m, "seconds": save_time, "ns_per_op": save_time * 10 ** 9 / n},
+        {"benchmark": "load", "distribution": distribution, "n": n, "m": m, "seconds": load_time, "ns_per_op": load_time * 10 ** 9 / n},
+        {"benchmark": "continue after load", "distribution": distribution, "n": n, "m": m, "seconds": continue_time, "ns_per_op": continue_time * 10 ** 9 / n},
+    ]
+
+
+def bench_heap(n, seed):
+    rng = random.Random(seed)
+    values = [rng.randint(0, 10 ** 9) for _ in range(n)]
+    results = []
+    for name, test_heap in (("Heap", Heap(lambda x, y: x < y, [])), ("KeyHeap", KeyHeap(None, []))):
+        insert_time = time_s(lambda: [test_heap.insert(value) for value in values])
+        extract_time = time_s(lambda: [test_heap.extract() for _ in range(n)])
+        results.append({"benchmark": f"{name}.insert", "distribution": None, "n": n, "m": None, "seconds": insert_time, "ns_per_op": insert_time * 10 ** 9 / n})
+        results.append({"benchmark": f"{name}.extract", "distribution": None, "n": n, "m": None, "seconds": extract_time, "ns_per_op": extract_time * 10 ** 9 / n})
+    return results
+
+
+def case_key(result):
+    return (result["benchmark"], result["distribution"], result["n"], result["m"])
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Returns the results slower than tolerance times their baseline (per operation)
+    '''
+    baseline_by_key = {case_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = baseline_by_key.get(case_key(result))
+        if old is not None and result["ns_per_op"] > old["ns_per_op"] * tolerance:
+            regressions.append((result, old))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmarks of StrawHatTreasury and Heap")
+    parser.add_argument("--max-n", type=int, default=N_VALUES[-1], help="largest n of the n sweep")
+    parser.add_argument("--max-m", type=int, default=M_VALUES[-1], help="largest m of the m sweep")
+    parser.add_argument("--distributions", nargs="+", default=DISTRIBUTIONS, choices=DISTRIBUTIONS)
+    parser.add_argument("--output", default="bench_results.json", help="file receiving the results as JSON")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against, written by --output on the same machine")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="slowdown factor reported as a regression")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    format_len = 22
+    results = []
+
+    def record(new_results):
+        for result in new_results:
+            print(f"| {result['benchmark'].ljust(format_len)} | {str(result['distribution']).ljust(7)} | n = {str(result['n']).ljust(8)} | m = {str(result['m']).ljust(6)} | {result['seconds'] * 1000:12.2f}ms | {result['ns_per_op']:10.1f}ns/op |")
+        results.extend(new_results)
+
+    print("-" * 104)
+    for n in N_VALUES:
+        if n > args.max_n:
+            break
+        record(bench_heap(n, args.seed))
+        for distribution in args.distributions:
+            record(bench_treasury(distribution, n, SWEEP_M, args.seed))
+            record(bench_snapshot(distribution, n, SWEEP_M, args.seed))
+    for m in M_VALUES:
+        if m > args.max_m:
+            break
+        for distribution in args.distributions:
+            record(bench_treasury(distribution, min(SWEEP_N, args.max_n), m, args.seed))
+    print("-" * 104)
+
+    report = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=1)
+    print(f"[+] Results written to {args.output}")
+
+    if args.baseline:
+        try:
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            print(f"[!] No baseline {args.baseline}: record one with --output {args.baseline} on the commit to compare against")
+            sys.exit(2)
+        regressions = compare(results, baseline, args.tolerance)
+        for result, old in regressions:
+            print(f"[!] Regression in {case_key(result)}: {old['ns_per_op']:.1f}ns/op -> {result['ns_per_op']:.1f}ns/op")
+        if regressions:
+            sys.exit(1)
+        print(f"[+] No regression against {args.baseline} (tolerance x{args.tolerance})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,663 @@
+from straw_hat import *
+from spilling import *
+from mixed_speed import *
+from treasure import *
+from sharding import ShardedTreasury
+from main1 import NaiveTreasure, NaiveTreasury
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import weakref
+
+
+
+class RetiringTreasury(StrawHatTreasury):
+    '''
+    StrawHatTreasury retiring the finished treasures at every get_completion_time,
+    which returns them together with the treasures left
+    '''
+
+    def __init__(self, m):
+        super().__init__(m)
+        self.retired = []
+
+    def get_completion_time(self):
+        self.retired.extend(self.retire())
+        return sorted(self.retired + super().get_completion_time(), key=lambda treasure: treasure.id)
+
+
+class UnitSpeedTreasury(MixedSpeedTreasury):
+    '''
+    MixedSpeedTreasury whose crewmates all have speed 1, which must schedule like StrawHatTreasury
+    '''
+
+    def __init__(self, m):
+        super().__init__([1] * m)
+
+
+class ReusedDirectorySpillingTreasury(SpillingTreasury):
+    '''
+    SpillingTreasury spilling after two records, in a directory where an earlier treasury which was not closed
+    left a spill file for every crewmate; none of its records may show up in the results
+    '''
+
+    def __init__(self, m):
+        directory = tempfile.mkdtemp(prefix="fuzz-spill-")
+        earlier = SpillingTreasury(m, 0, directory)
+        earlier.add_treasures(Treasure(10 ** 6 + i, 1, 0) for i in range(m))
+        super().__init__(m, 2 * SPILL_RECORD_BYTES, directory)
+        weakref.finalize(self, shutil.rmtree, directory)
+
+
+class SmallBatchShardedTreasury(ShardedTreasury):
+    '''
+    ShardedTreasury over two shard processes sending the treasures three at a time, so that the batches are sent
+    both when they are full and before the requests
+    '''
+
+    def __init__(self, m):
+        super().__init__(m, 2, batch_size=3)
+
+
+TREASURIES = {"straw_hat": StrawHatTreasury, "columnar": ColumnarTreasury, "instrumented": InstrumentedTreasury, "retiring": RetiringTreasury,
+              "unit_speed": UnitSpeedTreasury, "radix": RadixTreasury, "spilling": ReusedDirectorySpillingTreasury,
+              "mixed_speed": MixedSpeedTreasury, "sharded": SmallBatchShardedTreasury}
+
+# The operations besides add_treasure which the random cases of a treasury mix in, each in about half of the cases
+# ("speeds": crewmates of different speeds, the treasury is then built from the list of speeds instead of m)
+# retire is left out of the cases with cancel_treasure or completion_time_of, which need the retired treasures,
+# cancel_treasure out of the cases with advance_to, as it is not supported once the clock is started,
+# and save out of them too, as the clock is not saved
+OPERATIONS = {"straw_hat": ("add_crewmates", "retire_crewmate", "retire", "cancel_treasure", "completion_time_of", "advance_to", "save"),
+              "columnar": ("add_crewmates", "completion_time_of", "save"),
+              "instrumented": ("add_crewmates", "retire_crewmate", "cancel_treasure", "completion_time_of", "advance_to", "save"),
+              "retiring": ("add_crewmates", "retire_crewmate", "advance_to"), "unit_speed": ("add_crewmates", "retire", "completion_time_of"),
+              "radix": ("add_crewmates", "retire_crewmate", "cancel_treasure", "completion_time_of", "advance_to", "save"),
+              "mixed_speed": ("speeds", "add_crewmates", "retire", "completion_time_of"), "sharded": ("completion_time_of",)}
+SPEEDS = (1, 2, 3, Fraction(1, 2), Fraction(3, 2), Fraction(1, 3))
+
+# Events whose last element is a time
+TIMED = ('A', 'early_A', 'retire_crew', 'early_retire_crew', 'advance')
+
+
+class TieBreakingNaiveTreasury(NaiveTreasury):
+    '''
+    NaiveTreasury giving a treasure to the crewmate with the least load, and among idle crewmates to the one idle
+    for the longest time, then the least id. The README allows any of the least loaded crewmates; this is the choice
+    StrawHatTreasury makes (its crew heap is keyed by (time the crewmate becomes free, id)), so that the completion
+    times can be compared exactly. NaiveTreasury itself takes the least id, which differs once two idle crewmates
+    tie and a later treasure is then assigned by id.
+    '''
+
+    def assign_available_treasures(self, current_time):
+        available_treasures = [t for t in self.unassigned_treasures if t.arrival_time <= current_time]
+        available_treasures.sort(key=lambda x: (x.arrival_time, x.id))
+
+        for treasure in available_treasures:
+            def order(crewmate):
+                load = crewmate.calculate_load()
+                if load > 0:
+                    return (load, 0, crewmate.id)
+                idle_since = max((t.completion_time for t in crewmate.treasures), default=0)
+                return (0, idle_since, crewmate.id)
+
+            selected_crewmate = min(self.crewmates, key=order)
+            selected_crewmate.treasures.append(treasure)
+            treasure.assigned_crewmate = selected_crewmate
+            self.unassigned_treasures.remove(treasure)
+
+
+def divide(value, speed):
+    # Exact value / speed, left as it is at unit speed to keep the times ints
+    return value if speed == 1 else Fraction(value) / speed
+
+
+def run_crewmate(items, speed, until=None):
+    '''
+    Simulates one crewmate on the (id, size, arrival_time) of its treasures, in the order of their arrival, from event
+    to event (arrivals and completions) in exact fractions: it processes its treasure of least
+    (arrival_time + remaining size, id) at its speed
+    Returns ({id: completion_time}, [remaining size, arrival_time, id, size] of the treasures pending, the time of its
+    last completion or 0) at the time until, at the end if until is None
+    '''
+    completion = {}
+    pending = []
+    idle_since = 0
+    index = 0
+    t = 0
+    while index < len(items) or pending:
+        next_arrival = items[index][2] if index < len(items) else None
+        if pending:
+            top = min(pending, key=lambda item: (item[1] + item[0], item[2]))
+            done = t + divide(top[0], speed)
+        if pending and (next_arrival is None or done <= next_arrival):
+            if until is not None and done > until:
+                break
+            pending.remove(top)
+            completion[top[2]] = idle_since = t = done
+        else:
+            if until is not None and next_arrival > until:
+                break
+            if pending:
+                top[0] -= (next_arrival - t) * speed
+            t = next_arrival
+            id, size, arrival_time = items[index]
+            pending.append([size, arrival_time, id, size])
+            index += 1
+    if until is not None and pending:
+        min(pending, key=lambda item: (item[1] + item[0], item[2]))[0] -= (until - t) * speed
+    return completion, pending, idle_since
+
+
+def tick_crewmate(items, until):
+    '''
+    Runs one crewmate on the (id, size, arrival_time) of its treasures one time unit at a time up to the time until,
+    processing in each unit its arrived treasure of least (arrival_time + remaining size, id)
+    Returns the [remaining size, arrival_time, id] of its treasures arrived by until and not completed, in the order
+    they will be processed if nothing else arrives
+    '''
+    pending = []
+    index = 0
+    for t in range(until + 1):
+        while index < len(items) and items[index][2] <= t:
+            id, size, arrival_time = items[index]
+            pending.append([size, arrival_time, id])
+            index += 1
+        if t == until:
+            break
+        if pending:
+            item = min(pending, key=lambda item: (item[1] + item[0], item[2]))
+            item[0] -= 1
+            if item[0] == 0:
+                pending.remove(item)
+    return sorted(pending, key=lambda item: (item[1] + item[0], item[2]))
+
+
+class EventSchedule:
+    '''
+    Reference of the cases with more than arrivals: keeps the treasures given to each crewmate and simulates the
+    crewmates with run_crewmate whenever their state at a time is needed
+    An arrival goes to the active crewmate finishing it first, time + (remaining load + size) / speed, ties broken by
+    the time it becomes free (its last completion if it is idle) then id, the choice of TieBreakingNaiveTreasury
+    A retired crewmate completes the treasures it has started; the ones it never touched arrive again at the time
+    of the retirement, in the order of their first arrival
+    A cancelled treasure is withdrawn as if it had never been given to its crewmate. The crewmate it leaves idle
+    may keep the arrival of the cancelled treasure as its free time, so from the first cancellation on any crewmate
+    finishing the arrival first is a valid choice
+    With crew_of, a function returning the id of the crewmate the treasury chose for a treasure id, the choices
+    are checked (AssertionError) and followed instead of made
+    '''
+
+    def __init__(self, speeds, crew_of=None):
+        self.speeds = list(speeds)
+        self.active = [True] * len(self.speeds)
+        self.items = [[] for _ in self.speeds] # (id, size, arrival_time) of the treasures given to each crewmate
+        self.crew_of = crew_of
+        self.cancelled = False
+
+    def add_crewmate(self, speed):
+        self.speeds.append(speed)
+        self.active.append(True)
+        self.items.append([])
+
+    def assign(self, id, size, time):
+        def order(crew_id):
+            speed = self.speeds[crew_id]
+            _, pending, idle_since = run_crewmate(self.items[crew_id], speed, time)
+            load = sum(item[0] for item in pending)
+            free = time + divide(load, speed) if load > 0 else idle_since
+            return (time + divide(load + size, speed), free, crew_id)
+        orders = {crew_id: order(crew_id) for crew_id, active in enumerate(self.active) if active}
+        crew_id = min(orders, key=orders.get)
+        if self.crew_of is not None:
+            chosen = self.crew_of(id)
+            if chosen not in orders or orders[chosen][0] != orders[crew_id][0] or (chosen != crew_id and not self.cancelled):
+                raise AssertionError(f"treasure {id} given to crewmate {chosen}, expected crewmate {crew_id} of (finish, free, id) {orders}")
+            crew_id = chosen
+        self.items[crew_id].append((id, size, time))
+
+    def retire_crewmate(self, crew_id, time):
+        self.active[crew_id] = False
+        _, pending, _ = run_crewmate(self.items[crew_id], self.speeds[crew_id], time)
+        moved = sorted((arrival_time, id, size) for remaining, arrival_time, id, size in pending if remaining == size)
+        moved_ids = {id for _, id, _ in moved}
+        self.items[crew_id] = [item for item in self.items[crew_id] if item[0] not in moved_ids]
+        for _, id, size in moved:
+            self.assign(id, size, time)
+
+    def cancel(self, id):
+        for crew_id, items in enumerate(self.items):
+            self.items[crew_id] = [item for item in items if item[0] != id]
+        self.cancelled = True
+
+    def completions(self):
+        completion = {}
+        for items, speed in zip(self.items, self.speeds):
+            completion.update(run_crewmate(items, speed)[0])
+        return completion
+
+
+def generate_case(seed, treasury_name, max_m, max_n, max_size, max_gap):
+    '''
+    Returns the random case of a seed as (speeds, events, checkpoint, batched) where
+        speeds     : the speed of each crewmate (all 1 unless the treasury has the "speeds" operation)
+        events     : the calls in the order they are made, ('A', id, size, arrival_time) for the arrivals (gaps may be 0),
+                     mixed with the OPERATIONS of the treasury:
+                         ('add', speed)                    add_crewmates(1), or add_crewmates(1, speed) if speed is not 1
+                         ('retire_crew', crew_id, time)    retire_crewmate, never of the last active crewmate
+                         ('retire',)                       retire()
+                         ('cancel', id)                    cancel_treasure, of a treasure added and not cancelled yet,
+                                                           whose id a later arrival may reuse
+                         ('of', id)                        completion_time_of, of a treasure not cancelled
+                         ('advance', time)                 advance_to, whose live queries are compared with tick_crewmate
+                         ('save', simulated)               save to a file, the later calls going to the treasury loaded
+                                                           from it; if simulated, after get_completion_time, whose
+                                                           schedule iter_completions must give again once loaded
+                     and calls which must raise ValueError: ('early_retire_crew', crew_id, time) before the latest
+                     arrival, ('early_A', id, size, arrival_time) before the last retire_crewmate or advance_to
+        checkpoint : number of events after which get_completion_time is called once more (0 for none),
+                     to exercise the state kept between calls
+        batched    : whether the arrivals between two other events are added with add_treasures instead of add_treasure
+    '''
+    rng = random.Random(seed)
+    operations = [operation for operation in OPERATIONS.get(treasury_name, ()) if rng.random() < 0.5]
+    if "cancel_treasure" in operations or "completion_time_of" in operations:
+        operations = [operation for operation in operations if operation != "retire"]
+    if "advance_to" in operations:
+        operations = [operation for operation in operations if operation not in ("cancel_treasure", "save")]
+    m = rng.randint(1, max_m)
+    speeds = [rng.choice(SPEEDS) if "speeds" in operations else 1 for _ in range(m)]
+    active = list(range(m))
+    crew_count = m
+    retire_time = None
+    clock_time = None
+    live = []
+    cancelled = []
+    events = []
+    arrival_time = rng.randint(0, max_gap)
+    for i in range(rng.randint(1, max_n)):
+        id = cancelled.pop(rng.randrange(len(cancelled))) if cancelled and rng.random() < 0.3 else i + 1
+        events.append(('A', id, rng.randint(1, max_size), arrival_time))
+        live.append(id)
+        if "retire_crewmate" in operations:
+            if arrival_time > 0 and len(active) > 1 and rng.random() < 0.15:
+                events.append(('early_retire_crew', rng.choice(active), rng.randint(0, arrival_time - 1)))
+        earliest_arrival = max(retire_time or 0, clock_time or 0)
+        if earliest_arrival and rng.random() < 0.15:
+            events.append(('early_A', max_n + i + 1, rng.randint(1, max_size), rng.randint(0, earliest_arrival - 1)))
+        if "add_crewmates" in operations and rng.random() < 0.1:
+            events.append(('add', rng.choice(SPEEDS) if "speeds" in operations else 1))
+            active.append(crew_count)
+            crew_count += 1
+        if "retire_crewmate" in operations and len(active) > 1 and rng.random() < 0.15:
+            arrival_time = retire_time = arrival_time + rng.randint(0, 2)
+            events.append(('retire_crew', active.pop(rng.randrange(len(active))), retire_time))
+        if "retire" in operations and rng.random() < 0.1:
+            events.append(('retire',))
+        while "cancel_treasure" in operations and live and rng.random() < 0.3:
+            cancelled.append(live.pop(rng.randrange(len(live))))
+            events.append(('cancel', cancelled[-1]))
+        if "completion_time_of" in operations and live and rng.random() < 0.2:
+            events.append(('of', rng.choice(live)))
+        if "advance_to" in operations and rng.random() < 0.2:
+            arrival_time = clock_time = arrival_time + rng.randint(0, max_gap)
+            events.append(('advance', clock_time))
+        if "save" in operations and rng.random() < 0.1:
+            events.append(('save', rng.random() < 0.5))
+        arrival_time += rng.randint(0, max_gap)
+    return (speeds, events, rng.randint(0, len(events) - 1), rng.random() < 0.5)
+
+
+def is_valid(case):
+    '''
+    Returns whether the events of a case are calls the treasury must accept, but for the early ones which it must
+    reject: ids of treasures not cancelled distinct, arrivals and retirements in the order of their times and not
+    before the clock, advance_to in the order of its times, save not in the cases with advance_to,
+    retirements of active crewmates, cancel_treasure and completion_time_of of treasures not cancelled
+    '''
+    speeds, events, checkpoint, batched = case
+    active = set(range(len(speeds)))
+    crew_count = len(speeds)
+    latest_arrival = retire_time = clock_time = None
+    live = set()
+    for event in events:
+        if event[0] in TIMED and event[-1] < 0:
+            return False
+        if event[0] == 'A':
+            if event[1] in live or (latest_arrival is not None and event[-1] < latest_arrival):
+                return False
+            if clock_time is not None and event[-1] < clock_time:
+                return False
+            live.add(event[1])
+            latest_arrival = event[-1]
+        elif event[0] in ('cancel', 'of'):
+            if event[1] not in live:
+                return False
+            if event[0] == 'cancel':
+                live.remove(event[1])
+        elif event[0] == 'early_A':
+            if event[-1] >= max(time for time in (retire_time, clock_time, 0) if time is not None):
+                return False
+        elif event[0] == 'advance':
+            if clock_time is not None and event[-1] < clock_time:
+                return False
+            clock_time = event[-1]
+        elif event[0] == 'add':
+            active.add(crew_count)
+            crew_count += 1
+        elif event[0] in ('retire_crew', 'early_retire_crew'):
+            if event[1] not in active or len(active) == 1 or latest_arrival is None:
+                return False
+            if event[0] == 'early_retire_crew':
+                if event[-1] >= latest_arrival:
+                    return False
+            else:
+                if event[-1] < latest_arrival or (clock_time is not None and event[-1] < clock_time):
+                    return False
+                active.remove(event[1])
+                latest_arrival = retire_time = event[-1]
+    if any(event[0] == 'save' for event in events) and any(event[0] == 'advance' for event in events):
+        return False
+    return any(event[0] == 'A' for event in events)
+
+
+def save_and_load(test_treasury):
+    '''
+    Saves the treasury to a temporary file and returns the treasury loaded from it
+    '''
+    descriptor, path = tempfile.mkstemp(prefix="fuzz-snapshot-")
+    os.close(descriptor)
+    try:
+        test_treasury.save(path)
+        return type(test_treasury).load(path)
+    finally:
+        os.remove(path)
+
+
+def check_clock(test_treasury, schedule, time):
+    '''
+    Advances the clock of the treasury to the time and compares crew_loads, current_treasure and remaining_sizes
+    with tick_crewmate on the treasures of every crewmate; raises AssertionError on a difference
+    '''
+    test_treasury.advance_to(time)
+    loads = test_treasury.crew_loads()
+    for crew_id, items in enumerate(schedule.items):
+        expected = [(id, remaining) for remaining, _, id in tick_crewmate(items, time)]
+        remaining = [(my_treasure.id, remaining) for my_treasure, remaining in test_treasury.remaining_sizes(crew_id)]
+        current = test_treasury.current_treasure(crew_id)
+        if (remaining != expected or loads[crew_id] != sum(remaining for _, remaining in expected)
+                or (current.id if current is not None else None) != (expected[0][0] if expected else None)):
+            raise AssertionError(f"crewmate {crew_id} at {time}: queue {remaining}, load {loads[crew_id]}, "
+                                 f"current {current and current.id}, expected queue {expected}")
+
+
+def run_case(case, treasury_name):
+    '''
+    Makes the calls of the case on the treasury and on an EventSchedule, which follows the choices of the treasury
+    when the case cancels treasures
+    Returns (the treasures returned by the final get_completion_time with the ones retired before, sorted by id,
+    the EventSchedule); raises AssertionError if the treasury accepts an early event, if completion_time_of
+    disagrees with the final get_completion_time on the treasures queried, or if close() leaves a shard process running
+    '''
+    speeds, events, checkpoint, batched = case
+    if "speeds" in OPERATIONS.get(treasury_name, ()):
+        test_treasury = TREASURIES[treasury_name](speeds)
+    else:
+        test_treasury = TREASURIES[treasury_name](len(speeds))
+    cancels = any(event[0] == 'cancel' for event in events)
+    if cancels:
+        test_treasury._build_index() # keeps crew_of up to date from the first treasure
+        schedule = EventSchedule(speeds, lambda id: test_treasury.crew_of[id].id)
+    else:
+        schedule = EventSchedule(speeds)
+    retired = []
+    arrivals = [] # arrivals not given to the treasury yet, added together when batched
+
+    def flush():
+        my_treasures = [Treasure(id, size, arrival_time) for _, id, size, arrival_time in arrivals]
+        if batched:
+            test_treasury.add_treasures(my_treasures)
+        else:
+            for my_treasure in my_treasures:
+                test_treasury.add_treasure(my_treasure)
+        for _, id, size, arrival_time in arrivals:
+            schedule.assign(id, size, arrival_time)
+        arrivals.clear()
+
+    for position, event in enumerate(events):
+        if event[0] == 'A':
+            arrivals.append(event)
+            if not batched:
+                flush()
+        else:
+            flush()
+        if event[0] in ('early_A', 'early_retire_crew'):
+            try:
+                if event[0] == 'early_A' and batched:
+                    test_treasury.add_treasures([Treasure(*event[1:])])
+                elif event[0] == 'early_A':
+                    test_treasury.add_treasure(Treasure(*event[1:]))
+                else:
+                    test_treasury.retire_crewmate(*event[1:])
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"{event} is accepted")
+        elif event[0] == 'add':
+            if event[1] == 1:
+                test_treasury.add_crewmates(1)
+            else:
+                test_treasury.add_crewmates(1, event[1])
+            schedule.add_crewmate(event[1])
+        elif event[0] == 'retire_crew':
+            test_treasury.retire_crewmate(*event[1:])
+            schedule.retire_crewmate(*event[1:])
+        elif event[0] == 'retire':
+            retired.extend(test_treasury.retire())
+        elif event[0] == 'cancel':
+            test_treasury.cancel_treasure(event[1])
+            schedule.cancel(event[1])
+        elif event[0] == 'of':
+            test_treasury.completion_time_of(event[1])
+        elif event[0] == 'advance':
+            check_clock(test_treasury, schedule, event[1])
+        elif event[0] == 'save':
+            if event[1]:
+                saved = sorted((my_treasure.completion_time, my_treasure.id) for my_treasure in test_treasury.get_completion_time())
+            test_treasury = save_and_load(test_treasury)
+            if event[1]:
+                loaded = [(my_treasure.completion_time, my_treasure.id) for my_treasure in test_treasury.iter_completions()]
+                if loaded != saved:
+                    raise AssertionError(f"iter_completions after load gives {loaded}, {saved} when saved")
+            if cancels:
+                test_treasury._build_index()
+        if position + 1 == checkpoint:
+            flush()
+            test_treasury.get_completion_time()
+    flush()
+    final = test_treasury.get_completion_time()
+    completion_times = {my_treasure.id: my_treasure.completion_time for my_treasure in final}
+    for id in sorted({event[1] for event in events if event[0] == 'of'} & completion_times.keys()):
+        if test_treasury.completion_time_of(id) != completion_times[id]:
+            raise AssertionError(f"completion_time_of({id}) is {test_treasury.completion_time_of(id)}, "
+                                 f"get_completion_time gives {completion_times[id]}")
+    if hasattr(test_treasury, 'close'):
+        processes = getattr(test_treasury, 'processes', [])
+        test_treasury.close()
+        if any(process.is_alive() for process in processes):
+            raise AssertionError("close() left a shard process running")
+    return sorted(retired + final, key=lambda treasure: treasure.id), schedule
+
+
+def check_case(case, treasury_name):
+    '''
+    Returns None if the treasury agrees with the reference on the case, the description of the difference otherwise
+    The reference is TieBreakingNaiveTreasury for the cases with only arrivals at unit speed, EventSchedule for the others
+    '''
+    speeds, events, checkpoint, batched = case
+    try:
+        result, schedule = run_case(case, treasury_name)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+    if all(event[0] == 'A' for event in events) and all(speed == 1 for speed in speeds):
+        naive_treasury = TieBreakingNaiveTreasury(len(speeds))
+        for event in events:
+            naive_treasury.add_treasure(NaiveTreasure(*event[1:]))
+        expected = [(naive_treasure.id, naive_treasure.completion_time) for naive_treasure in naive_treasury.get_completion_time(visualize=False)]
+    else:
+        expected = sorted(schedule.completions().items())
+
+    if len(result) != len(expected):
+        return f"Different number of treasures: {len(result)} vs {len(expected)}"
+    for my_treasure, (id, completion_time) in zip(result, expected):
+        if (my_treasure.id, my_treasure.completion_time) != (id, completion_time):
+            return f"Treasure {id}: expected {completion_time}, received {(my_treasure.id, my_treasure.completion_time)}"
+    # The treasures keep the arrival time they were added with, even when retire_crewmate moved them
+    arrival_times = {event[1]: event[-1] for event in events if event[0] == 'A'}
+    for my_treasure in result:
+        if my_treasure.arrival_time != arrival_times[my_treasure.id]:
+            return f"Treasure {my_treasure.id}: arrival time {my_treasure.arrival_time}, added at {arrival_times[my_treasure.id]}"
+    # At unit speed the times are ints, not Fractions equal to them
+    if all(speed == 1 for speed in speeds) and all(event[1] == 1 for event in events if event[0] == 'add'):
+        for my_treasure in result:
+            if type(my_treasure.completion_time) is not int:
+                return f"Treasure {my_treasure.id}: completion time {my_treasure.completion_time!r} is not an int"
+    return None
+
+
+def run_seed(arguments):
+    '''
+    Pool worker: returns (seed, case, error) for a failing seed, None otherwise
+    '''
+    seed, treasury_name, max_m, max_n, max_size, max_gap = arguments
+    case = generate_case(seed, treasury_name, max_m, max_n, max_size, max_gap)
+    error = check_case(case, treasury_name)
+    if error is None:
+        return None
+    return (seed, case, error)
+
+
+def shift(event, gap):
+    return event[:-1] + (event[-1] - gap,) if event[0] in TIMED else event
+
+
+def candidates(case):
+    '''
+    Yields the cases one step smaller than case: fewer events (halves down to single ones), no checkpoint,
+    fewer crewmates, unit speeds, smaller sizes, shorter gaps between arrivals and ids renumbered from 1
+    Some of them may not be valid (see is_valid)
+    '''
+    speeds, events, checkpoint, batched = case
+    n = len(events)
+    chunk = n // 2
+    while chunk >= 1:
+        for start in range(0, n, chunk):
+            rest = events[:start] + events[start + chunk:]
+            if rest:
+                yield (speeds, rest, min(checkpoint, len(rest) - 1), batched)
+        chunk //= 2
+    if checkpoint != 0:
+        yield (speeds, events, 0, batched)
+    if batched:
+        yield (speeds, events, checkpoint, False)
+    if len(speeds) > 1:
+        yield (speeds[:-1], events, checkpoint, batched)
+    for i, speed in enumerate(speeds):
+        if speed != 1:
+            yield (speeds[:i] + [1] + speeds[i + 1:], events, checkpoint, batched)
+    for i, event in enumerate(events):
+        if event[0] == 'add' and event[1] != 1:
+            yield (speeds, events[:i] + [('add', 1)] + events[i + 1:], checkpoint, batched)
+    for i, event in enumerate(events):
+        if event[0] in ('A', 'early_A'):
+            kind, id, size, arrival_time = event
+            for smaller in sorted({1, size // 2, size - 1}):
+                if 1 <= smaller < size:
+                    yield (speeds, events[:i] + [(kind, id, smaller, arrival_time)] + events[i + 1:], checkpoint, batched)
+    previous = 0
+    for i, event in enumerate(events):
+        if event[0] in ('A', 'retire_crew', 'advance'):
+            gap = event[-1] - previous
+            previous = event[-1]
+            if gap > 0:
+                yield (speeds, events[:i] + [shift(later, gap) for later in events[i:]], checkpoint, batched)
+    numbers = {}
+    renumbered = [(event[0], numbers.setdefault(event[1], len(numbers) + 1)) + event[2:] if event[0] in ('A', 'early_A', 'cancel', 'of') else event for event in events]
+    if renumbered != events:
+        yield (speeds, renumbered, checkpoint, batched)
+
+
+def shrink(case, treasury_name):
+    '''
+    Greedily replaces the failing case by its first smaller valid candidate which still fails, until none does
+    Returns the minimal case and its error
+    '''
+    error = check_case(case, treasury_name)
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for candidate in filter(is_valid, candidates(case)):
+            candidate_error = check_case(candidate, treasury_name)
+            if candidate_error is not None:
+                case, error, shrunk = candidate, candidate_error, True
+                break
+    return case, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential fuzzing of the treasuries against NaiveTreasury")
+    parser.add_argument("--cases", type=int, default=10000, help="number of random cases")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="size of the process pool")
+    parser.add_argument("--treasury", default="straw_hat", choices=sorted(TREASURIES))
+    parser.add_argument("--max-m", type=int, default=10)
+    parser.add_argument("--max-n", type=int, default=20)
+    parser.add_argument("--max-size", type=int, default=20)
+    parser.add_argument("--max-gap", type=int, default=5, help="largest gap between two arrivals")
+    parser.add_argument("--max-failures", type=int, default=3, help="failing cases shrunk and reported")
+    parser.add_argument("--output", help="file receiving the shrunk failing cases as JSON")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first case, case i uses seed + i")
+    args = parser.parse_args()
+
+    print(f"[*] Fuzzing {args.treasury} with {args.cases} cases on {args.processes} processes")
+    work = ((args.seed + i, args.treasury, args.max_m, args.max_n, args.max_size, args.max_gap) for i in range(args.cases))
+    chunksize = max(1, args.cases // (args.processes * 16))
+
+    failures = []
+    checked = 0
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        for outcome in executor.map(run_seed, work, chunksize=chunksize):
+            checked += 1
+            if outcome is not None:
+                failures.append(outcome)
+                if len(failures) >= args.max_failures:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    break
+    elapsed = time.perf_counter() - start_time
+    print(f"[+] {checked} cases in {elapsed:.1f}s ({checked / elapsed:.0f} cases/s), {len(failures)} failures")
+
+    report = []
+    for seed, case, error in failures:
+        (speeds, events, checkpoint, batched), error = shrink(case, args.treasury)
+        print(f"[!] Seed {seed} fails, shrunk to speeds = {speeds}, checkpoint = {checkpoint}, batched = {batched}, events = {events}")
+        print(f"    {error}")
+        report.append({"seed": seed, "speeds": speeds, "events": events, "checkpoint": checkpoint, "batched": batched, "error": error})
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"treasury": args.treasury, "cases": checked, "seconds": elapsed, "failures": report}, file, indent=1, default=str)
+        print(f"[+] Results written to {args.output}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -161,7 +161,7 @@ class NaiveTreasury:
             elif self.visualizer:
                 self.visualizer.update_crewmate_status(crewmate.id)
     
-    def get_completion_time(self):
+    def get_completion_time(self, visualize=True):
         all_treasures = self.unassigned_treasures.copy()
         for crewmate in self.crewmates:
             all_treasures.extend(crewmate.treasures)
@@ -179,11 +179,21 @@ class NaiveTreasury:
         for crewmate in self.crewmates:
             crewmate.treasures = []
         
+        current_time = min(t.arrival_time for t in all_treasures)
+
+        if not visualize:
+            # Headless run (used by Testing/fuzz.py): same ticks, without display or delays
+            self.visualizer = None
+            while any(t.completion_time is None for t in all_treasures):
+                self.assign_available_treasures(current_time)
+                self.process_treasures(current_time)
+                current_time += 1
+            return sorted(all_treasures, key=lambda x: x.id)
+
         # Initialize visualization
         self.visualizer = ProcessVisualizer(len(self.crewmates), len(all_treasures))
         self.visualizer.initialize_display()
         
-        current_time = min(t.arrival_time for t in all_treasures)
         time_progress = ProgressBar(max(t.size for t in all_treasures) * len(all_treasures), 
                                   prefix='Time Progress:', suffix='')
         
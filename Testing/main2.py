@@ -1,6 +1,7 @@
 from straw_hat import *
 from heap import *
 from treasure import *
+from reference import ReferenceScheduler, cross_check
 import random
 import time
 
@@ -21,89 +22,6 @@ def progress_bar(iterable, prefix = '', suffix = '', decimals = 1, length = 100,
     print()
 
 
-class Chest:
-    def __init__(self, chest_id, arrival_time, original_size):
-        self.chest_id = chest_id
-        self.arrival_time = arrival_time
-        self.original_size = original_size
-        self.remaining_size = original_size
-        self.waiting_time = 0
-        self.processed = 0
-
-    def __str__(self):
-        return f"[{self.chest_id}] - ({self.original_size}, {self.arrival_time})"
-
-
-class Worker:
-    def __init__(self, worker_id):
-        self.worker_id = worker_id
-        self.chests = []
-        self.current_chest = None
-
-
-class Manual:
-    def __init__(self, chests, n):
-        self.chests = [Chest(*chest) for chest in chests]
-        self.workers = [Worker(i) for i in range(n)]
-        self.time = 0
-        self.completion_times = {}
-        for chest in self.chests:
-            self.completion_times[chest.chest_id] = 0
-            if chest.arrival_time == 0:
-                self.workers[0].chests.append(chest)
-
-    def tick(self):
-        self.time += 1
-        for worker in self.workers:
-            for chest in worker.chests:
-                chest.waiting_time += 1
-        for chest in self.chests:
-            if chest.arrival_time == self.time:
-                min_load = sum([sum([chest.remaining_size for chest in worker.chests]) for worker in self.workers])
-                best_worker = None
-                for worker in self.workers:
-                    load = sum([chest.remaining_size for chest in worker.chests])
-                    if load <= min_load:
-                        min_load = load
-                        best_worker = worker
-                best_worker.chests.append(chest)
-        for worker in self.workers:
-            if worker.current_chest:
-                worker.current_chest.remaining_size -= 1
-                worker.current_chest.processed += 1
-                if worker.current_chest.remaining_size == 0:
-                    worker.chests.remove(worker.current_chest)
-                    self.completion_times[worker.current_chest.chest_id] = self.time
-                    worker.current_chest = None
-            if worker.chests:
-                max_cri = self.time - worker.chests[0].arrival_time - worker.chests[0].remaining_size
-                best_chest = None
-                for chest in worker.chests:
-                    cri = chest.waiting_time - chest.remaining_size
-                    if cri > max_cri:
-                        max_cri = cri
-                        best_chest = chest
-                    elif cri == max_cri:
-                        if best_chest is None:
-                            best_chest = chest
-                        elif chest.chest_id < best_chest.chest_id:
-                            best_chest = chest
-                worker.current_chest = best_chest
-
-    def print_current_status(self):
-        print(f"Time: {self.time}")
-        for worker in self.workers:
-            print(f"Worker {worker.worker_id}: ", end="")
-            if worker.current_chest:
-                print(f"Processing Chest {worker.current_chest.chest_id} with {worker.current_chest.remaining_size} units left")
-            else:
-                print("Idle")
-        print()
-
-    def get_completion_time(self):
-        return sorted([(chest_id, time) for chest_id, time in self.completion_times.items()], key=lambda x: x[0])
-
-
 class StupidHeap:
     def __init__(self, comparison_function, init_array):
         self.comparison_function = comparison_function
@@ -191,11 +109,9 @@ def main(n=10**3, m=12):
     to_add = [(1, 1, 8), (2, 2, 7), (3, 4, 4), (4, 5, 1)]
     test_treasury = StrawHatTreasury(3)
     for i in progress_bar(range(4), "Piazza TC1".ljust(format_len)):
-        stupid_treasury = Manual(to_add[:i+1], 3)
+        stupid_treasury = ReferenceScheduler(to_add[:i+1], 3)
         test_treasury.add_treasure(Treasure(to_add[i][0], to_add[i][2], to_add[i][1]))
         completion_times = test_treasury.get_completion_time()
-        for j in range(10):
-            stupid_treasury.tick()
         stupid_completion_times = stupid_treasury.get_completion_time()
         for j in range(i+1):
             if completion_times[j].completion_time != stupid_completion_times[j][1]:
@@ -230,11 +146,9 @@ def main(n=10**3, m=12):
     ]
     test_treasury = StrawHatTreasury(3)
     for i in progress_bar(range(len(to_add)), "Bansal TC".ljust(format_len)):
-        stupid_treasury = Manual(to_add[:i+1], 3)
+        stupid_treasury = ReferenceScheduler(to_add[:i+1], 3)
         test_treasury.add_treasure(Treasure(to_add[i][0], to_add[i][2], to_add[i][1]))
         completion_times = test_treasury.get_completion_time()
-        for j in range(50):
-            stupid_treasury.tick()
         stupid_completion_times = stupid_treasury.get_completion_time()
         for j in range(i+1):
             if completion_times[j].completion_time != stupid_completion_times[j][1]:
@@ -301,12 +215,9 @@ def main(n=10**3, m=12):
         test_treasury.add_treasure(Treasure(i, size, arrival_time))
         added.append((i, arrival_time, size))
         last_added = arrival_time
-    stupid_treasury = Manual(added, workers)
+    stupid_treasury = ReferenceScheduler(added, workers)
     completion_times = test_treasury.get_completion_time().copy()
     completion_times_2 = test_treasury.get_completion_time().copy()
-    max_time = max([completion_times[i].completion_time for i in range(n)])
-    for i in progress_bar(range(max_time), "Manually Running Time".ljust(format_len)):
-        stupid_treasury.tick()
     stupid_completion_times = stupid_treasury.get_completion_time()
     for i in progress_bar(range(n+1), "Checking Completion Times"):
         if i == 0:
@@ -324,12 +235,9 @@ def main(n=10**3, m=12):
         test_treasury.add_treasure(Treasure(n+i, size, arrival_time))
         added.append((n+i, arrival_time, size))
         last_added = arrival_time
-    stupid_treasury = Manual(added, workers)
+    stupid_treasury = ReferenceScheduler(added, workers)
     completion_times = test_treasury.get_completion_time().copy()
     completion_times_2 = test_treasury.get_completion_time().copy()
-    max_time = max([completion_times[i].completion_time for i in range(2*n)])
-    for i in progress_bar(range(max_time), "Manually Running Time".ljust(format_len)):
-        stupid_treasury.tick()
     stupid_completion_times = stupid_treasury.get_completion_time()
     for i in progress_bar(range(2*n + 1), "Checking Completion Times"):
         if i == 0:
@@ -350,14 +258,11 @@ def main(n=10**3, m=12):
         size = random.randint(1, 40)
         added.append((n+i, arrival_time, size))
         last_added = arrival_time
-        stupid_treasury = Manual(added, workers)
+        stupid_treasury = ReferenceScheduler(added, workers)
         for j in added:
             test_treasury.add_treasure(Treasure(j[0], j[2], j[1]))
         completion_times = test_treasury.get_completion_time().copy()
         completion_times_2 = test_treasury.get_completion_time().copy()
-        max_time = max([completion_times[_].completion_time for _ in range(len(added))])
-        for j in range(max_time):
-            stupid_treasury.tick()
         stupid_completion_times = stupid_treasury.get_completion_time()
         for j in range(i + 1):
             if j == 0:
@@ -446,5 +351,7 @@ if __name__ == "__main__":
     main(m=20)
     print("PASSED FOR 20 CREWMATES, NOW TESTING FOR 1 CREWMATE")
     main(m=1)
-    print("PASSED FOR 1 CREWMATE, ALL GOOD!!")
+    print("PASSED FOR 1 CREWMATE, NOW CHECKING 10^6 TREASURES AGAINST THE REFERENCE")
+    cross_check(n=10**6)
+    print("PASSED THE REFERENCE CHECK, ALL GOOD!!")
 
@@ -0,0 +1,119 @@
+import heapq
+import random
+import sys
+import time
+
+
+class ReferenceWorker:
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.queue = []       # heap of [arrival_time + remaining_size, chest_id, arrival_time] at time self.last
+        self.last = 0         # time of the last event of the worker
+        self.load = 0         # total remaining size of the queue at time self.last
+        self.version = 0      # bumped whenever the pending completion event of the worker changes
+
+
+class ReferenceScheduler:
+    '''
+    Event-driven reference for the scheduling policy of the README, written independently of Code/
+    (only heapq is used), to cross-check StrawHatTreasury on large inputs.
+        - A chest is given to the worker with the least load at its arrival, the least worker id on ties;
+          among idle workers (load 0) the one idle for the longest time, then the least worker id,
+          which is the choice StrawHatTreasury makes (the README allows any)
+        - A worker processes the chest maximizing (t - arrival) - remaining, the least chest id on ties,
+          i.e. the chest minimizing (arrival + remaining, id)
+    Takes the same input as the tick simulator it replaces: (chest_id, arrival_time, size) tuples in the
+    order of arrival, and the number of workers. The cost is O(n (log n + log m)), whatever the sizes.
+    '''
+
+    def __init__(self, chests, n):
+        self.workers = [ReferenceWorker(i) for i in range(n)]
+        self.completion_times = {}
+        self.events = []                         # (completion_time, worker_id, version) of the chest at the top of each busy worker
+        self.idle = [(0, i) for i in range(n)]   # heap of (time the worker became idle, worker_id) of the idle workers
+        self.busy = []                           # heap of (time the worker becomes idle, worker_id), stale entries skipped
+        for chest_id, arrival_time, size in chests:
+            self._run_events(arrival_time)
+            self._assign(chest_id, arrival_time, size)
+        self._run_events(None)
+
+    def _schedule(self, worker):
+        worker.version += 1
+        if worker.queue:
+            key, _, arrival_time = worker.queue[0]
+            heapq.heappush(self.events, (worker.last + key - arrival_time, worker.worker_id, worker.version))
+
+    def _run_events(self, until):
+        # Completions at the arrival time happen before the arrival
+        while self.events and (until is None or self.events[0][0] <= until):
+            completion_time, worker_id, version = heapq.heappop(self.events)
+            worker = self.workers[worker_id]
+            if version != worker.version:
+                continue
+            key, chest_id, arrival_time = heapq.heappop(worker.queue)
+            worker.load -= key - arrival_time
+            worker.last = completion_time
+            self.completion_times[chest_id] = completion_time
+            if worker.queue:
+                self._schedule(worker)
+            else:
+                worker.version += 1
+                heapq.heappush(self.idle, (completion_time, worker_id))
+
+    def _least_loaded(self):
+        if self.idle:
+            return self.workers[heapq.heappop(self.idle)[1]]
+        while True:
+            free_time, worker_id = heapq.heappop(self.busy)
+            worker = self.workers[worker_id]
+            if worker.queue and worker.last + worker.load == free_time:
+                return worker
+
+    def _assign(self, chest_id, arrival_time, size):
+        worker = self._least_loaded()
+        if worker.queue:
+            # The chest at the top has been processed since the last event of the worker
+            elapsed = arrival_time - worker.last
+            worker.queue[0][0] -= elapsed
+            worker.load -= elapsed
+        worker.last = arrival_time
+        heapq.heappush(worker.queue, [arrival_time + size, chest_id, arrival_time])
+        worker.load += size
+        heapq.heappush(self.busy, (worker.last + worker.load, worker.worker_id))
+        self._schedule(worker)
+
+    def get_completion_time(self):
+        return sorted(self.completion_times.items(), key=lambda x: x[0])
+
+
+def cross_check(n=10 ** 6, m=16, max_size=10 ** 6, seed=42):
+    from straw_hat import StrawHatTreasury
+    from treasure import Treasure
+
+    rng = random.Random(seed)
+    chests = []
+    arrival_time = 0
+    for i in range(n):
+        arrival_time += rng.randint(0, max_size // m)
+        chests.append((i + 1, arrival_time, rng.randint(1, max_size)))
+
+    start_time = time.perf_counter()
+    test_treasury = StrawHatTreasury(m)
+    for chest_id, arrival_time, size in chests:
+        test_treasury.add_treasure(Treasure(chest_id, size, arrival_time))
+    completion_times = test_treasury.get_completion_time()
+    treasury_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    expected = ReferenceScheduler(chests, m).get_completion_time()
+    reference_time = time.perf_counter() - start_time
+
+    for my_treasure, (chest_id, completion_time) in zip(completion_times, expected):
+        if my_treasure.id != chest_id or my_treasure.completion_time != completion_time:
+            print(f"[!] Error in completion times, expected {(chest_id, completion_time)}, received {(my_treasure.id, my_treasure.completion_time)}")
+            sys.exit(1)
+    print(f"[+] n = {n}, m = {m}: StrawHatTreasury {treasury_time:.1f}s, reference {reference_time:.1f}s, all completion times match")
+
+
+if __name__ == "__main__":
+    cross_check(*[int(arg) for arg in sys.argv[1:]])